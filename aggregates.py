@@ -0,0 +1,137 @@
+"""Totals per carrier by processing day and month, kept up to date as files are processed
+
+write_outputs() hands the control totals of every written file (see controls.py) to
+record(). The file's contribution (row count, amount, fees, deductions) is added to the
+row of the day and of the month it is processed on in the totals table, and kept per
+output file in file_totals. When a file is processed again its earlier contribution is
+subtracted from the periods it was booked on first, so the totals never count a file
+twice. report() only reads the small totals table, however long the history is.
+
+The periods are processing dates, not settlement dates: the carriers' exports carry no
+settlement date the specs read, so a late-month export processed in the next month is
+booked on the month it was processed.
+"""
+import os
+import time
+
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS totals (
+    period TEXT NOT NULL,
+    carrier TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    fees INTEGER NOT NULL,
+    deductions INTEGER NOT NULL,
+    PRIMARY KEY (period, carrier, file_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS file_totals (
+    output_file TEXT PRIMARY KEY,
+    source_file TEXT NOT NULL,
+    carrier TEXT NOT NULL,
+    day TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    fees INTEGER NOT NULL,
+    deductions INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+VALUES = ["files", "rows", "amount", "fees", "deductions"]
+COLUMNS = ["period", "carrier", "file_type"] + VALUES
+
+
+def connect(path=None):
+    return database.connect(path, SCHEMA)
+
+
+def _add(connection, carrier, day, file_type, values):
+    """Add values (files, rows, amount, fees, deductions) to the day and month rows"""
+    for period in (day, day[:7]):
+        connection.execute(
+            "INSERT INTO totals (period, carrier, file_type, files, rows, amount, fees, deductions) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (period, carrier, file_type) DO UPDATE SET files = files + excluded.files, "
+            "rows = rows + excluded.rows, amount = amount + excluded.amount, fees = fees + excluded.fees, "
+            "deductions = deductions + excluded.deductions",
+            (period, carrier, file_type) + tuple(values),
+        )
+        connection.execute("DELETE FROM totals WHERE period = ? AND carrier = ? AND file_type = ? AND files <= 0",
+                           (period, carrier, file_type))
+
+
+def record(carrier, source_file, output_file, totals, path=None):
+    """Book the control totals of one written file, replacing its earlier contribution"""
+    day = time.strftime("%Y-%m-%d")
+    output_file = os.path.abspath(output_file)
+    file_type = totals.get("file_type") or ""
+    values = (totals["rows"], totals["amount"], totals["fees"] or 0, totals["deductions"])
+    connection = connect(path)
+    try:
+        with connection:
+            earlier = connection.execute(
+                "SELECT carrier, day, file_type, rows, amount, fees, deductions FROM file_totals WHERE output_file = ?",
+                (output_file,),
+            ).fetchone()
+            if earlier is not None:
+                _add(connection, earlier[0], earlier[1], earlier[2], [-1] + [-value for value in earlier[3:]])
+            _add(connection, carrier, day, file_type, (1,) + values)
+            connection.execute(
+                "INSERT OR REPLACE INTO file_totals (output_file, source_file, carrier, day, file_type, rows, amount, "
+                "fees, deductions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (output_file, os.path.abspath(source_file), carrier, day, file_type) + values,
+            )
+    finally:
+        connection.close()
+
+
+def report(by="month", date_from=None, date_to=None, carrier=None, path=None):
+    """Totals per processing period (by "day" or "month"), carrier and file type, oldest first"""
+    length = 10 if by == "day" else 7
+    conditions = ["length(period) = ?"]
+    params = [length]
+    if date_from:
+        conditions.append("period >= ?")
+        params.append(date_from[:length])
+    if date_to:
+        conditions.append("period <= ?")
+        params.append(date_to[:length])
+    if carrier:
+        conditions.append("carrier = ?")
+        params.append(carrier)
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM totals WHERE {' AND '.join(conditions)} "
+            "ORDER BY period, carrier, file_type",
+            params,
+        ).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def _format(amount):
+    return f"{amount:,}".replace(",", " ")
+
+
+def format_rows(rows):
+    """Report rows and a grand total as aligned text lines for the CLI"""
+    lines = [f"{'Processed':<10}  {'Carrier':<10} {'Type':<5} {'Files':>6} {'Rows':>9} {'Amount':>15} {'Fees':>12} "
+             f"{'Net':>15}"]
+    for row in rows + ([_grand_total(rows)] if len(rows) > 1 else []):
+        lines.append(f"{row['period']:<10}  {row['carrier']:<10} {row['file_type']:<5} {row['files']:>6} "
+                     f"{row['rows']:>9} {_format(row['amount']):>15} {_format(row['fees']):>12} "
+                     f"{_format(row['amount'] + row['deductions']):>15}")
+    return lines
+
+
+def _grand_total(rows):
+    total = {"period": "Total", "carrier": "", "file_type": ""}
+    for name in VALUES:
+        total[name] = sum(row[name] for row in rows)
+    return total
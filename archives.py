@@ -0,0 +1,168 @@
+"""Carrier exports inside .zip and .gz archives, read without extracting them to disk
+
+An input inside an archive is addressed by a member path: the archive path, "!/" and the
+member name, e.g. "C:/exports/march.zip!/gls/gls_march.xlsx". A .gz file holds a single
+member named like the file without ".gz". expand() replaces the archives in a selection
+by the member paths of the files a carrier reads, and everything downstream accepts
+member paths where it accepts file paths:
+
+    open_input()   what pandas reads: the path itself for plain files; for members the
+                   decompressing stream (CSV, parsed as it is inflated) or the member
+                   bytes in memory (workbooks, whose readers seek)
+    open_binary()  the raw bytes as a stream, for hashing and sniffing
+    stat()         size (uncompressed) and modification time (the archive's)
+    container()    the file on disk, e.g. the folder the outputs are written to
+    output_stem()  the name the outputs are built from, unique within that folder
+
+Each member is its own input, so the members of a bundle are processed in parallel like
+separate files and every member gets its own outputs next to the archive.
+"""
+import contextlib
+import fnmatch
+import gzip
+import io
+import os
+import re
+import struct
+import zipfile
+from collections import namedtuple
+
+SEPARATOR = "!/"
+PATTERNS = ["*.zip", "*.gz"]
+
+# Archive entries that are never settlement exports: Finder metadata, Excel lock files,
+# outputs of earlier runs
+IGNORED_MEMBERS = ["__macosx/*", "*/.*", ".*", "~$*", "*/~$*", "processed_*", "*/processed_*"]
+
+MemberStat = namedtuple("MemberStat", ["st_size", "st_mtime_ns"])
+
+
+def is_member(path):
+    return isinstance(path, str) and SEPARATOR in path
+
+
+def is_archive(path):
+    return not is_member(path) and path.lower().endswith((".zip", ".gz"))
+
+
+def split(path):
+    """(archive path, member name) of a member path"""
+    archive, member = path.split(SEPARATOR, 1)
+    return archive, member
+
+
+def container(path):
+    """The file on disk that holds path: the archive for members, path itself otherwise"""
+    return split(path)[0] if is_member(path) else path
+
+
+def output_stem(path):
+    """Name without extension for the outputs of path
+
+    Members of a zip are named after the archive and the path inside it
+    ("march.zip!/gls/report.xlsx" -> "march_gls_report"), so same-named members in other
+    folders or other archives next to it do not overwrite each other's outputs.
+    """
+    if not is_member(path):
+        return os.path.splitext(os.path.basename(path))[0]
+    archive, member = split(path)
+    if archive.lower().endswith(".gz"):
+        # The only member, already named after the archive
+        return os.path.splitext(member)[0]
+    name = os.path.splitext(os.path.basename(archive))[0] + "/" + os.path.splitext(member)[0]
+    return re.sub(r'[\\/:*?"<>|]+', "_", name)
+
+
+def member_path(archive, member):
+    return f"{archive}{SEPARATOR}{member}"
+
+
+def members(archive):
+    """Names of the files in an archive"""
+    if archive.lower().endswith(".gz"):
+        return [os.path.basename(archive)[:-3]]
+    with zipfile.ZipFile(archive) as zf:
+        return [info.filename for info in zf.infolist() if not info.is_dir()]
+
+
+def _wanted(member, patterns):
+    name = member.lower()
+    if any(fnmatch.fnmatch(name, pattern) for pattern in IGNORED_MEMBERS):
+        return False
+    return any(fnmatch.fnmatch(os.path.basename(name), pattern.lower()) for pattern in patterns)
+
+
+def expand(paths, patterns):
+    """paths with every archive replaced by the member paths matching the glob patterns
+
+    Archives that cannot be opened are kept as they are, so the read reports the problem.
+    """
+    expanded = []
+    for path in paths:
+        if not is_archive(path):
+            expanded.append(path)
+            continue
+        try:
+            names = members(path)
+        except (OSError, zipfile.BadZipFile):
+            expanded.append(path)
+            continue
+        expanded += [member_path(path, name) for name in names if _wanted(name, patterns)]
+    return expanded
+
+
+@contextlib.contextmanager
+def open_binary(path):
+    """Binary stream of a file or archive member"""
+    if not is_member(path):
+        with open(path, "rb") as f:
+            yield f
+        return
+    archive, member = split(path)
+    if archive.lower().endswith(".gz"):
+        with gzip.open(archive, "rb") as f:
+            yield f
+        return
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+        yield f
+
+
+@contextlib.contextmanager
+def open_input(path):
+    """Path or file object to hand to pandas (see the module docstring)"""
+    if not is_member(path):
+        yield path
+        return
+    with open_binary(path) as f:
+        if path.lower().endswith(".csv"):
+            yield f
+        else:
+            yield io.BytesIO(f.read())
+
+
+def stat(path):
+    """os.stat() for files; for members the uncompressed size and the archive's mtime"""
+    if not is_member(path):
+        return os.stat(path)
+    archive, member = split(path)
+    archive_stat = os.stat(archive)
+    if archive.lower().endswith(".gz"):
+        # The last four bytes of a gzip file hold the uncompressed size (modulo 4 GiB)
+        with open(archive, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            size = struct.unpack("<I", f.read(4))[0]
+    else:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                size = zf.getinfo(member).file_size
+        except (KeyError, zipfile.BadZipFile) as e:
+            raise FileNotFoundError(f"{member} not found in {archive}") from e
+    return MemberStat(size, archive_stat.st_mtime_ns)
+
+
+def exists(path):
+    try:
+        stat(path)
+        return True
+    except OSError:
+        return False
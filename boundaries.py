@@ -0,0 +1,62 @@
+"""Find where the data rows of a positional settlement sheet start and end
+
+Instead of trusting a fixed number of header and total rows, the first and last rows of
+the sheet are matched against the spec's "boundaries" rules in one vectorized pass:
+
+    header_labels  labels of the column header row; data starts on the row below it
+    key_column     column that is filled on every data row (e.g. the reference)
+    amount_column  column that holds a number on every data row
+    scan_rows      how many rows from the top and bottom are inspected
+
+resolve_data_start() is what the engine and preflight both go by: the rules first, then
+the spec's fixed skip_rows, so preflight only rejects what the read would fail on.
+"""
+import pandas as pd
+
+DEFAULT_SCAN_ROWS = 50
+
+
+def _data_rows(frame, rules):
+    """Boolean mask of rows that look like data rows"""
+    key = frame[rules["key_column"]]
+    has_key = key.notna() & (key.astype(str).str.strip() != "")
+    is_number = pd.to_numeric(frame[rules["amount_column"]], errors="coerce").notna()
+    return (has_key & is_number).to_numpy()
+
+
+def find_data_start(head, rules):
+    """Index of the first data row in the first rows of the sheet, or None if not found"""
+    labels = rules.get("header_labels")
+    if labels:
+        text = head.astype(str)
+        is_header = text.isin(labels).any(axis=1).to_numpy()
+        if is_header.any():
+            return int(is_header.argmax()) + 1
+
+    data_rows = _data_rows(head, rules)
+    if data_rows.any():
+        return int(data_rows.argmax())
+    return None
+
+
+def resolve_data_start(head, rules, skip_rows=None):
+    """(first data row, True if the rules found it); the start is skip_rows when they did
+    not, and None if there is no skip_rows to fall back to either"""
+    data_start = find_data_start(head, rules)
+    if data_start is not None:
+        return data_start, True
+    return skip_rows, False
+
+
+def no_data_message(rules, nrows):
+    return (f"No data rows found in the first {nrows} rows "
+            f"(expected a reference in column {rules['key_column']} and a number in column {rules['amount_column']})")
+
+
+def count_footer_rows(frame, rules):
+    """Number of rows after the last data row (totals, signatures, empty rows)"""
+    tail = frame.tail(rules.get("scan_rows", DEFAULT_SCAN_ROWS))
+    data_rows = _data_rows(tail, rules)
+    if not data_rows.any():
+        return None
+    return int(data_rows[::-1].argmax())
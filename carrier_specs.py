@@ -0,0 +1,172 @@
+"""Declarative descriptions of the carrier settlement layouts
+
+Every spec is a plain dict executed by engine.py. Keys:
+
+    carrier        display name, also used for metrics and output messages
+    extensions     input extensions; the first one is stripped from the output name
+    sheet          sheet name or index for Excel inputs
+    csv_sep        delimiter for .csv inputs
+    header         True if the first kept row holds column names, False for positional columns
+    skip_rows      rows above the data (title, info and header rows when header is False)
+    footer_rows    rows below the data, e.g. a grand total row
+    boundaries     rules for finding the data rows instead of skip_rows/footer_rows (see boundaries.py)
+    columns        columns kept at read time (positions or names), everything else is never parsed
+    required       columns that must be present, checked before any conversion
+    dtypes         read-time dtypes, e.g. str for IDs so leading zeros survive
+    types          typed conversion per column, applied once (see engine.CONVERTERS)
+    id_column      column cleaned by one of engine.ID_CLEANERS, chosen by options["file_type"]
+    id_cleaners    file type -> cleaner name
+    mapping        look up id_column in the reference index: {"target", "default"}; with
+                   "near_match" the misses can be resolved by near match when it is switched
+                   on for the run (see reference_match.py)
+    summary        extra rows taken from a second sheet below an anchor row (Foxpost)
+    fee_row        append the negated sum of a column as a last row under key_column/amount_column
+    optional_row   append optional_1/optional_2 as a last row when given
+    dedup_key      transaction key column checked against earlier runs (see transaction_index.py)
+    controls       columns for the control totals checked after the transform (see controls.py)
+    outputs        output file prefix -> list of columns written, in order
+    provisional    the layout is not yet confirmed against a real export; every run warns
+"""
+
+GLS = {
+    "carrier": "GLS",
+    "extensions": [".xlsx"],
+    "sheet": 0,
+    "header": False,
+    # Fallback when the boundaries are not found: title row, six customer info rows,
+    # the column header row and one grand total row
+    "skip_rows": 8,
+    "footer_rows": 1,
+    "boundaries": {"header_labels": ["Utánvét hivatkozás"], "key_column": 2, "amount_column": 4},
+    # Utánvét hivatkozás, Utánvét összeg
+    "columns": [2, 4],
+    "types": {4: "int"},
+    "optional_row": True,
+    "dedup_key": 2,
+    "controls": {"amount_column": 4},
+    "outputs": {"processed_": [2, 4]},
+}
+
+DPD = {
+    "carrier": "DPD",
+    "extensions": [".xls"],
+    "sheet": "Sheet1",
+    "header": False,
+    "skip_rows": 3,
+    "footer_rows": 0,
+    "boundaries": {"key_column": 5, "amount_column": 2},
+    "columns": [2, 5],
+    "types": {2: "int", 5: "first_segment"},
+    "optional_row": True,
+    "dedup_key": 5,
+    "controls": {"amount_column": 2},
+    "outputs": {"processed_": [5, 2]},
+}
+
+FOXPOST = {
+    "carrier": "Foxpost",
+    "extensions": [".xlsx"],
+    "sheet": "utánvétek",
+    "header": False,
+    "skip_rows": 10,
+    "footer_rows": 0,
+    "boundaries": {"key_column": 4, "amount_column": 7},
+    "columns": [4, 7],
+    "types": {},
+    # PARTNER rows below "ÖSSZESÍTÉS" on the summary sheet are booked as negative amounts on key 1
+    "summary": {
+        "sheet": "összesítés",
+        "anchor": "ÖSSZESÍTÉS",
+        "match_column": 0,
+        "match": "PARTNER",
+        "value_column": 1,
+        "key": 1,
+        "negate": True,
+        "key_column": 4,
+        "amount_column": 7,
+    },
+    "dedup_key": 4,
+    "controls": {"amount_column": 7},
+    "outputs": {"processed_": [4, 7]},
+}
+
+SIMPLE_PAY = {
+    "carrier": "Simple Pay",
+    "extensions": [".csv", ".xlsx", ".xls"],
+    "sheet": 0,
+    "csv_sep": ";",
+    "header": True,
+    "skip_rows": 0,
+    "footer_rows": 0,
+    "columns": ["Kereskedői tranzakció ID", "Tranzakció összege", "Tranzakciós jutalék", "Vásárló", "E-mail cím"],
+    "required": ["Tranzakciós jutalék", "Kereskedői tranzakció ID", "Tranzakció összege"],
+    "dtypes": {"Kereskedői tranzakció ID": str},
+    "types": {"Tranzakció összege": "amount", "Tranzakciós jutalék": "amount"},
+    "id_column": "Kereskedői tranzakció ID",
+    "id_cleaners": {"equal": "strip_equal_quotes", "pg": "strip_pg_prefix", "t": "after_first_t"},
+    "mapping": {"target": "Sorszám", "default": "1", "near_match": True},
+    "fee_row": {"column": "Tranzakciós jutalék", "key_column": "Sorszám", "key": "1",
+                "amount_column": "Tranzakció összege"},
+    "dedup_key": "Kereskedői tranzakció ID",
+    "controls": {"amount_column": "Tranzakció összege", "fee_column": "Tranzakciós jutalék"},
+    "outputs": {
+        "processed_": ["Sorszám", "Tranzakció összege"],
+        "processed_extended_": ["Sorszám", "Tranzakció összege", "Vásárló", "E-mail cím"],
+    },
+}
+
+MPL = {
+    "carrier": "MPL",
+    "extensions": [".xlsx", ".csv"],
+    "sheet": 0,
+    "csv_sep": ";",
+    "header": True,
+    "skip_rows": 0,
+    "footer_rows": 0,
+    # Magyar Posta cash on delivery settlement: one row per parcel. Provisional: the column
+    # names are not yet confirmed against a real (anonymised) export.
+    "provisional": True,
+    "columns": ["Ragszám", "Utánvét összeg"],
+    "required": ["Ragszám", "Utánvét összeg"],
+    "dtypes": {"Ragszám": str},
+    "types": {"Utánvét összeg": "amount"},
+    "optional_row": True,
+    "dedup_key": "Ragszám",
+    "controls": {"amount_column": "Utánvét összeg"},
+    "outputs": {"processed_": ["Ragszám", "Utánvét összeg"]},
+}
+
+OTP = {
+    "carrier": "OTP",
+    "extensions": [".csv", ".xlsx"],
+    "sheet": 0,
+    "csv_sep": ";",
+    "header": True,
+    "skip_rows": 0,
+    "footer_rows": 0,
+    # OTP card acceptance settlement: the commission is booked as one negative row on key 1.
+    # Provisional: the column names are not yet confirmed against a real (anonymised) export.
+    "provisional": True,
+    "columns": ["Tranzakció azonosító", "Összeg", "Jutalék"],
+    "required": ["Tranzakció azonosító", "Összeg", "Jutalék"],
+    "dtypes": {"Tranzakció azonosító": str},
+    "types": {"Összeg": "amount", "Jutalék": "amount"},
+    "fee_row": {"column": "Jutalék", "key_column": "Tranzakció azonosító", "key": "1",
+                "amount_column": "Összeg"},
+    "optional_row": True,
+    "dedup_key": "Tranzakció azonosító",
+    "controls": {"amount_column": "Összeg", "fee_column": "Jutalék"},
+    "outputs": {"processed_": ["Tranzakció azonosító", "Összeg"]},
+}
+
+SPECS = {spec["carrier"]: spec for spec in [GLS, DPD, FOXPOST, SIMPLE_PAY, MPL, OTP]}
+
+# Carrier names as typed on the command line and in service requests
+CARRIERS = {
+    "dpd": "DPD",
+    "foxpost": "Foxpost",
+    "gls": "GLS",
+    "mpl": "MPL",
+    "otp": "OTP",
+    "simple-pay": "Simple Pay",
+}
@@ -0,0 +1,254 @@
+"""Command line entry point for running the carrier processors without the GUI
+
+Examples:
+    python cli.py run gls export1.xlsx export2.xlsx --optional1 "Díj" --optional2 1500
+    python cli.py run simple-pay --xml march.xml --xml april.xml --type pg pg_export.csv --profile
+    python cli.py history SA25/H0313 --from 2025-03-01
+    python cli.py totals --by month --from 2025-01-01 --to 2025-12-31
+    python cli.py serve --port 8765
+    python cli.py equivalence --rows 100000 --repeat 3
+"""
+import argparse
+import os
+import sys
+
+import processors
+import settings
+from carrier_specs import CARRIERS, SPECS
+from instrumentation import RunMetrics
+
+
+def cmd_run(args):
+    """Process the given files with one carrier processor"""
+    carrier = CARRIERS[args.carrier]
+    options = {"optional_1": args.optional1 or "", "optional_2": ""}
+    if args.optional2:
+        # Same convention as the windows: the second optional entry is entered positive
+        options["optional_2"] = -abs(args.optional2)
+
+    if carrier == "Simple Pay":
+        if not args.xml or not args.type:
+            print("Simple Pay runs need --xml and --type", file=sys.stderr)
+            return 2
+        options["xml_paths"] = args.xml
+        options["file_type"] = args.type
+
+    if args.audit:
+        options["audit"] = True
+    if args.strict_totals:
+        options["strict_totals"] = True
+    if args.near_match:
+        options["near_match"] = True
+    if args.workers:
+        settings.WORKERS = args.workers
+
+    metrics = RunMetrics(carrier, enabled=args.metrics)
+    processed_files, errors = processors.run_batch(carrier, args.files, options,
+                                                   progress=print, metrics=metrics, profile=args.profile,
+                                                   resume=not args.no_resume)
+
+    # Archives count as the members they hold, so the total is not len(args.files)
+    print(f"Processed {len(processed_files)} files" + (f", {len(errors)} failed" if errors else ""))
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_cache(args):
+    """Inspect or clear the parsed-input cache"""
+    import read_cache
+
+    if args.action == "clear":
+        print(f"Removed {read_cache.clear()} cache entries")
+    elif args.action == "evict":
+        freed = read_cache.evict(settings.READ_CACHE_MAX_BYTES)
+        print(f"Freed {freed / (1024 * 1024):.1f} MiB")
+    else:
+        for line in read_cache.info_lines():
+            print(line)
+    return 0
+
+
+def cmd_journal(args):
+    """List or forget unfinished batches"""
+    import journal
+
+    if args.action == "clear":
+        print(f"Removed {journal.clear()} batches")
+    else:
+        for line in journal.unfinished_lines():
+            print(line)
+    return 0
+
+
+def cmd_dedup(args):
+    """Inspect or reset the index of processed transaction keys"""
+    import transaction_index
+
+    if args.action == "clear":
+        carrier = CARRIERS[args.carrier] if args.carrier else None
+        print(f"Removed {transaction_index.clear(carrier)} transaction keys")
+    else:
+        for line in transaction_index.info_lines():
+            print(line)
+    return 0
+
+
+def cmd_history(args):
+    """Search the stored output rows by reference prefix and processing date"""
+    import transaction_store
+
+    carrier = CARRIERS[args.carrier] if args.carrier else None
+    rows = transaction_store.search(args.reference, args.date_from, args.date_to, carrier, args.limit)
+    for line in transaction_store.format_rows(rows):
+        print(line)
+    print(f"{len(rows)} rows" + (" (limit reached)" if len(rows) == args.limit else ""))
+    return 0
+
+
+def cmd_totals(args):
+    """Show the totals per carrier by processing day or month"""
+    import aggregates
+
+    carrier = CARRIERS[args.carrier] if args.carrier else None
+    rows = aggregates.report(args.by, args.date_from, args.date_to, carrier)
+    if not rows:
+        print("No totals recorded for this period")
+        return 0
+    for line in aggregates.format_rows(rows):
+        print(line)
+    return 0
+
+
+def cmd_serve(args):
+    """Run the local HTTP processing service (see service.py)"""
+    import service
+
+    if args.workers:
+        settings.WORKERS = args.workers
+    service.serve(args.host, args.port)
+    return 0
+
+
+def cmd_equivalence(args):
+    """Compare the engine's outputs, time and memory with the first release's code"""
+    import equivalence
+
+    cases = None
+    if args.files:
+        carrier = CARRIERS[args.carrier] if args.carrier else None
+        if carrier not in equivalence.CARRIERS:
+            choices = sorted(key for key, name in CARRIERS.items() if name in equivalence.CARRIERS)
+            print(f"Own inputs need --carrier, one of: {', '.join(choices)}", file=sys.stderr)
+            return 2
+        options = {}
+        if args.optional1 or args.optional2:
+            if not SPECS[carrier].get("optional_row"):
+                print(f"{carrier} has no optional entries; leave out --optional1/--optional2", file=sys.stderr)
+                return 2
+            options = {"optional_1": args.optional1 or "", "optional_2": str(args.optional2 or "")}
+        if carrier == "Simple Pay":
+            if not args.xml or not args.type:
+                print("Simple Pay runs need --xml and --type", file=sys.stderr)
+                return 2
+            options.update(xml_path=args.xml, file_type=args.type)
+        cases = [equivalence.Case(os.path.basename(path), carrier, os.path.abspath(path), options)
+                 for path in args.files]
+
+    results, work_dir = equivalence.run(cases, args.rows, args.repeat, args.work_dir)
+    for line in equivalence.report_lines(results):
+        print(line)
+    print(f"Outputs kept in {work_dir}")
+    return 0 if equivalence.all_equal(results) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="processautomate", description="ProcessAutomate command line")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="process settlement files")
+    run_parser.add_argument("carrier", choices=sorted(CARRIERS))
+    run_parser.add_argument("files", nargs="+")
+    run_parser.add_argument("--optional1", help="first optional entry appended as the last row")
+    run_parser.add_argument("--optional2", type=int, help="second optional entry (positive, stored negated)")
+    run_parser.add_argument("--xml", action="append",
+                            help="Simple Pay reference XML (repeat for references spanning several exports)")
+    run_parser.add_argument("--type", choices=["equal", "pg", "t"], help="Simple Pay file type")
+    run_parser.add_argument("--near-match", action="store_true", default=settings.NEAR_MATCH_ENABLED,
+                            help="Simple Pay: resolve IDs without an exact reference by near match "
+                                 "(leading zeros, other prefixes, truncation)")
+    run_parser.add_argument("--metrics", action="store_true", default=settings.METRICS_ENABLED,
+                            help="record stage timings and save them next to the outputs")
+    run_parser.add_argument("--audit", action="store_true", default=settings.AUDIT_ENABLED,
+                            help="also write audit_<name>.xlsx with the source row of every output row")
+    run_parser.add_argument("--strict-totals", action="store_true", default=settings.CONTROL_TOTALS_STRICT,
+                            help="stop files whose control totals do not reconcile instead of only warning")
+    run_parser.add_argument("--profile", action="store_true",
+                            help="profile the run with cProfile and save .prof/speedscope files")
+    run_parser.add_argument("--workers", type=int,
+                            help="worker processes for multi-file batches (default: PROCESSAUTOMATE_WORKERS "
+                                 "or CPU count - 1)")
+    run_parser.add_argument("--no-resume", action="store_true",
+                            help="process every file even if an interrupted run of the same batch finished some")
+    run_parser.set_defaults(func=cmd_run)
+
+    cache_parser = subparsers.add_parser("cache", help="inspect or clear the parsed-input cache")
+    cache_parser.add_argument("action", choices=["info", "clear", "evict"], nargs="?", default="info")
+    cache_parser.set_defaults(func=cmd_cache)
+
+    journal_parser = subparsers.add_parser("journal", help="list or forget unfinished (resumable) batches")
+    journal_parser.add_argument("action", choices=["list", "clear"], nargs="?", default="list")
+    journal_parser.set_defaults(func=cmd_journal)
+
+    dedup_parser = subparsers.add_parser("dedup", help="inspect or reset the processed transaction index")
+    dedup_parser.add_argument("action", choices=["info", "clear"], nargs="?", default="info")
+    dedup_parser.add_argument("--carrier", choices=sorted(CARRIERS), help="only clear the keys of this carrier")
+    dedup_parser.set_defaults(func=cmd_dedup)
+
+    history_parser = subparsers.add_parser("history", help="search processed transactions")
+    history_parser.add_argument("reference", nargs="?", help="reference or Sorszám (prefix match)")
+    history_parser.add_argument("--from", dest="date_from", help="first processing date, YYYY-MM-DD")
+    history_parser.add_argument("--to", dest="date_to", help="last processing date, YYYY-MM-DD")
+    history_parser.add_argument("--carrier", choices=sorted(CARRIERS))
+    history_parser.add_argument("--limit", type=int, default=500)
+    history_parser.set_defaults(func=cmd_history)
+
+    totals_parser = subparsers.add_parser("totals", help="totals per carrier by processing day or month")
+    totals_parser.add_argument("--by", choices=["day", "month"], default="month",
+                               help="group by processing day or month (default: month)")
+    totals_parser.add_argument("--from", dest="date_from", help="first processing date, YYYY-MM-DD")
+    totals_parser.add_argument("--to", dest="date_to", help="last processing date, YYYY-MM-DD")
+    totals_parser.add_argument("--carrier", choices=sorted(CARRIERS))
+    totals_parser.set_defaults(func=cmd_totals)
+
+    serve_parser = subparsers.add_parser("serve", help="run the local HTTP processing service")
+    serve_parser.add_argument("--host", help=f"address to listen on (default: {settings.SERVICE_HOST})")
+    serve_parser.add_argument("--port", type=int, help=f"port to listen on (default: {settings.SERVICE_PORT})")
+    serve_parser.add_argument("--workers", type=int, help="worker processes shared by all batches")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    equivalence_parser = subparsers.add_parser(
+        "equivalence", help="compare outputs, time and memory of the engine with the first release's code")
+    equivalence_parser.add_argument("files", nargs="*",
+                                    help="(anonymized) inputs to use instead of synthetic ones; need --carrier")
+    equivalence_parser.add_argument("--carrier", choices=sorted(CARRIERS))
+    equivalence_parser.add_argument("--xml", help="Simple Pay reference XML")
+    equivalence_parser.add_argument("--type", choices=["equal", "pg", "t"], help="Simple Pay file type")
+    equivalence_parser.add_argument("--optional1", help="first optional entry appended as the last row")
+    equivalence_parser.add_argument("--optional2", type=int, help="second optional entry (positive)")
+    equivalence_parser.add_argument("--rows", type=int, default=1000, help="rows of the synthetic inputs")
+    equivalence_parser.add_argument("--repeat", type=int, default=1,
+                                    help="runs per side; the best time and the highest peak are reported")
+    equivalence_parser.add_argument("--work-dir", help="folder for the inputs and outputs (default: a new temp folder)")
+    equivalence_parser.set_defaults(func=cmd_equivalence)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
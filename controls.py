@@ -0,0 +1,78 @@
+"""Control totals of one transformed file, reconciled with the totals in the source
+
+The totals are taken from the typed frame inside the transform pass, so no extra read is
+needed. The spec's "controls" rules name the columns:
+
+    amount_column  column summed into the amount total; it is also the column in which a
+                   total row below the data (see boundaries.py) is looked up
+    fee_column     column summed into the fee total (e.g. the commission per transaction)
+
+Checks that fail are returned as problems; engine.transform decides whether they stop
+the file (options["strict_totals"] or settings.CONTROL_TOTALS_STRICT, off by default)
+or are only reported.
+"""
+import pandas as pd
+
+
+def _numbers(series):
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _format(amount):
+    return f"{amount:,}".replace(",", " ")
+
+
+def compute(spec, frame, footer=None, extra_rows=()):
+    """Row count and sums of the data rows, plus the source total if the footer has one"""
+    rules = spec["controls"]
+    amounts = _numbers(frame[rules["amount_column"]])
+    totals = {
+        "rows": len(frame),
+        "amount": int(amounts.sum()),
+        "non_numeric": int(amounts.isna().sum()),
+        "fees": None,
+        "deductions": 0,
+        "source_totals": [],
+    }
+    if rules.get("fee_column") is not None:
+        totals["fees"] = int(_numbers(frame[rules["fee_column"]]).sum())
+
+    # Rows booked on top of the data (summary rows, fee row) all reduce the payout
+    for rows in extra_rows:
+        if rows is not None and len(rows):
+            totals["deductions"] += int(_numbers(rows[rules["amount_column"]]).sum())
+
+    if footer is not None and len(footer) and rules["amount_column"] in footer.columns:
+        found = _numbers(footer[rules["amount_column"]]).dropna()
+        totals["source_totals"] = [int(value) for value in found if value == int(value)]
+    return totals
+
+
+def check(totals):
+    """Problems found in the totals of one file; empty if everything adds up"""
+    problems = []
+    if totals["non_numeric"]:
+        problems.append(f"{totals['non_numeric']} data rows have no numeric amount")
+    if totals["source_totals"] and totals["amount"] not in totals["source_totals"]:
+        found = ", ".join(_format(value) for value in totals["source_totals"])
+        problems.append(f"amount total {_format(totals['amount'])} does not match the total row ({found})")
+    if totals["deductions"] > 0:
+        problems.append(f"deductions are positive ({_format(totals['deductions'])})")
+    elif -totals["deductions"] > totals["amount"] > 0:
+        problems.append(f"deductions {_format(-totals['deductions'])} exceed the amount total "
+                        f"{_format(totals['amount'])}")
+    return problems
+
+
+def summary_line(totals, problems):
+    """One line per file for the log panel"""
+    parts = [f"{totals['rows']} rows", f"amount {_format(totals['amount'])}"]
+    if totals["fees"] is not None:
+        parts.append(f"fees {_format(totals['fees'])}")
+    if totals["deductions"]:
+        parts.append(f"deductions {_format(totals['deductions'])}")
+        parts.append(f"net {_format(totals['amount'] + totals['deductions'])}")
+    if totals["source_totals"]:
+        parts.append("matches total row" if totals["amount"] in totals["source_totals"] else "total row differs")
+    status = "✓" if not problems else "✗"
+    return f"{status} Control totals: {', '.join(parts)}"
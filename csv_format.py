@@ -0,0 +1,162 @@
+"""Encoding and delimiter of CSV inputs, worked out from the first bytes before the parse
+
+Exports do not all come as the spec's UTF-8 with ";": some arrive with a byte order mark,
+some in cp1250 (Windows Central European), some with "," or tab. Reading them with the
+wrong parameters fails with a decode error deep into the parse. sniff() looks at the
+first SAMPLE_BYTES instead:
+
+    encoding   a BOM decides (utf-8-sig, utf-16); otherwise the first non-ASCII bytes are
+               tried as UTF-8 and taken as cp1250 if they are not valid UTF-8
+    delimiter  the spec's delimiter if it splits the sample into the same number (>1) of
+               fields on every line, else the candidate that does with the most fields
+
+The result is cached per source pattern (carrier plus the file name with its digits
+masked, e.g. "simplepay_####_##.csv") in memory and in the local database. The cache is
+used when a sample cannot tell, e.g. a sample that is plain ASCII, so next month's export
+of the same source does not have to be scanned until its first accented character.
+"""
+import codecs
+import csv
+import io
+import os
+import re
+import threading
+
+import archives
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS csv_formats (
+    carrier TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    encoding TEXT NOT NULL,
+    sep TEXT NOT NULL,
+    PRIMARY KEY (carrier, pattern)
+) WITHOUT ROWID;
+"""
+
+SAMPLE_BYTES = 64 * 1024
+# Read further in steps of this size when the sample is plain ASCII and nothing is cached
+SCAN_BYTES = 1024 * 1024
+DELIMITERS = [";", ",", "\t", "|"]
+FALLBACK_ENCODING = "cp1250"
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+_formats = None
+_lock = threading.Lock()
+
+
+def source_pattern(file_path):
+    """File name with digit runs masked, so the exports of one source share a pattern"""
+    return re.sub(r"\d", "#", os.path.basename(file_path).lower())
+
+
+def _load():
+    global _formats
+    if _formats is None:
+        connection = database.connect(schema=SCHEMA)
+        try:
+            rows = connection.execute("SELECT carrier, pattern, encoding, sep FROM csv_formats").fetchall()
+        finally:
+            connection.close()
+        _formats = {(carrier, pattern): {"encoding": encoding, "sep": sep} for carrier, pattern, encoding, sep in rows}
+    return _formats
+
+
+def _remember(key, found):
+    with _lock:
+        formats = _load()
+        if formats.get(key) == found:
+            return
+        formats[key] = found
+    connection = database.connect(schema=SCHEMA)
+    try:
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO csv_formats (carrier, pattern, encoding, sep) VALUES (?, ?, ?, ?)",
+                               key + (found["encoding"], found["sep"]))
+    finally:
+        connection.close()
+
+
+def _decodes_as_utf8(data):
+    # The chunk may end inside a multi-byte character, which is not an error yet
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _encoding_of(data):
+    return "utf-8" if _decodes_as_utf8(data) else FALLBACK_ENCODING
+
+
+def _scan_encoding(f):
+    """Encoding told by the first non-ASCII bytes in the rest of the stream; utf-8 if there are none"""
+    while True:
+        chunk = f.read(SCAN_BYTES)
+        if not chunk:
+            return "utf-8"
+        match = _NON_ASCII.search(chunk)
+        if match:
+            # A few bytes before the match so a character cut at the chunk start is not misread
+            return _encoding_of(chunk[max(match.start() - 4, 0):] + f.read(4))
+
+
+def _field_counts(text, sep):
+    lines = text.splitlines(keepends=True)
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        # The sample cuts the last line
+        lines = lines[:-1]
+    try:
+        return [len(row) for row in csv.reader(io.StringIO("".join(lines)), delimiter=sep) if row]
+    except csv.Error:
+        return []
+
+
+def _delimiter(text, default):
+    """The delimiter the sample is consistent with, or None if no candidate is"""
+    found = {}
+    for sep in [default] + [sep for sep in DELIMITERS if sep != default]:
+        counts = _field_counts(text, sep)
+        if counts and counts[0] > 1 and all(count == counts[0] for count in counts):
+            found[sep] = counts[0]
+    if default in found:
+        return default
+    return max(found, key=found.get) if found else None
+
+
+def sniff(file_path, default_sep=";", carrier=""):
+    """{"encoding", "sep"} to read file_path with"""
+    key = (carrier, source_pattern(file_path))
+    with _lock:
+        cached = _load().get(key)
+
+    # Archive members are sniffed from their decompressing stream like files
+    with archives.open_binary(file_path) as f:
+        sample = f.read(SAMPLE_BYTES)
+        bom_encoding = next((encoding for bom, encoding in BOMS if sample.startswith(bom)), None)
+        if bom_encoding:
+            encoding = bom_encoding
+        elif _NON_ASCII.search(sample):
+            encoding = _encoding_of(sample)
+        elif cached is not None and cached["encoding"] in ("utf-8", FALLBACK_ENCODING):
+            encoding = cached["encoding"]
+        elif len(sample) < SAMPLE_BYTES:
+            encoding = "utf-8"
+        else:
+            encoding = _scan_encoding(f)
+
+    text = sample.decode(encoding, errors="replace")
+    sep = _delimiter(text, default_sep) or (cached or {}).get("sep") or default_sep
+
+    found = {"encoding": encoding, "sep": sep}
+    _remember(key, found)
+    return found
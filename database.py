@@ -0,0 +1,20 @@
+"""Connection to the local SQLite database shared by the transaction history modules"""
+import os
+import sqlite3
+
+import settings
+
+
+def connect(path=None, schema=None):
+    """Open the database in WAL mode and create the tables of schema on first use"""
+    path = path or settings.DATABASE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Several threads and worker processes write at once. Write transactions take the lock
+    # when they begin (IMMEDIATE) and wait for it; a deferred transaction that reads first
+    # would fail with "database is locked" instead of waiting when it tries to write.
+    connection = sqlite3.connect(path, timeout=30, isolation_level="IMMEDIATE")
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        connection.executescript(schema)
+    return connection
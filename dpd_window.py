@@ -1,7 +1,8 @@
-import os
-import pandas as pd
-from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QListWidget, QLineEdit, QFrame, \
-    QMessageBox, QFileDialog, QHBoxLayout
+from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QLineEdit, QFrame, \
+    QMessageBox, QHBoxLayout, QCheckBox, QTextEdit
+import settings
+from file_list import FileSelector, PreviewPane
+from worker import BatchThread, confirm_stop
 import xlrd
 
 
@@ -12,6 +13,7 @@ class DPDWindow:
         
         self.window = window
         self.main_window = main_window
+        self.processing_thread = None
 
         # Set up central widget and layout
         self.central_widget = QWidget()
@@ -28,15 +30,16 @@ class DPDWindow:
         self.files_label.setStyleSheet("font-size: 14px;")
         self.layout.addWidget(self.files_label)
 
-        # File listbox
-        self.file_listbox = QListWidget()
-        self.layout.addWidget(self.file_listbox)
+        # File list (files, folders and drag-and-drop) with a preview of the selected file
+        self.files_layout = QHBoxLayout()
+        self.file_selector = FileSelector(self.window, "DPD", ["*.xls"])
+        self.files_layout.addWidget(self.file_selector, 1)
 
-        # Button to browse files
-        self.browse_button = QPushButton("Browse Files")
-        self.browse_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
-        self.browse_button.clicked.connect(self.browse_files)
-        self.layout.addWidget(self.browse_button)
+        self.preview_pane = PreviewPane("DPD")
+        self.file_selector.current_file_changed.connect(self.preview_pane.show_file)
+        self.files_layout.addWidget(self.preview_pane, 1)
+
+        self.layout.addLayout(self.files_layout)
 
         # Optional label
         self.optional_label = QLabel("Optional")
@@ -65,12 +68,37 @@ class DPDWindow:
         self.optional_frame.addLayout(self.optional_entry2_frame)
         self.layout.addLayout(self.optional_frame)
 
+        # Record stage timings checkbox
+        self.metrics_checkbox = QCheckBox("Record stage timings")
+        self.metrics_checkbox.setChecked(settings.METRICS_ENABLED)
+        self.layout.addWidget(self.metrics_checkbox)
+
+        # Profile this run checkbox
+        self.profile_checkbox = QCheckBox("Profile this run (saves a .prof and speedscope file next to the outputs)")
+        self.layout.addWidget(self.profile_checkbox)
+
+        # Resume checkbox: off processes every file again even if an earlier run was interrupted
+        self.resume_checkbox = QCheckBox("Skip files an interrupted run already processed")
+        self.resume_checkbox.setChecked(settings.JOURNAL_ENABLED)
+        self.resume_checkbox.setEnabled(settings.JOURNAL_ENABLED)
+        self.layout.addWidget(self.resume_checkbox)
+
         # Run button
         self.run_button = QPushButton("Run")
         self.run_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
         self.run_button.clicked.connect(self.run_function)
         self.layout.addWidget(self.run_button)
 
+        # Add log display area
+        self.log_label = QLabel("Processing Log:")
+        self.log_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.layout.addWidget(self.log_label)
+
+        self.log_display = QTextEdit()
+        self.log_display.setReadOnly(True)
+        self.log_display.setMinimumHeight(120)
+        self.layout.addWidget(self.log_display)
+
         # Back button
         self.back_button = QPushButton("Back to Main Menu")
         self.back_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
@@ -95,12 +123,6 @@ class DPDWindow:
             # If not an integer, remove the last character
             self.optional_entry2.setText(text[:-1])
 
-    def browse_files(self):
-        # Open file dialog to select multiple files
-        file_paths, _ = QFileDialog.getOpenFileNames(self.window, "Select Files")
-        for file_path in file_paths:
-            self.file_listbox.addItem(file_path)
-
     def run_function(self):
             # Import the xlrd library here if it wasn't found in the global scope
         try:
@@ -108,8 +130,12 @@ class DPDWindow:
         except ImportError:
             QMessageBox.critical(self.window, "Missing Library", "The xlrd library is required but couldn't be imported.")
             return
-        # Get all files from the listbox
-        all_files = [self.file_listbox.item(i).text() for i in range(self.file_listbox.count())]
+        # Get all files from the list
+        all_files = self.file_selector.files()
+
+        if self.file_selector.is_scanning():
+            QMessageBox.warning(self.window, "Scanning", "Please wait until the folder scan has finished.")
+            return
 
         if not all_files:
             QMessageBox.warning(self.window, "No Files", "Please browse and add files to process.")
@@ -126,81 +152,24 @@ class DPDWindow:
                 QMessageBox.critical(self.window, "Invalid Input", "Optional field 2 must be a number.")
                 return
 
-        processed_files = []
-        errors = []
-
-        for file_path in all_files:
-            try:
-                # Import a specific Excel sheet (DPD uses xls instead of xlsx, therefore, the xlrd library is needed)
-                # Open the workbook
-                # Load and process each file
-                print(f"Processing file: {file_path}")
-                workbook = xlrd.open_workbook(file_path)
-
-                # Select the sheet by name or index
-                sheet_name = 'Sheet1'  # Replace with the name of your sheet
-                sheet = workbook.sheet_by_name(sheet_name)
-
-                # Read the data into a pandas DataFrame, skipping the first 3 rows
-                data = pd.DataFrame(sheet.get_rows())[3:]
-
-                # Reset the index
-                data.reset_index(drop=True, inplace=True)
-
-                # Keep only the columns with index 2 and 5
-                filtered_data = data[[2, 5]]
-
-                # Reset the index
-                filtered_data.reset_index(drop=True, inplace=True)
-
-                # Ensure the column is treated as strings
-                filtered_data[2] = filtered_data[2].astype(str)
-
-                # Remove the "number:" string and strip spaces in column 2
-                filtered_data.loc[:, 2] = filtered_data[2].str.replace('number:', '', regex=False).str.strip()  # Remove "number:" and strip spaces
-
-                filtered_data.loc[:, 2] = filtered_data[2].astype(str).str.replace('.0', '', regex=False).astype(int)
-
-                # Create a completely new column for the integer values
-                filtered_data['integer_column'] = filtered_data[2].astype(str).str.replace('.0', '', regex=False)
-                # Now convert to integers
-                filtered_data['integer_column'] = pd.to_numeric(filtered_data['integer_column'])
-                # Replace the original column
-                filtered_data[2] = filtered_data['integer_column']
-
-                filtered_data = filtered_data.drop('integer_column', axis=1)
-
-                # First convert column 5 to string type
-                filtered_data[5] = filtered_data[5].astype(str)
-
-                # Then apply the transformations
-                filtered_data[5] = filtered_data[5].str.replace("text:'", "", regex=False).str.split(" / ", expand=True)[0]
-
-                filtered_data = filtered_data[[5, 2]]
-
-                # Append optional entries if provided
-                if optional_1 or optional_2:
-                    optional_data = [optional_1, optional_2]
-                    filtered_data.loc[filtered_data.shape[0]] = optional_data
-
-                # Construct the output file path
-                dir_name = os.path.dirname(file_path)
-                base_name = os.path.basename(file_path).replace('.xls', '')
-                output_file_path = os.path.join(dir_name, f"processed_{base_name}.xlsx")
-
-                print(f"Saving to: {output_file_path}")
-
-                # Save the DataFrame to a new Excel file with "processed_" prefix
-                with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-                    filtered_data.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
-
-                processed_files.append(output_file_path)
-                print(f"Successfully saved: {output_file_path}")
-
-            except Exception as e:
-                error_msg = f"Error processing {file_path}: {str(e)}"
-                errors.append(error_msg)
-                print(error_msg)
+        self.run_button.setEnabled(False)
+        self.run_button.setText("Processing...")
+        self.log_display.clear()
+
+        # Process the files on a background thread so the window stays responsive
+        options = {"optional_1": optional_1, "optional_2": optional_2}
+        self.processing_thread = BatchThread("DPD", all_files, options,
+                                             self.metrics_checkbox.isChecked(),
+                                             self.profile_checkbox.isChecked(),
+                                             self.resume_checkbox.isChecked())
+        self.processing_thread.progress_update.connect(self.update_progress)
+        self.processing_thread.finished.connect(self.processing_finished)
+        self.processing_thread.start()
+
+    def processing_finished(self, processed_files, errors):
+        """Handle the completion of processing"""
+        self.run_button.setEnabled(True)
+        self.run_button.setText("Run")
 
         # Show appropriate message based on results
         if errors:
@@ -213,13 +182,26 @@ class DPDWindow:
         else:
             QMessageBox.warning(self.window, "No Files Processed", "No files were processed.")
 
+    def update_progress(self, message):
+        """Update the user interface with progress messages"""
+        print(message)  # Print to console
+        self.log_display.append(message)  # Also add to log display
+        # Make sure the new text is visible
+        scrollbar = self.log_display.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
     def go_back(self):
+        if not confirm_stop(self.window, self.processing_thread):
+            return
         # Show the main window again
         self.main_window.show()
         # Close this window
         self.window.close()
 
     def handle_close_event(self, event):
+        if not confirm_stop(self.window, self.processing_thread):
+            event.ignore()
+            return
         # Show the main window again
         self.main_window.show()
         # Accept the event to close the window
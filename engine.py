@@ -0,0 +1,516 @@
+"""Executes the carrier specs from carrier_specs.py
+
+A run is split into three phases so callers can overlap or instrument them:
+read_input() parses only the columns the spec keeps, transform() applies the typed
+conversions once and builds every output frame, write_outputs() streams the frames
+straight into xlsx files.
+
+Every row carries where it came from in two int32 columns: the sheet row number
+(ROW_COLUMN, as Excel or a text editor numbers it) and which source it was read from
+(SOURCE_COLUMN: the data sheet, the summary sheet, or 0 for rows the processor adds).
+They are not part of the regular outputs; with options["audit"] (or
+settings.AUDIT_ENABLED) an audit_<name>.xlsx lists every output row with its source.
+"""
+import contextlib
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+import aggregates
+import archives
+from boundaries import DEFAULT_SCAN_ROWS, count_footer_rows, no_data_message, resolve_data_start
+import column_types
+import controls
+import csv_format
+import read_cache
+import reference_match
+import settings
+import transaction_index
+import transaction_store
+from instrumentation import RunMetrics
+
+
+# Provenance columns, see the module docstring
+ROW_COLUMN = "_source_row"
+SOURCE_COLUMN = "_source"
+ADDED_SOURCE, DATA_SOURCE, SUMMARY_SOURCE = 0, 1, 2
+
+AUDIT_PREFIX = "audit_"
+
+
+def file_size(path):
+    try:
+        return archives.stat(path).st_size
+    except OSError:
+        return None
+
+
+def to_int(series):
+    """Whole numbers as int64; floats such as 8580.0 coming from Excel are accepted"""
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype("int64")
+    if pd.api.types.is_float_dtype(series) and series.notna().all() and (series % 1 == 0).all():
+        # Numeric cells converted directly instead of through their text
+        return series.astype("int64")
+    numbers = pd.to_numeric(series.astype(str).str.strip().str.replace(r"\.0$", "", regex=True))
+    return numbers.astype("int64")
+
+
+def parse_amount(series):
+    """Hungarian amounts such as "12 345,00" or "8580" as int64 forints
+
+    Spaces and non-breaking spaces are thousand separators and the comma is the decimal
+    separator. Amounts with a non-zero fraction are rejected instead of being rounded.
+    Empty cells stay missing (nullable Int64), so the control totals can report them.
+    """
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype("int64")
+    if pd.api.types.is_float_dtype(series):
+        numbers = series
+    else:
+        # Arrow-backed text, so the replacements below run in pyarrow instead of per Python string
+        text = series.astype(column_types.STRING).str.replace(r"\s", "", regex=True)
+        grouped = text.str.fullmatch(r"-?\d{1,3}(?:\.\d{3})+(?:,\d*)?").fillna(False)
+        if grouped.any():
+            text = text.where(~grouped, text.str.replace(".", "", regex=False))
+        numbers = pd.to_numeric(text.str.replace(",", ".", regex=False))
+    fraction = numbers % 1
+    fractional = fraction.notna() & (fraction != 0)
+    if fractional.any():
+        bad = series[fractional].iloc[0]
+        raise ValueError(f"Amount with fractional forints: {bad}")
+    return numbers.astype("Int64" if numbers.isna().any() else "int64")
+
+
+def to_text(series):
+    return series.astype(str)
+
+
+def first_segment(series):
+    """Keep the text before the first " / " (DPD puts the order number first)"""
+    return column_types.as_text(series).str.split(" / ", n=1).str[0]
+
+
+CONVERTERS = {
+    "int": to_int,
+    "amount": parse_amount,
+    "text": to_text,
+    "first_segment": first_segment,
+}
+
+
+def _after_first_t(ids):
+    # Split at "T" and keep the second part, or the whole ID if there is no "T"
+    return ids.str.split("T").str[1].fillna(ids)
+
+
+ID_CLEANERS = {
+    "strip_equal_quotes": lambda ids: ids.str.replace('="', '', regex=False).str.replace('"', '', regex=False),
+    "strip_pg_prefix": lambda ids: ids.str.replace('pg-', '', regex=False),
+    "after_first_t": _after_first_t,
+}
+
+
+def output_path(file_path, prefix):
+    """processed_<name>.xlsx next to the input file (next to the archive for archive members)"""
+    return os.path.join(os.path.dirname(archives.container(file_path)), f"{prefix}{archives.output_stem(file_path)}.xlsx")
+
+
+def _usecols(spec):
+    columns = spec.get("columns")
+    if columns is None:
+        return None
+    if spec.get("header"):
+        # A callable lets missing columns through so they can be reported by name
+        wanted = set(columns)
+        return lambda name: name in wanted
+    return columns
+
+
+def _read_table(spec, source, sheet=None, skip_rows=None, usecols=None, header=None, dtypes=None, nrows=None):
+    """Read one sheet or CSV with only the needed columns; source may be an archive member path"""
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    csv_options = {"sep": spec.get("csv_sep", ";")}
+    if name.lower().endswith(".csv") and settings.CSV_SNIFF_ENABLED and isinstance(source, str):
+        csv_options = csv_format.sniff(source, csv_options["sep"], spec.get("carrier", ""))
+    with archives.open_input(source) if isinstance(source, str) else contextlib.nullcontext(source) as handle:
+        if name.lower().endswith(".csv"):
+            return pd.read_csv(handle, skiprows=skip_rows, usecols=usecols, header=header, dtype=dtypes,
+                               nrows=nrows, **csv_options)
+        return pd.read_excel(handle, sheet_name=spec.get("sheet", 0) if sheet is None else sheet,
+                             skiprows=skip_rows, usecols=usecols, header=header, dtype=dtypes, nrows=nrows)
+
+
+def read_head(spec, file_path, nrows):
+    """First rows of the input: column names only for header specs, kept columns otherwise"""
+    if spec.get("header"):
+        return _read_table(spec, file_path, header=0, nrows=nrows)
+    return _read_table(spec, file_path, usecols=_usecols(spec), nrows=nrows)
+
+
+def _split_footer(frame, footer_rows):
+    """(data rows, rows below them); the footer is kept as text so it caches like the data"""
+    if not footer_rows:
+        return frame, frame.iloc[0:0].astype("string")
+    return frame.iloc[:-footer_rows], frame.iloc[-footer_rows:].astype("string")
+
+
+def _number_rows(frame, first_row):
+    """Add the 1-based sheet row number of every row, the first one being first_row"""
+    frame[ROW_COLUMN] = np.arange(first_row, first_row + len(frame), dtype="int32")
+    return frame
+
+
+def read_raw(spec, file_path, nrows):
+    """First rows of the sheet (or CSV) the spec reads, all columns, as text"""
+    return _read_table(spec, file_path, header=None, dtypes=str, nrows=nrows)
+
+
+def _read_data_slice(spec, file_path, progress):
+    """Read the data rows of a positional sheet, locating header and total rows first
+
+    Only the first rows are parsed to find where the data starts; the total rows are then
+    cut from the end of the full read. The spec's skip_rows/footer_rows are the fallback.
+    Returns (data rows, total rows).
+    """
+    rules = spec["boundaries"]
+    usecols = _usecols(spec)
+    head = _read_table(spec, file_path, usecols=usecols, nrows=rules.get("scan_rows", DEFAULT_SCAN_ROWS))
+    data_start, found = resolve_data_start(head, rules, spec.get("skip_rows"))
+    if data_start is None:
+        raise ValueError(no_data_message(rules, len(head)))
+    if not found:
+        progress(f"Warning: no data rows found in the first {len(head)} rows, skipping {data_start} rows")
+
+    frame = _read_table(spec, file_path, skip_rows=data_start or None, usecols=usecols,
+                        dtypes=spec.get("dtypes"))
+    _number_rows(frame, data_start + 1)
+    footer_rows = count_footer_rows(frame, rules)
+    if footer_rows is None:
+        footer_rows = spec.get("footer_rows", 0)
+    return _split_footer(frame, footer_rows)
+
+
+def _read_summary(spec, file_path):
+    """Rows of the summary sheet below the anchor that match the spec, as (key, value) frame"""
+    summary = spec["summary"]
+    with archives.open_input(file_path) as source:
+        raw = pd.read_excel(source, sheet_name=summary["sheet"], header=None)
+
+    # Find the anchor row with one vectorized pass over the sheet
+    hits = raw.astype(str).apply(lambda column: column.str.contains(summary["anchor"], regex=False)).any(axis=1)
+    if not hits.any():
+        return None
+    below = raw.iloc[int(hits.values.argmax()) + 1:]
+
+    match_column = summary["match_column"]
+    rows = below[below[match_column].astype(str).str.contains(summary["match"], na=False, regex=False)]
+    values = to_int(rows[summary["value_column"]])
+    if summary.get("negate"):
+        values = -values.abs()
+    return pd.DataFrame({summary["key_column"]: summary["key"], summary["amount_column"]: values.values,
+                         ROW_COLUMN: (rows.index + 1).astype("int32")})
+
+
+# Spec keys that change what read_input returns; they are part of the read cache key
+READ_PARAMETERS = ["sheet", "csv_sep", "header", "skip_rows", "footer_rows", "boundaries", "columns", "dtypes",
+                   "summary"]
+
+
+def _parse_input(spec, file_path, progress):
+    """(data rows, total rows below the data) of the input"""
+    header = 0 if spec.get("header") else None
+    if "boundaries" in spec:
+        return _read_data_slice(spec, file_path, progress)
+    frame = _read_table(spec, file_path, skip_rows=spec.get("skip_rows") or None,
+                        usecols=_usecols(spec), header=header, dtypes=spec.get("dtypes"))
+    # Below the skipped rows and the header row, if there is one
+    _number_rows(frame, spec.get("skip_rows", 0) + (2 if header == 0 else 1))
+    return _split_footer(frame, spec.get("footer_rows", 0))
+
+
+def _cached(spec, file_path, part, parse):
+    """Return (frame, hit) for one part of the input, using the read cache when available"""
+    # CSV goes through pandas' C parser, which is about as fast as loading the sidecar
+    if not read_cache.is_available() or file_path.lower().endswith(".csv"):
+        return parse(), False
+    params = {name: spec.get(name) for name in READ_PARAMETERS}
+    key = read_cache.cache_key(file_path, params, part)
+    frame = read_cache.load(key)
+    if frame is not None:
+        return frame, True
+    frame = parse()
+    if frame is not None:
+        read_cache.store(key, frame)
+    return frame, False
+
+
+def read_input(spec, file_path, metrics=None, progress=print):
+    """Parse the input file and return a dict with the data frame, the rows below it
+    (totals) and the summary rows if any"""
+    metrics = metrics or RunMetrics(spec["carrier"], enabled=False)
+
+    parsed = {}
+
+    def parse(part):
+        # Both parts come out of one parse; the second lookup reuses it on a cache miss
+        if not parsed:
+            parsed["frame"], parsed["footer"] = _parse_input(spec, file_path, progress)
+        return parsed[part]
+
+    with metrics.span("read", file_path) as span:
+        frame, hit = _cached(spec, file_path, "frame", lambda: parse("frame"))
+        footer, footer_hit = _cached(spec, file_path, "footer", lambda: parse("footer"))
+        if hit and footer_hit:
+            span.stage = "read_cached"
+        span.rows = len(frame)
+        span.bytes = file_size(file_path)
+
+    source = {"file_path": file_path, "frame": frame, "footer": footer, "summary": None}
+    if "summary" in spec:
+        with metrics.span("read_summary", file_path) as span:
+            source["summary"], _ = _cached(spec, file_path, "summary", lambda: _read_summary(spec, file_path))
+            span.rows = 0 if source["summary"] is None else len(source["summary"])
+    return source
+
+
+def reference_index(reference):
+    """Hivatkozás -> Sorszám lookup (see column_types.lookup) from the parsed XML frame or a dict"""
+    if reference is None or isinstance(reference, pd.Series):
+        return reference
+    if isinstance(reference, dict):
+        return column_types.reference_series(list(reference.keys()), list(reference.values()))
+    return column_types.reference_series(reference['Hivatkozás'], reference['Sorszám'])
+
+
+def near_matcher(spec, options, index):
+    """NearMatcher over the reference index if the spec's mapping has the near-match pass
+    and it is switched on (options["near_match"], settings.NEAR_MATCH_ENABLED), else None
+
+    Building it sorts the whole reference set, so batches build it once and pass it to
+    every transform.
+    """
+    if not spec.get("mapping", {}).get("near_match") or index is None or index.empty:
+        return None
+    if not (options or {}).get("near_match", settings.NEAR_MATCH_ENABLED):
+        return None
+    return reference_match.NearMatcher(index)
+
+
+def _resolve_near_matches(frame, id_column, index, matcher, mapping, file_path, progress):
+    """Second pass over the IDs without an exact reference (see reference_match.py);
+    returns how many distinct IDs were looked at"""
+    ids = frame[id_column]
+    unmatched = ids[ids.notna() & ~ids.isin(index.index)].astype(str)
+    if unmatched.empty:
+        return 0
+    keys = unmatched.unique().tolist()
+    resolutions = matcher.resolve_all(keys, settings.NEAR_MATCH_MIN_CONFIDENCE / 100)
+    resolved = {resolution.id: resolution.sorszam for resolution in resolutions if resolution.sorszam is not None}
+    if resolved:
+        values = unmatched.map(resolved).dropna()
+        target = frame[mapping["target"]]
+        new = [value for value in values.unique() if value not in target.cat.categories]
+        frame[mapping["target"]] = target.cat.add_categories(new) if new else target
+        frame.loc[values.index, mapping["target"]] = values.to_numpy()
+    for line in reference_match.resolution_lines(os.path.basename(file_path), resolutions, mapping["default"]):
+        progress(line)
+    return len(keys)
+
+
+def _append_rows(frame, rows):
+    rows = [row for row in rows if row is not None and len(row)]
+    if not rows:
+        return frame
+    added = np.zeros(1, dtype="int32")
+    rows = [row if ROW_COLUMN in row.columns else row.assign(**{SOURCE_COLUMN: added.repeat(len(row)),
+                                                                  ROW_COLUMN: added.repeat(len(row))})
+            for row in rows]
+    return pd.concat([frame] + rows, ignore_index=True)
+
+
+def _audit_frame(spec, file_path, frame):
+    """Rows of the main output with the file, sheet and row each one was read from"""
+    columns = next(iter(spec["outputs"].values()))
+    audit = pd.DataFrame({"Output row": np.arange(1, len(frame) + 1)})
+    for column in columns:
+        label = column if isinstance(column, str) else f"Column {get_column_letter(column + 1)}"
+        audit[label] = frame[column].to_numpy()
+
+    sheet = spec.get("sheet", 0)
+    if file_path.lower().endswith(".csv"):
+        sheet = ""
+    elif isinstance(sheet, int):
+        sheet = f"Sheet {sheet + 1}"
+    summary_sheet = spec["summary"]["sheet"] if "summary" in spec else ""
+    name = os.path.basename(file_path)
+    codes = frame[SOURCE_COLUMN].to_numpy()
+    audit["Source file"] = np.array(["", name, name], dtype=object)[codes]
+    audit["Sheet"] = np.array(["(added by the processor)", sheet, summary_sheet], dtype=object)[codes]
+    audit["Source row"] = frame[ROW_COLUMN].astype("Int32").where(frame[ROW_COLUMN] > 0)
+    return audit
+
+
+def transform(spec, source, options=None, reference=None, progress=print, metrics=None, matcher=None):
+    """Apply the spec to the parsed input and return {output prefix: frame}"""
+    options = options or {}
+    metrics = metrics or RunMetrics(spec["carrier"], enabled=False)
+    file_path = source["file_path"]
+    frame = source["frame"]
+
+    missing_columns = [col for col in spec.get("required", []) if col not in frame.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    with metrics.span("transform", file_path) as span:
+        frame = frame.reset_index(drop=True)
+        frame[SOURCE_COLUMN] = np.full(len(frame), DATA_SOURCE, dtype="int32")
+        for column, type_name in spec.get("types", {}).items():
+            frame[column] = CONVERTERS[type_name](frame[column])
+
+        id_column = spec.get("id_column")
+        if id_column:
+            cleaner = ID_CLEANERS[spec["id_cleaners"][options["file_type"]]]
+            frame[id_column] = cleaner(column_types.as_text(frame[id_column]))
+        span.rows = len(frame)
+
+    if "mapping" in spec:
+        with metrics.span("map_ids", file_path) as span:
+            progress("Mapping transaction IDs to reference numbers...")
+            mapping = spec["mapping"]
+            index = reference_index(reference)
+            frame[mapping["target"]] = column_types.lookup(frame[id_column], index, mapping["default"])
+            span.rows = len(frame)
+        matcher = matcher or near_matcher(spec, options, index)
+        if matcher is not None:
+            with metrics.span("near_match", file_path) as span:
+                span.rows = _resolve_near_matches(frame, id_column, index, matcher, mapping, file_path, progress)
+
+    extra_rows = []
+    if "summary" in spec:
+        summary = source["summary"]
+        if summary is None:
+            progress(f"Warning: '{spec['summary']['anchor']}' not found in file {file_path}")
+        else:
+            summary = summary.assign(**{SOURCE_COLUMN: np.full(len(summary), SUMMARY_SOURCE, dtype="int32")})
+        extra_rows.append(summary)
+
+    if "fee_row" in spec:
+        fee_row = spec["fee_row"]
+        fee_total = frame[fee_row["column"]].sum()
+        extra_rows.append(pd.DataFrame({fee_row["key_column"]: [fee_row["key"]],
+                                        fee_row["amount_column"]: [-abs(int(fee_total))]}))
+
+    totals = None
+    if "controls" in spec:
+        totals = controls.compute(spec, frame, source.get("footer"), extra_rows)
+        totals["file_type"] = options.get("file_type", "")
+        problems = controls.check(totals)
+        progress(controls.summary_line(totals, problems))
+        if problems:
+            message = f"Control totals of {os.path.basename(file_path)}: {'; '.join(problems)}"
+            if options.get("strict_totals", settings.CONTROL_TOTALS_STRICT):
+                raise ValueError(message)
+            progress(f"Warning: {message}")
+
+    keys = None
+    if "dedup_key" in spec and settings.DEDUP_ENABLED:
+        keys = transaction_index.transaction_keys(frame, spec["dedup_key"])
+
+    optional_1 = options.get("optional_1", "")
+    optional_2 = options.get("optional_2", "")
+    if spec.get("optional_row") and (optional_1 or optional_2):
+        first_output = next(iter(spec["outputs"].values()))
+        extra_rows.append(pd.DataFrame({first_output[0]: [optional_1], first_output[1]: [optional_2]}))
+
+    frame = _append_rows(frame, extra_rows)
+    outputs = {prefix: frame[columns] for prefix, columns in spec["outputs"].items()}
+    if totals is not None:
+        # Travels with the main output to write_outputs, which books it in the aggregates
+        next(iter(outputs.values())).attrs["control_totals"] = totals
+    if options.get("audit", settings.AUDIT_ENABLED):
+        outputs[AUDIT_PREFIX] = _audit_frame(spec, file_path, frame)
+
+    if keys is not None:
+        # Checked and recorded in one transaction, so the files of a batch are checked against
+        # each other in whatever order they get here; last, so a file that fails earlier leaves
+        # no keys behind. write_outputs takes them back out if the outputs cannot be written.
+        with metrics.span("dedup", file_path) as span:
+            file_name = os.path.basename(file_path)
+            seen_before, recorded = transaction_index.check_and_record(
+                spec["carrier"], keys, read_cache.content_hash(file_path), file_name)
+            span.rows = len(keys)
+        next(iter(outputs.values())).attrs["recorded_keys"] = recorded
+        for line in transaction_index.duplicate_lines(file_name, keys[keys.duplicated()], seen_before):
+            progress(line)
+    return outputs
+
+
+def _cell_values(series):
+    """Column values as plain Python objects, with missing values as empty cells"""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def write_xlsx(frame, path, sheet_name="Sheet1", header=False):
+    """Stream the frame into an xlsx sheet with openpyxl's write-only mode; the column
+    names are written as the first row only with header=True
+
+    The workbook is saved to a temporary file next to path and renamed over it, so a crash
+    never leaves a half-written output behind.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    columns = [_cell_values(frame.iloc[:, i]) for i in range(frame.shape[1])]
+    if header:
+        sheet.append([str(column) for column in frame.columns])
+    for row in zip(*columns):
+        sheet.append(row)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        workbook.save(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_outputs(spec, file_path, outputs, progress=print, metrics=None):
+    """Write every output frame next to the input and return the paths in spec order"""
+    metrics = metrics or RunMetrics(spec["carrier"], enabled=False)
+    paths = []
+    try:
+        for prefix, frame in outputs.items():
+            path = output_path(file_path, prefix)
+            progress(f"Saving to: {path}")
+            with metrics.span("write", file_path) as span:
+                write_xlsx(frame, path, header=prefix == AUDIT_PREFIX)
+                span.rows = len(frame)
+                span.bytes = file_size(path)
+            paths.append(path)
+    except BaseException:
+        recorded = next(iter(outputs.values())).attrs.get("recorded_keys")
+        if recorded is not None:
+            transaction_index.forget(recorded)
+        raise
+
+    if settings.HISTORY_ENABLED and paths:
+        with metrics.span("history", file_path) as span:
+            # The first output holds the booked rows; the others only add detail columns
+            span.rows = transaction_store.record(spec["carrier"], file_path, paths[0], next(iter(outputs.values())))
+
+    totals = next(iter(outputs.values())).attrs.get("control_totals")
+    if settings.TOTALS_ENABLED and paths and totals is not None:
+        with metrics.span("totals", file_path):
+            aggregates.record(spec["carrier"], file_path, paths[0], totals)
+    return paths
+
+
+def process(spec, file_path, options=None, progress=print, metrics=None, reference=None, matcher=None):
+    """Read, transform and write one input file; returns the main output path"""
+    source = read_input(spec, file_path, metrics, progress)
+    outputs = transform(spec, source, options, reference, progress, metrics, matcher)
+    return write_outputs(spec, file_path, outputs, progress, metrics)[0]
@@ -0,0 +1,376 @@
+"""Golden-output check of the engine against the first release's processing code
+
+Every case runs twice on the same input, once through legacy.py and once through the
+engine, each in a fresh worker process (with the same libraries loaded up front) and in
+its own copy of the input folder. The processed_ and processed_extended_ workbooks of
+the two runs are then compared cell by cell, and the wall time and peak memory of both
+are reported side by side, so a change to a fast path can be accepted on evidence:
+
+    python cli.py equivalence --rows 100000 --repeat 3
+    python cli.py equivalence --carrier simple-pay --type pg --xml refs.xml anonymized.csv
+
+Without files the inputs are synthetic: laid out like the carriers' exports, with a
+seeded random content and the given number of rows. The engine runs without the
+duplicate index, history, totals and read cache, which have no legacy counterpart, and
+without the near-match pass unless the case switches it on.
+
+The synthetic Simple Pay exports contain near-miss IDs (leading zeros, another prefix,
+the last digit cut off) that the legacy code books under the default Sorszám. The
+"Simple Pay near match" case runs the pg export with the near-match pass on and lists
+the Sorszám cells it is meant to change in its expected differences; any other
+difference, or an expected one that does not appear, fails the case.
+Cells compare as Excel shows them: numbers by value, text only equal to text, and a
+missing cell the same as an empty one.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+# Carriers the first release processed
+CARRIERS = ["GLS", "DPD", "Foxpost", "Simple Pay"]
+OUTPUT_PREFIXES = ["processed_extended_", "processed_"]
+# .xls sheets end at 65536 rows
+XLS_MAX_ROWS = 65000
+
+# options as typed into the windows: optional_1, optional_2 (positive), and for Simple Pay
+# file_type, xml_path and near_match. expected maps output file names to the cells the
+# engine is meant to change, {"A12": value written by the engine}
+Case = namedtuple("Case", ["name", "carrier", "file_path", "options", "expected"], defaults=[None])
+
+# Near-miss IDs in the synthetic Simple Pay exports, by row number modulo 10
+NEAR_MISSES = {
+    3: lambda number: f"00{number}",  # leading zeros
+    5: lambda number: f"X9-{number}",  # another prefix
+    7: lambda number: str(number)[:-1],  # last digit cut off
+}
+
+
+def _write_xml(path, references):
+    ns = "urn:schemas-microsoft-com:office:spreadsheet"
+
+    def cell(value):
+        return f'<Cell><Data ss:Type="String">{value}</Data></Cell>'
+
+    rows = [f"<Row>{cell('Sorszám')}{cell('Hivatkozás')}</Row>"]
+    rows += [f"<Row>{cell(sorszam)}{cell(reference)}</Row>" for sorszam, reference in references]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0"?><Workbook xmlns="{ns}" xmlns:ss="{ns}">'
+                f'<Worksheet ss:Name="Munka1"><Table>{"".join(rows)}</Table></Worksheet></Workbook>')
+
+
+def _gls(path, rows, rng):
+    header = [["GLS General Logistics Systems Hungary Kft."], [], ["Ügyfél név: Teszt Kft."],
+              ["Email: teszt@example.com"], ["Bankszámlaszám: 11111111-22222222"],
+              ["Utalás dátuma: 2025. 03. 28."], [],
+              ["Jelentés szám", "Csomagszám", "Utánvét hivatkozás", "Kiszállítási dátum", "Utánvét összeg",
+               "Pénznem", "Cím"]]
+    amounts = [rng.randint(1000, 90000) for _ in range(rows)]
+    data = [[79337810 + i, 3348922086 + i, f"SA25/H{31391 + i:07d}", "2025-03-26", amount, "HUF", f"Cím {i}"]
+            for i, amount in enumerate(amounts)]
+    pd.DataFrame(header + data + [[None, None, None, None, sum(amounts)]]).to_excel(path, header=False, index=False)
+
+
+def _foxpost(path, rows, rng):
+    head = [[f"Foxpost fejléc {i}"] for i in range(10)]
+    data = [[i, None, None, None, f"FOX{i:08d}", None, None, rng.randint(1000, 90000), None] for i in range(rows)]
+    summary = [["Foxpost Zrt."], [], ["ÖSSZESÍTÉS"], ["UTÁNVÉT", rng.randint(10 ** 5, 10 ** 7)],
+               ["PARTNER díj", rng.randint(1000, 90000)], ["Egyéb", 1]]
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(head + data).to_excel(writer, sheet_name="utánvétek", header=False, index=False)
+        pd.DataFrame(summary).to_excel(writer, sheet_name="összesítés", header=False, index=False)
+
+
+def _dpd(path, rows, rng):
+    import xlwt
+
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet("Sheet1")
+    for row in range(3):
+        sheet.write(row, 0, f"DPD fejléc {row}")
+    for i in range(rows):
+        sheet.write(i + 3, 0, i)
+        sheet.write(i + 3, 2, float(rng.randint(100, 90000)))
+        sheet.write(i + 3, 5, f"ORD{i:07d} / Vevő {i}")
+    workbook.save(path)
+
+
+def _reference_number(i):
+    # Nine digits, 100 apart: an ID with its last digit cut off still starts only one
+    return 500000037 + 100 * i
+
+
+def _simple_pay(folder, rows, rng):
+    xml_path = os.path.join(folder, "reference.xml")
+    _write_xml(xml_path, [(str(1000 + i), f"REF-{_reference_number(i)}") for i in range(rows)])
+    cases = []
+    for file_type, id_format in [("equal", '="{}"'), ("pg", "pg-{}"), ("t", "2025T{}")]:
+        lines = ["Kereskedői tranzakció ID;Tranzakció összege;Tranzakciós jutalék;Vásárló;E-mail cím"]
+        near_misses = {}
+        for i in range(rows):
+            k = rng.randrange(rows)
+            if i % 10 == 9:
+                # No reference and nothing a near match could resolve
+                reference = f"{i}X"
+            elif i % 10 in NEAR_MISSES:
+                reference = NEAR_MISSES[i % 10](_reference_number(k))
+                near_misses[f"A{i + 1}"] = str(1000 + k)
+            else:
+                reference = _reference_number(k)
+            lines.append(f"{id_format.format(reference)};{rng.randint(1000, 90000)},00;"
+                         f"{rng.randint(10, 900)},00;Vevő {i};vevo{i}@example.com")
+        path = os.path.join(folder, f"simplepay_{file_type}.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        options = {"file_type": file_type, "xml_path": xml_path}
+        cases.append(Case(f"Simple Pay {file_type}", "Simple Pay", path, options))
+        if file_type == "pg":
+            expected = {f"{prefix}simplepay_pg.xlsx": near_misses for prefix in OUTPUT_PREFIXES}
+            cases.append(Case("Simple Pay near match", "Simple Pay", path, dict(options, near_match=True), expected))
+    return cases
+
+
+def synthetic_cases(folder, rows, seed=1, progress=print):
+    """Write synthetic inputs of every legacy carrier into folder and return their cases"""
+    rng = random.Random(seed)
+    optional = {"optional_1": "Díj", "optional_2": "1500"}
+    cases = []
+
+    path = os.path.join(folder, "gls.xlsx")
+    _gls(path, rows, rng)
+    cases.append(Case("GLS", "GLS", path, dict(optional)))
+
+    try:
+        path = os.path.join(folder, "dpd.xls")
+        _dpd(path, min(rows, XLS_MAX_ROWS), rng)
+        cases.append(Case("DPD", "DPD", path, dict(optional)))
+    except ImportError:
+        progress("Skipping DPD: writing the synthetic .xls input needs the xlwt library")
+
+    path = os.path.join(folder, "foxpost.xlsx")
+    _foxpost(path, rows, rng)
+    cases.append(Case("Foxpost", "Foxpost", path, {}))
+
+    return cases + _simple_pay(folder, rows, rng)
+
+
+def _preload():
+    """Import what either side uses, so the memory of neither run includes loading libraries"""
+    import engine  # noqa: F401
+    import legacy  # noqa: F401
+    import processors  # noqa: F401
+    import xlrd  # noqa: F401
+    from openpyxl import reader, writer  # noqa: F401
+
+
+def _run_legacy(case):
+    """Worker process entry point: (seconds, peak bytes) of one legacy run"""
+    import legacy
+    from instrumentation import PeakMemory
+
+    _preload()
+    options = case.options
+    with warnings.catch_warnings(), PeakMemory() as memory:
+        # The legacy code assigns into slices all over; pandas warns about every one
+        warnings.simplefilter("ignore")
+        started = time.perf_counter()
+        if case.carrier == "Simple Pay":
+            legacy.process_simple_pay(case.file_path, options["file_type"], legacy.process_xml_file(options["xml_path"]))
+        elif case.carrier == "Foxpost":
+            legacy.process_foxpost(case.file_path)
+        else:
+            process = legacy.process_gls if case.carrier == "GLS" else legacy.process_dpd
+            process(case.file_path, options.get("optional_1", ""), options.get("optional_2", ""))
+        seconds = time.perf_counter() - started
+    return seconds, memory.used_bytes
+
+
+def _run_engine(case):
+    """Worker process entry point: (seconds, peak bytes) of one engine run"""
+    import engine
+    import processors
+    import settings
+    from carrier_specs import SPECS
+    from instrumentation import PeakMemory
+
+    _preload()
+    settings.DEDUP_ENABLED = settings.HISTORY_ENABLED = settings.TOTALS_ENABLED = False
+    settings.READ_CACHE_ENABLED = False
+    options = dict(case.options, near_match=bool(case.options.get("near_match")))
+    if options.get("optional_2"):
+        options["optional_2"] = -abs(int(options["optional_2"]))
+    messages = []
+    with PeakMemory() as memory:
+        started = time.perf_counter()
+        reference = None
+        if case.carrier == "Simple Pay":
+            reference = processors.load_references([options["xml_path"]], messages.append)
+        engine.process(SPECS[case.carrier], case.file_path, options, messages.append, None, reference)
+        seconds = time.perf_counter() - started
+    return seconds, memory.used_bytes
+
+
+def _measure(run, case, repeat):
+    """Best time and highest peak over repeat runs, each in a fresh worker process"""
+    times, peaks = [], []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            seconds, peak = executor.submit(run, case).result()
+        times.append(seconds)
+        peaks.append(peak)
+    return min(times), None if None in peaks else max(peaks)
+
+
+def _cells(path):
+    """Rows of the first sheet, without trailing empty cells and rows"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = []
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            row = list(row)
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(row)
+    finally:
+        workbook.close()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def _same(expected, actual):
+    numbers = (int, float)
+    if isinstance(expected, numbers) and isinstance(actual, numbers) \
+            and not isinstance(expected, bool) and not isinstance(actual, bool):
+        return expected == actual
+    return type(expected) is type(actual) and expected == actual
+
+
+def compare_workbooks(expected_path, actual_path):
+    """[(cell reference, legacy value, engine value)] of every cell that differs"""
+    expected, actual = _cells(expected_path), _cells(actual_path)
+    differences = []
+    for row in range(max(len(expected), len(actual))):
+        expected_row = expected[row] if row < len(expected) else []
+        actual_row = actual[row] if row < len(actual) else []
+        for column in range(max(len(expected_row), len(actual_row))):
+            left = expected_row[column] if column < len(expected_row) else None
+            right = actual_row[column] if column < len(actual_row) else None
+            if not _same(left, right):
+                differences.append((f"{get_column_letter(column + 1)}{row + 1}", left, right))
+    return differences
+
+
+def _outputs(folder):
+    return sorted(name for name in os.listdir(folder)
+                  if name.endswith(".xlsx") and any(name.startswith(prefix) for prefix in OUTPUT_PREFIXES))
+
+
+def run_case(case, work_dir, repeat=1):
+    """Run one case on both sides and compare the outputs; returns a result dict"""
+    result = {"case": case}
+    for side, run in [("legacy", _run_legacy), ("engine", _run_engine)]:
+        folder = os.path.join(work_dir, side, case.name.replace(" ", "_"))
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        file_path = os.path.join(folder, os.path.basename(case.file_path))
+        shutil.copyfile(case.file_path, file_path)
+        try:
+            result[side] = _measure(run, case._replace(file_path=file_path), repeat)
+        except Exception as e:
+            result[side] = None
+            result[f"{side}_error"] = f"{type(e).__name__}: {e}"
+        result[f"{side}_dir"] = folder
+
+    legacy_outputs, engine_outputs = _outputs(result["legacy_dir"]), _outputs(result["engine_dir"])
+    result["outputs"] = legacy_outputs
+    # Per output: description lines of the differences the case does not expect, and the
+    # number of expected ones found
+    result["differences"] = {}
+    result["expected"] = {}
+    for name in sorted(set(legacy_outputs) | set(engine_outputs)):
+        if name not in engine_outputs:
+            result["differences"][name] = ["written by legacy only"]
+            continue
+        if name not in legacy_outputs:
+            result["differences"][name] = ["written by the engine only"]
+            continue
+        wanted = dict((case.expected or {}).get(name, {}))
+        unexpected = []
+        found = 0
+        for reference, left, right in compare_workbooks(os.path.join(result["legacy_dir"], name),
+                                                         os.path.join(result["engine_dir"], name)):
+            if reference in wanted and _same(wanted.pop(reference), right):
+                found += 1
+            else:
+                unexpected.append(f"{reference}: legacy {left!r}, engine {right!r}")
+        unexpected += [f"{reference}: expected the engine to write {value!r}, it wrote the legacy value"
+                       for reference, value in wanted.items()]
+        if unexpected:
+            result["differences"][name] = unexpected
+        if found:
+            result["expected"][name] = found
+    return result
+
+
+def _mib(value):
+    return "n/a" if value is None else f"{value / (1024 * 1024):.1f}"
+
+
+def report_lines(results, limit=10):
+    """Side-by-side table of the results, followed by the differences"""
+    lines = [f"{'Case':<22} {'Legacy s':>9} {'Engine s':>9} {'Speed-up':>9} {'Legacy MiB':>11} {'Engine MiB':>11}  "
+             "Outputs"]
+    for result in results:
+        legacy, engine = result["legacy"] or (None, None), result["engine"] or (None, None)
+        speedup = f"{legacy[0] / engine[0]:.1f}x" if legacy[0] and engine[0] else "-"
+        seconds = ["-" if value is None else f"{value:.3f}" for value in (legacy[0], engine[0])]
+        differing = len(result["differences"])
+        if differing:
+            verdict = f"{differing} DIFFERENT"
+        elif result["expected"]:
+            verdict = f"{len(result['outputs'])} as expected ({sum(result['expected'].values())} cells changed)"
+        else:
+            verdict = f"{len(result['outputs'])} equal"
+        lines.append(f"{result['case'].name:<22} {seconds[0]:>9} {seconds[1]:>9} {speedup:>9} "
+                     f"{_mib(legacy[1]):>11} {_mib(engine[1]):>11}  {verdict}")
+    for result in results:
+        for side in ("legacy", "engine"):
+            if f"{side}_error" in result:
+                lines.append(f"{result['case'].name}: {side} failed: {result[f'{side}_error']}")
+        for name, count in result["expected"].items():
+            lines.append(f"{result['case'].name}, {name}: {count} cells differ as expected")
+        for name, details in result["differences"].items():
+            lines.append(f"{result['case'].name}, {name}: {len(details)} unexpected differences")
+            lines += [f"  {detail}" for detail in details[:limit]]
+            if len(details) > limit:
+                lines.append(f"  ... and {len(details) - limit} more")
+    return lines
+
+
+def run(cases=None, rows=1000, repeat=1, work_dir=None, progress=print):
+    """Run the given cases (synthetic ones if None); returns (results, work_dir)"""
+    work_dir = work_dir or tempfile.mkdtemp(prefix="equivalence_")
+    if cases is None:
+        inputs = os.path.join(work_dir, "inputs")
+        os.makedirs(inputs, exist_ok=True)
+        progress(f"Writing synthetic inputs with {rows} rows to {inputs}")
+        cases = synthetic_cases(inputs, rows, progress=progress)
+    results = []
+    for case in cases:
+        progress(f"Running {case.name}...")
+        results.append(run_case(case, work_dir, repeat))
+    return results, work_dir
+
+
+def all_equal(results):
+    """True if both sides ran every case and no output differs beyond what the case expects"""
+    return all(not result["differences"] and result["legacy"] and result["engine"] for result in results)
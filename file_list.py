@@ -0,0 +1,414 @@
+"""Input file list shared by the carrier windows
+
+Files can be added with the file dialog, a whole folder (scanned recursively on a
+background thread with os.scandir), or by dropping files and folders on the list. Paths
+are kept once each in a QAbstractListModel; the view only asks for the rows it shows, so
+the list stays responsive with tens of thousands of entries.
+
+Archives (.zip, .gz) are listed as their matching members, which are processed and
+previewed like files without being extracted (see archives.py).
+
+PreviewPane shows the first rows of the selected file, read on a background thread (see
+preview.py).
+"""
+import fnmatch
+import os
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex, QThread, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QListView, QFileDialog, \
+    QAbstractItemView, QTableView
+
+import archives
+import preview
+
+# Outputs of earlier runs and Excel lock files that sit next to the inputs
+EXCLUDED_PATTERNS = ["processed_*", "metrics_*", "profile_*", "~$*"]
+
+
+def _matches(name, patterns):
+    name = name.lower()
+    return any(fnmatch.fnmatch(name, pattern.lower()) for pattern in patterns)
+
+
+def scan_folder(folder, patterns, recursive=True, excluded=EXCLUDED_PATTERNS):
+    """Yield the files below folder whose name matches one of the glob patterns"""
+    folders = [folder]
+    while folders:
+        current = folders.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            folders.append(entry.path)
+                    elif entry.is_file() and _matches(entry.name, patterns) and not _matches(entry.name, excluded):
+                        yield entry.path
+        except OSError:
+            # Unreadable folders (permissions, disconnected drives) are skipped
+            continue
+
+
+def path_key(path):
+    """Normalized path used to drop duplicates"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class FolderScanThread(QThread):
+    """Scans folders in the background and hands over the files in batches"""
+    files_found = pyqtSignal(list)
+    scan_finished = pyqtSignal(int)
+
+    def __init__(self, folders, patterns, recursive=True, batch_size=500):
+        super().__init__()
+        self.folders = folders
+        self.patterns = patterns
+        self.recursive = recursive
+        self.batch_size = batch_size
+
+    def run(self):
+        found = 0
+        batch = []
+        for folder in self.folders:
+            for path in scan_folder(folder, self.patterns + archives.PATTERNS, self.recursive):
+                if self.isInterruptionRequested():
+                    # The list was cleared while scanning; drop what was found
+                    self.scan_finished.emit(found)
+                    return
+                batch += archives.expand([path], self.patterns)
+                if len(batch) >= self.batch_size:
+                    self.files_found.emit(batch)
+                    found += len(batch)
+                    batch = []
+        if batch:
+            self.files_found.emit(batch)
+            found += len(batch)
+        self.scan_finished.emit(found)
+
+
+class FileListModel(QAbstractListModel):
+    """Ordered list of unique file paths"""
+
+    def __init__(self):
+        super().__init__()
+        self._paths = []
+        self._keys = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self._paths[index.row()]
+        return None
+
+    def add_paths(self, paths):
+        """Append the paths not in the list yet, in one insert; returns how many were added"""
+        new_paths = []
+        for path in paths:
+            key = path_key(path)
+            if key not in self._keys:
+                self._keys.add(key)
+                new_paths.append(path)
+        if new_paths:
+            first = len(self._paths)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_paths) - 1)
+            self._paths.extend(new_paths)
+            self.endInsertRows()
+        return len(new_paths)
+
+    def remove_rows(self, rows):
+        """Remove the given row numbers, one remove per run of adjacent rows"""
+        ranges = []
+        for row in sorted(set(rows)):
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        # Bottom-up, so the ranges still to remove keep their row numbers
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for path in self._paths[first:last + 1]:
+                self._keys.discard(path_key(path))
+            del self._paths[first:last + 1]
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._keys = set()
+        self.endResetModel()
+
+    def paths(self):
+        return list(self._paths)
+
+
+class FileListView(QListView):
+    """List view that accepts dropped files and folders; Delete removes the selected rows"""
+    paths_dropped = pyqtSignal(list)
+    delete_pressed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # Fixed row height and batched layout keep very long lists fast
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Delete, Qt.Key_Backspace):
+            self.delete_pressed.emit()
+        else:
+            super().keyPressEvent(event)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            self.paths_dropped.emit(paths)
+            event.acceptProposedAction()
+
+
+class FileSelector(QWidget):
+    """File list with Browse Files / Add Folder / Clear buttons; files and folders can be dropped"""
+    files_changed = pyqtSignal(int)
+    current_file_changed = pyqtSignal(str)
+
+    def __init__(self, window, title, patterns, styled=True):
+        super().__init__()
+        self.window = window
+        self.title = title
+        self.patterns = patterns
+        self.scan_threads = []
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+        self.model = FileListModel()
+        self.view = FileListView()
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentChanged.connect(self.current_changed)
+        self.view.paths_dropped.connect(self.add_paths)
+        self.view.delete_pressed.connect(self.remove_selected)
+        self.layout.addWidget(self.view)
+
+        self.count_label = QLabel("No files selected (drop files or folders here)")
+        self.layout.addWidget(self.count_label)
+
+        # Browse, Add Folder and Clear buttons
+        self.buttons_layout = QHBoxLayout()
+
+        self.browse_button = QPushButton("Browse Files")
+        self.browse_button.clicked.connect(self.browse_files)
+        self.buttons_layout.addWidget(self.browse_button)
+
+        self.folder_button = QPushButton("Add Folder")
+        self.folder_button.clicked.connect(self.browse_folder)
+        self.buttons_layout.addWidget(self.folder_button)
+
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear)
+        self.buttons_layout.addWidget(self.clear_button)
+
+        if styled:
+            self.browse_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+            self.folder_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+            self.clear_button.setStyleSheet("font-size: 12px; padding: 10px;")
+
+        self.layout.addLayout(self.buttons_layout)
+
+        self.model.rowsInserted.connect(self.update_count)
+        self.model.rowsRemoved.connect(self.update_count)
+        self.model.modelReset.connect(self.update_count)
+
+    def browse_files(self):
+        """Open a file dialog to browse for input files"""
+        file_filter = f"{self.title} Files ({' '.join(self.patterns + archives.PATTERNS)});;All Files (*)"
+        file_paths, _ = QFileDialog.getOpenFileNames(self.window, f"Select {self.title} Files", "", file_filter)
+        self.add_paths(file_paths)
+
+    def browse_folder(self):
+        """Add every matching file below a folder"""
+        folder = QFileDialog.getExistingDirectory(self.window, f"Select a Folder with {self.title} Files")
+        if folder:
+            self.add_paths([folder])
+
+    def add_paths(self, paths):
+        """Add files directly and scan folders in the background"""
+        files = archives.expand([path for path in paths if not os.path.isdir(path)], self.patterns)
+        folders = [path for path in paths if os.path.isdir(path)]
+        if files:
+            self.model.add_paths(files)
+        if folders:
+            thread = FolderScanThread(folders, self.patterns)
+            thread.files_found.connect(self.model.add_paths)
+            thread.finished.connect(lambda thread=thread: self.scan_finished(thread))
+            self.scan_threads.append(thread)
+            self.count_label.setText("Scanning folders...")
+            thread.start()
+
+    def scan_finished(self, thread):
+        # Let run() return completely before the last reference to the thread goes away
+        thread.wait()
+        self.scan_threads.remove(thread)
+        self.update_count()
+
+    def update_count(self, *args):
+        count = self.model.rowCount()
+        text = f"{count} files selected" if count else "No files selected (drop files or folders here)"
+        if self.scan_threads:
+            text += " (scanning folders...)"
+        self.count_label.setText(text)
+        self.files_changed.emit(count)
+
+    def current_changed(self, current, previous):
+        self.current_file_changed.emit(self.model.data(current) or "")
+
+    def is_scanning(self):
+        return bool(self.scan_threads)
+
+    def remove_selected(self):
+        self.model.remove_rows([index.row() for index in self.view.selectedIndexes()])
+
+    def clear(self):
+        for thread in self.scan_threads:
+            thread.requestInterruption()
+            # Batches already on their way must not refill the list
+            try:
+                thread.files_found.disconnect(self.model.add_paths)
+            except TypeError:
+                # Already disconnected by an earlier Clear while this scan winds down
+                pass
+        self.model.clear()
+
+    def files(self):
+        return self.model.paths()
+
+
+class PreviewThread(QThread):
+    """Reads the preview of one file"""
+    preview_ready = pyqtSignal(str, object)
+    preview_failed = pyqtSignal(str, str)
+
+    def __init__(self, carrier, file_path):
+        super().__init__()
+        self.carrier = carrier
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            frame = preview.read_preview(self.carrier, self.file_path)
+        except Exception as e:
+            self.preview_failed.emit(self.file_path, str(e))
+            return
+        self.preview_ready.emit(self.file_path, frame)
+
+
+class FrameModel(QAbstractTableModel):
+    """Read-only table model over a DataFrame of text"""
+
+    def __init__(self, frame=None):
+        super().__init__()
+        self.frame = frame
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if self.frame is None or parent.isValid() else self.frame.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if self.frame is None or parent.isValid() else self.frame.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(self.frame.iat[index.row(), index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        # Row numbers as in Excel; columns by position, which is what the positional specs use
+        return str(section + 1) if orientation == Qt.Vertical else str(section)
+
+
+class PreviewPane(QWidget):
+    """First rows of the selected file; only the latest selection is read"""
+
+    def __init__(self, carrier):
+        super().__init__()
+        self.carrier = carrier
+        self.thread = None
+        self.pending = None
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+        self.title_label = QLabel("Preview")
+        self.title_label.setStyleSheet("font-size: 14px;")
+        self.layout.addWidget(self.title_label)
+
+        self.model = FrameModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.layout.addWidget(self.table)
+
+        self.status_label = QLabel("Select a file to preview it")
+        self.layout.addWidget(self.status_label)
+
+    def show_file(self, file_path):
+        """Preview file_path; cached previews are shown at once, others are read in the background"""
+        self.pending = file_path or None
+        if not file_path:
+            self.display(None, "Select a file to preview it")
+            return
+        frame = preview.cached_preview(self.carrier, file_path)
+        if frame is not None:
+            self.display(frame, os.path.basename(file_path))
+            return
+        self.status_label.setText(f"Loading {os.path.basename(file_path)}...")
+        if self.thread is None:
+            self.start(file_path)
+
+    def start(self, file_path):
+        self.thread = PreviewThread(self.carrier, file_path)
+        self.thread.preview_ready.connect(self.loaded)
+        self.thread.preview_failed.connect(self.failed)
+        self.thread.finished.connect(self.thread_done)
+        self.thread.start()
+
+    def loaded(self, file_path, frame):
+        if file_path == self.pending:
+            self.display(frame, os.path.basename(file_path))
+
+    def failed(self, file_path, message):
+        if file_path == self.pending:
+            self.display(None, f"Cannot preview {os.path.basename(file_path)}: {message}")
+
+    def thread_done(self):
+        finished_path = self.thread.file_path
+        self.thread.wait()
+        self.thread = None
+        # The selection moved on while this file was read; read the latest one now
+        if self.pending and self.pending != finished_path:
+            self.show_file(self.pending)
+
+    def display(self, frame, status):
+        self.model.beginResetModel()
+        self.model.frame = frame
+        self.model.endResetModel()
+        if frame is not None:
+            status = f"{status} (first {len(frame)} rows)"
+        self.status_label.setText(status)
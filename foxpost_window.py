@@ -1,13 +1,15 @@
-import os
-import pandas as pd
-from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QListWidget, QMessageBox, \
-    QFileDialog
+from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QMessageBox, \
+    QCheckBox, QTextEdit
+import settings
+from file_list import FileSelector, PreviewPane
+from worker import BatchThread, confirm_stop
 
 
 class FoxpostWindow:
     def __init__(self, window, main_window):
         self.window = window
         self.main_window = main_window
+        self.processing_thread = None
 
         # Set up central widget and layout
         self.central_widget = QWidget()
@@ -24,15 +26,31 @@ class FoxpostWindow:
         self.files_label.setStyleSheet("font-size: 14px;")
         self.layout.addWidget(self.files_label)
 
-        # File listbox
-        self.file_listbox = QListWidget()
-        self.layout.addWidget(self.file_listbox)
+        # File list (files, folders and drag-and-drop) with a preview of the selected file
+        self.files_layout = QHBoxLayout()
+        self.file_selector = FileSelector(self.window, "Foxpost", ["*.xlsx"])
+        self.files_layout.addWidget(self.file_selector, 1)
 
-        # Button to browse files
-        self.browse_button = QPushButton("Browse Files")
-        self.browse_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
-        self.browse_button.clicked.connect(self.browse_files)
-        self.layout.addWidget(self.browse_button)
+        self.preview_pane = PreviewPane("Foxpost")
+        self.file_selector.current_file_changed.connect(self.preview_pane.show_file)
+        self.files_layout.addWidget(self.preview_pane, 1)
+
+        self.layout.addLayout(self.files_layout)
+
+        # Record stage timings checkbox
+        self.metrics_checkbox = QCheckBox("Record stage timings")
+        self.metrics_checkbox.setChecked(settings.METRICS_ENABLED)
+        self.layout.addWidget(self.metrics_checkbox)
+
+        # Profile this run checkbox
+        self.profile_checkbox = QCheckBox("Profile this run (saves a .prof and speedscope file next to the outputs)")
+        self.layout.addWidget(self.profile_checkbox)
+
+        # Resume checkbox: off processes every file again even if an earlier run was interrupted
+        self.resume_checkbox = QCheckBox("Skip files an interrupted run already processed")
+        self.resume_checkbox.setChecked(settings.JOURNAL_ENABLED)
+        self.resume_checkbox.setEnabled(settings.JOURNAL_ENABLED)
+        self.layout.addWidget(self.resume_checkbox)
 
         # Run button
         self.run_button = QPushButton("Run")
@@ -40,6 +58,16 @@ class FoxpostWindow:
         self.run_button.clicked.connect(self.run_function)
         self.layout.addWidget(self.run_button)
 
+        # Add log display area
+        self.log_label = QLabel("Processing Log:")
+        self.log_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.layout.addWidget(self.log_label)
+
+        self.log_display = QTextEdit()
+        self.log_display.setReadOnly(True)
+        self.log_display.setMinimumHeight(120)
+        self.layout.addWidget(self.log_display)
+
         # Back button
         self.back_button = QPushButton("Back to Main Menu")
         self.back_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
@@ -49,91 +77,35 @@ class FoxpostWindow:
         # Connect close event
         self.window.closeEvent = self.handle_close_event
 
-    def browse_files(self):
-        # Open file dialog to select multiple files
-        file_paths, _ = QFileDialog.getOpenFileNames(self.window, "Select Files")
-        for file_path in file_paths:
-            self.file_listbox.addItem(file_path)
-
     def run_function(self):
-        # Get all files from the listbox
-        all_files = [self.file_listbox.item(i).text() for i in range(self.file_listbox.count())]
+        # Get all files from the list
+        all_files = self.file_selector.files()
+
+        if self.file_selector.is_scanning():
+            QMessageBox.warning(self.window, "Scanning", "Please wait until the folder scan has finished.")
+            return
 
         if not all_files:
             QMessageBox.warning(self.window, "No Files", "Please browse and add files to process.")
             return
 
-        processed_files = []
-        errors = []
-
-        for file_path in all_files:
-            try:
-                # Load and process each file
-                print(f"Processing file: {file_path}")
-
-                # Step 1: Process the 'utánvétek' sheet
-                df_utanvetek = pd.read_excel(file_path,
-                                             sheet_name='utánvétek',  # The sheet name is fixed
-                                             skiprows=10,
-                                             header=None)  # Skip the first 10 rows to start from row 11
-                df_utanvetek_filtered = df_utanvetek[[4, 7]]
-
-                # Step 2: Process the 'összesítés' sheet
-                # First, read the entire sheet without skipping rows
-                raw_data = pd.read_excel(file_path, sheet_name='összesítés', header=None)  # Sheet name is fixed
-
-                # Find the row containing "ÖSSZESÍTÉS"
-                target_row = -1
-                for i, row in enumerate(raw_data.values):
-                    # Convert row to string and check if "ÖSSZESÍTÉS" is in any cell
-                    row_as_str = [str(cell) for cell in row]
-                    if any("ÖSSZESÍTÉS" in cell for cell in row_as_str):
-                        target_row = i
-                        break
-
-                # If found, create a DataFrame starting from the row after "ÖSSZESÍTÉS"
-                if target_row != -1:
-                    # Read the Excel file again, but now skip rows up to and including the target row
-                    df_new = pd.read_excel(file_path,
-                                           sheet_name='összesítés',
-                                           skiprows=target_row + 1,
-                                           header=None)
-
-                    filtered_rows = df_new[df_new[0].astype(str).str.contains("PARTNER", na=False)]
-                    # Change the value to 1
-                    filtered_rows[0] = 1
-                    # Convert the number to integer
-                    filtered_rows[1] = filtered_rows[1].astype(int)
-                    # Keeping the relevant columns only
-                    filtered_rows = filtered_rows[[0, 1]]
-                    # Turning the value to negative
-                    filtered_rows[1] = -abs(filtered_rows[1])
-
-                    # Step 3: Combine the data
-                    df_utanvetek_filtered.columns = range(len(df_utanvetek_filtered.columns))
-                    df_utanvetek_filtered = pd.concat([df_utanvetek_filtered, filtered_rows], ignore_index=True)
-                else:
-                    # If "ÖSSZESÍTÉS" not found, add a warning
-                    print(f"Warning: 'ÖSSZESÍTÉS' not found in file {file_path}")
-
-                # Construct the output file path
-                dir_name = os.path.dirname(file_path)
-                base_name = os.path.basename(file_path).replace('.xlsx', '')
-                output_file_path = os.path.join(dir_name, f"processed_{base_name}.xlsx")
-
-                print(f"Saving to: {output_file_path}")
-
-                # Save the DataFrame to a new Excel file with "processed_" prefix
-                with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-                    df_utanvetek_filtered.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
-
-                processed_files.append(output_file_path)
-                print(f"Successfully saved: {output_file_path}")
-
-            except Exception as e:
-                error_msg = f"Error processing {file_path}: {str(e)}"
-                errors.append(error_msg)
-                print(error_msg)
+        self.run_button.setEnabled(False)
+        self.run_button.setText("Processing...")
+        self.log_display.clear()
+
+        # Process the files on a background thread so the window stays responsive
+        self.processing_thread = BatchThread("Foxpost", all_files, {},
+                                             self.metrics_checkbox.isChecked(),
+                                             self.profile_checkbox.isChecked(),
+                                             self.resume_checkbox.isChecked())
+        self.processing_thread.progress_update.connect(self.update_progress)
+        self.processing_thread.finished.connect(self.processing_finished)
+        self.processing_thread.start()
+
+    def processing_finished(self, processed_files, errors):
+        """Handle the completion of processing"""
+        self.run_button.setEnabled(True)
+        self.run_button.setText("Run")
 
         # Show appropriate message based on results
         if errors:
@@ -146,13 +118,26 @@ class FoxpostWindow:
         else:
             QMessageBox.warning(self.window, "No Files Processed", "No files were processed.")
 
+    def update_progress(self, message):
+        """Update the user interface with progress messages"""
+        print(message)  # Print to console
+        self.log_display.append(message)  # Also add to log display
+        # Make sure the new text is visible
+        scrollbar = self.log_display.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
     def go_back(self):
+        if not confirm_stop(self.window, self.processing_thread):
+            return
         # Show the main window again
         self.main_window.show()
         # Close this window
         self.window.close()
 
     def handle_close_event(self, event):
+        if not confirm_stop(self.window, self.processing_thread):
+            event.ignore()
+            return
         # Show the main window again
         self.main_window.show()
         # Accept the event to close the window
@@ -0,0 +1,111 @@
+from PyQt5.QtWidgets import QLabel, QPushButton, QVBoxLayout, QWidget, QLineEdit, QMessageBox, QHBoxLayout, \
+    QComboBox, QTableWidget, QTableWidgetItem, QHeaderView
+import os
+
+import transaction_store
+
+CARRIERS = ["All", "DPD", "Foxpost", "GLS", "MPL", "OTP", "Simple Pay"]
+HEADERS = ["Processed", "Carrier", "Reference / Sorszám", "Amount", "Source file"]
+
+
+class HistoryWindow:
+    def __init__(self, window, main_window):
+        self.window = window
+        self.main_window = main_window
+
+        # Set up central widget and layout
+        self.central_widget = QWidget()
+        self.window.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+
+        # Add title
+        self.title_label = QLabel("History")
+        self.title_label.setStyleSheet("font-size: 24px; font-weight: bold;")
+        self.layout.addWidget(self.title_label)
+
+        # Search fields
+        self.search_layout = QHBoxLayout()
+
+        self.reference_entry = QLineEdit()
+        self.reference_entry.setPlaceholderText("Reference or Sorszám (start of it is enough)")
+        self.reference_entry.returnPressed.connect(self.search)
+        self.search_layout.addWidget(self.reference_entry)
+
+        self.date_from_entry = QLineEdit()
+        self.date_from_entry.setPlaceholderText("From YYYY-MM-DD")
+        self.date_from_entry.returnPressed.connect(self.search)
+        self.search_layout.addWidget(self.date_from_entry)
+
+        self.date_to_entry = QLineEdit()
+        self.date_to_entry.setPlaceholderText("To YYYY-MM-DD")
+        self.date_to_entry.returnPressed.connect(self.search)
+        self.search_layout.addWidget(self.date_to_entry)
+
+        self.carrier_combo = QComboBox()
+        self.carrier_combo.addItems(CARRIERS)
+        self.search_layout.addWidget(self.carrier_combo)
+
+        self.search_button = QPushButton("Search")
+        self.search_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+        self.search_button.clicked.connect(self.search)
+        self.search_layout.addWidget(self.search_button)
+
+        self.layout.addLayout(self.search_layout)
+
+        # Results table
+        self.results_table = QTableWidget(0, len(HEADERS))
+        self.results_table.setHorizontalHeaderLabels(HEADERS)
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.layout.addWidget(self.results_table)
+
+        self.status_label = QLabel("")
+        self.layout.addWidget(self.status_label)
+
+        # Back button
+        self.back_button = QPushButton("Back to Main Menu")
+        self.back_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+        self.back_button.clicked.connect(self.go_back)
+        self.layout.addWidget(self.back_button)
+
+        # Connect close event
+        self.window.closeEvent = self.handle_close_event
+
+    def search(self):
+        """Run the search and fill the results table"""
+        carrier = self.carrier_combo.currentText()
+        limit = 500
+        try:
+            rows = transaction_store.search(self.reference_entry.text().strip() or None,
+                                            self.date_from_entry.text().strip() or None,
+                                            self.date_to_entry.text().strip() or None,
+                                            None if carrier == "All" else carrier, limit)
+        except Exception as e:
+            QMessageBox.critical(self.window, "Error", f"Search failed: {str(e)}")
+            return
+
+        self.results_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            amount = "" if row["amount"] is None else f"{row['amount']:,}".replace(",", " ")
+            values = [row["processed_at"], row["carrier"], row["reference"] or "", amount,
+                      os.path.basename(row["source_file"])]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if j == 4:
+                    item.setToolTip(row["source_file"])
+                self.results_table.setItem(i, j, item)
+
+        status = f"{len(rows)} rows"
+        if len(rows) == limit:
+            status += " (showing the newest rows only, refine the search)"
+        self.status_label.setText(status)
+
+    def go_back(self):
+        """Return to the main menu"""
+        self.main_window.show()
+        self.window.close()
+
+    def handle_close_event(self, event):
+        """Handle window close event"""
+        self.main_window.show()
+        event.accept()
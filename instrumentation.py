@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process in bytes, or None if unknown"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports bytes, Linux reports kilobytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory_info = psutil.Process().memory_info()
+    return getattr(memory_info, "peak_wset", memory_info.rss)
+
+
+def current_rss_bytes():
+    """Return the current resident set size of this process in bytes, or None if unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def total_memory_bytes():
+    """Return the physical memory of the machine in bytes, or None if unknown"""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().total
+
+
+def _reset_peak_rss():
+    # Linux only: "5" resets the VmHWM high-water mark of this process
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _high_water_mark_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class PeakMemory:
+    """Measures how far a block raises the RSS of this process above where it started
+
+    used_bytes stays None when that cannot be told: without a resettable high-water mark
+    the lifetime peak only reveals blocks that exceed every earlier peak.
+    """
+
+    def __init__(self):
+        self.used_bytes = None
+        self._reset = False
+        self._start = None
+        self._peak_before = None
+
+    def __enter__(self):
+        self._reset = _reset_peak_rss()
+        self._start = current_rss_bytes()
+        self._peak_before = None if self._reset else peak_rss_bytes()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        peak = _high_water_mark_bytes() if self._reset else peak_rss_bytes()
+        if self._start is not None and peak is not None:
+            if self._reset or (self._peak_before is not None and peak > self._peak_before):
+                self.used_bytes = max(peak - self._start, 0)
+        return False
+
+
+class StageSpan:
+    """Measurements for one stage of one file"""
+
+    FIELDS = ["carrier", "file", "stage", "wall_s", "cpu_s", "rows", "bytes", "peak_rss_bytes"]
+
+    def __init__(self, carrier, stage, file_path=None):
+        self.carrier = carrier
+        self.stage = stage
+        self.file = file_path
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows = None
+        self.bytes = None
+        self.peak_rss_bytes = None
+        self._wall_start = None
+        self._cpu_start = None
+
+    def __enter__(self):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_s = time.perf_counter() - self._wall_start
+        self.cpu_s = time.thread_time() - self._cpu_start
+        self.peak_rss_bytes = peak_rss_bytes()
+        return False
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class _NullSpan:
+    """Stand-in used when instrumentation is disabled, so stages cost a single call"""
+
+    rows = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        # Silently drop measurements nobody is going to read
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class RunMetrics:
+    """Collects stage spans for one processing run"""
+
+    def __init__(self, carrier, enabled=True):
+        self.carrier = carrier
+        self.enabled = enabled
+        self.spans = []
+        self.started = time.strftime("%Y%m%d_%H%M%S")
+
+    def span(self, stage, file_path=None):
+        """Return a context manager measuring one stage (e.g. "read", "transform", "write")"""
+        if not self.enabled:
+            return NULL_SPAN
+        record = StageSpan(self.carrier, stage, file_path)
+        self.spans.append(record)
+        return record
+
+    def add_span_dicts(self, span_dicts):
+        """Merge spans recorded in another process (see StageSpan.as_dict)"""
+        if not self.enabled:
+            return
+        for values in span_dicts:
+            record = StageSpan(values["carrier"], values["stage"], values["file"])
+            for field in StageSpan.FIELDS:
+                setattr(record, field, values[field])
+            self.spans.append(record)
+
+    def stage_totals(self):
+        """Sum the spans per stage, keeping the order in which stages first appeared"""
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(record.stage, {"wall_s": 0.0, "cpu_s": 0.0, "rows": 0, "bytes": 0, "count": 0})
+            total["wall_s"] += record.wall_s
+            total["cpu_s"] += record.cpu_s
+            total["rows"] += record.rows or 0
+            total["bytes"] += record.bytes or 0
+            total["count"] += 1
+        return totals
+
+    def summary_lines(self):
+        """Human readable per-stage summary for the log panel"""
+        if not self.enabled or not self.spans:
+            return []
+        lines = [f"Stage timings ({self.carrier}):"]
+        for stage, total in self.stage_totals().items():
+            lines.append(
+                f"  {stage:<12} {total['wall_s']:8.3f}s wall  {total['cpu_s']:8.3f}s cpu  "
+                f"{total['rows']:>9} rows  {total['bytes'] / 1024:10.1f} KiB  ({total['count']}x)"
+            )
+        peaks = [record.peak_rss_bytes for record in self.spans if record.peak_rss_bytes]
+        if peaks:
+            lines.append(f"  peak RSS {max(peaks) / (1024 * 1024):.1f} MiB")
+        return lines
+
+    def export(self, output_dir):
+        """Write the spans as JSON and CSV into output_dir and return both paths"""
+        if not self.enabled or not self.spans:
+            return []
+        slug = self.carrier.lower().replace(" ", "_")
+        base_path = os.path.join(output_dir, f"metrics_{slug}_{self.started}")
+
+        json_path = base_path + ".json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "carrier": self.carrier,
+                "started": self.started,
+                "stages": self.stage_totals(),
+                "spans": [record.as_dict() for record in self.spans],
+            }, f, ensure_ascii=False, indent=2)
+
+        csv_path = base_path + ".csv"
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=StageSpan.FIELDS)
+            writer.writeheader()
+            for record in self.spans:
+                writer.writerow(record.as_dict())
+
+        return [json_path, csv_path]
@@ -0,0 +1,170 @@
+"""Persistent journal of batches, so an interrupted batch resumes where it stopped
+
+A batch is identified by its carrier, its input files and its options. Every file gets a
+row that is checkpointed in its own transaction as soon as its outputs are in place
+(outputs are written to a temporary file and renamed, see engine.write_xlsx). When the
+same batch is started again before it completed, files that are done, unchanged (size
+and modification time) and whose output still exists are skipped.
+
+A batch is marked finished once no file is left pending, whether the files succeeded or
+failed (a failed file is retried by running it again, as a new batch); only a stopped or
+crashed batch is resumed. Starting a finished batch again processes everything anew.
+"""
+import hashlib
+import json
+import os
+import time
+
+import archives
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    carrier TEXT NOT NULL,
+    options TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS batch_files (
+    batch_id TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    output_path TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (batch_id, file_path)
+) WITHOUT ROWID;
+"""
+
+DONE = "done"
+FAILED = "failed"
+PENDING = "pending"
+
+
+def _now():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _file_state(file_path):
+    try:
+        stat = archives.stat(file_path)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def batch_id(carrier, files, options):
+    """Stable id of a batch: the same carrier, files and options give the same id"""
+    paths = sorted(os.path.abspath(file_path) for file_path in files)
+    text = json.dumps([carrier, paths, options], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+
+class Batch:
+    """Journal entry of one batch run"""
+
+    def __init__(self, carrier, files, options=None, path=None):
+        self.carrier = carrier
+        self.path = path
+        self.id = batch_id(carrier, files, options or {})
+        self.resumed = False
+
+        connection = database.connect(path, SCHEMA)
+        try:
+            with connection:
+                row = connection.execute("SELECT finished_at FROM batches WHERE batch_id = ?", (self.id,)).fetchone()
+                if row is not None and row[0] is None:
+                    self.resumed = True
+                else:
+                    connection.execute("DELETE FROM batch_files WHERE batch_id = ?", (self.id,))
+                    connection.execute(
+                        "INSERT OR REPLACE INTO batches (batch_id, carrier, options, file_count, started_at, finished_at) "
+                        "VALUES (?, ?, ?, ?, ?, NULL)",
+                        (self.id, carrier, json.dumps(options or {}, sort_keys=True, default=str), len(files), _now()),
+                    )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO batch_files (batch_id, file_path, status, updated_at) VALUES (?, ?, ?, ?)",
+                    ((self.id, os.path.abspath(file_path), PENDING, _now()) for file_path in files),
+                )
+        finally:
+            connection.close()
+
+    def finished_files(self):
+        """{input path: output path} of the files that do not need to be processed again"""
+        if not self.resumed:
+            return {}
+        connection = database.connect(self.path, SCHEMA)
+        try:
+            rows = connection.execute(
+                "SELECT file_path, size, mtime_ns, output_path FROM batch_files WHERE batch_id = ? AND status = ?",
+                (self.id, DONE),
+            ).fetchall()
+        finally:
+            connection.close()
+        finished = {}
+        for file_path, size, mtime_ns, output_path in rows:
+            if _file_state(file_path) == (size, mtime_ns) and output_path and os.path.exists(output_path):
+                finished[file_path] = output_path
+        return finished
+
+    def checkpoint(self, file_path, output_path=None, error=None):
+        """Record the outcome of one file; committed at once so a crash right after keeps it"""
+        size, mtime_ns = _file_state(file_path)
+        connection = database.connect(self.path, SCHEMA)
+        try:
+            with connection:
+                connection.execute(
+                    "UPDATE batch_files SET status = ?, size = ?, mtime_ns = ?, output_path = ?, error = ?, "
+                    "updated_at = ? WHERE batch_id = ? AND file_path = ?",
+                    (FAILED if error is not None else DONE, size, mtime_ns, output_path,
+                     None if error is None else str(error), _now(), self.id, os.path.abspath(file_path)),
+                )
+        finally:
+            connection.close()
+
+    def finish(self):
+        """Mark the batch finished if no file is pending any more; returns True if it was"""
+        connection = database.connect(self.path, SCHEMA)
+        try:
+            with connection:
+                open_files = connection.execute(
+                    "SELECT COUNT(*) FROM batch_files WHERE batch_id = ? AND status = ?", (self.id, PENDING)
+                ).fetchone()[0]
+                if open_files == 0:
+                    connection.execute("UPDATE batches SET finished_at = ? WHERE batch_id = ?", (_now(), self.id))
+        finally:
+            connection.close()
+        return open_files == 0
+
+
+def unfinished_lines(path=None):
+    """Unfinished batches for the CLI"""
+    connection = database.connect(path, SCHEMA)
+    try:
+        rows = connection.execute(
+            "SELECT b.batch_id, b.carrier, b.file_count, b.started_at, "
+            "SUM(f.status = 'done'), SUM(f.status = 'failed') "
+            "FROM batches b JOIN batch_files f ON f.batch_id = b.batch_id "
+            "WHERE b.finished_at IS NULL GROUP BY b.batch_id ORDER BY b.started_at"
+        ).fetchall()
+    finally:
+        connection.close()
+    if not rows:
+        return ["No unfinished batches"]
+    return [f"{batch}  {carrier:<10} started {started}: {done or 0} of {count} done, {failed or 0} failed"
+            for batch, carrier, count, started, done, failed in rows]
+
+
+def clear(path=None):
+    """Forget every batch, so nothing is resumed; returns how many were removed"""
+    connection = database.connect(path, SCHEMA)
+    try:
+        with connection:
+            connection.execute("DELETE FROM batch_files")
+            return connection.execute("DELETE FROM batches").rowcount
+    finally:
+        connection.close()
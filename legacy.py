@@ -0,0 +1,264 @@
+"""The processing code of the first release, kept as the reference for equivalence.py
+
+These are the bodies of DPDWindow.run_function, GLSWindow.run_function,
+FoxpostWindow.run_function and ProcessingThread.process_*_file as they were before the
+engine replaced them, with only the Qt parts taken out: one function per input file,
+the optional entries passed in as typed into the windows, the written paths returned.
+Do not optimize or "fix" anything here; the point is to keep producing the old outputs.
+"""
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+
+def _optional_2(optional_2):
+    # The windows negate the second optional entry before appending it
+    return -int(optional_2) if optional_2 else optional_2
+
+
+def process_gls(file_path, optional_1="", optional_2=""):
+    optional_2 = _optional_2(optional_2)
+    df = pd.read_excel(file_path)
+    # Remove the first 7 rows
+    df = df.drop(index=range(0, 7))
+    # Remove the last row:
+    df = df.drop(df.index[-1])
+    df.reset_index(drop=True, inplace=True)
+    df.columns = range(df.shape[1])
+    # Keeping columns 2 and 4
+    df = df.iloc[:, [2, 4]]
+    # Converting the grand total to integer
+    df[4] = df[4].astype(int)
+
+    if optional_1 or optional_2:
+        optional_data = [optional_1, optional_2]
+        df.loc[df.shape[0]] = optional_data
+
+    dir_name = os.path.dirname(file_path)
+    base_name = os.path.basename(file_path).replace('.xlsx', '')
+    output_file_path = os.path.join(dir_name, f"processed_{base_name}.xlsx")
+    with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
+    return [output_file_path]
+
+
+def process_dpd(file_path, optional_1="", optional_2=""):
+    import xlrd
+
+    optional_2 = _optional_2(optional_2)
+    workbook = xlrd.open_workbook(file_path)
+    sheet = workbook.sheet_by_name('Sheet1')
+
+    # Read the data into a pandas DataFrame, skipping the first 3 rows
+    data = pd.DataFrame(sheet.get_rows())[3:]
+    data.reset_index(drop=True, inplace=True)
+
+    # Keep only the columns with index 2 and 5
+    filtered_data = data[[2, 5]]
+    filtered_data.reset_index(drop=True, inplace=True)
+
+    filtered_data[2] = filtered_data[2].astype(str)
+    # Remove the "number:" string and strip spaces in column 2
+    filtered_data.loc[:, 2] = filtered_data[2].str.replace('number:', '', regex=False).str.strip()
+    filtered_data.loc[:, 2] = filtered_data[2].astype(str).str.replace('.0', '', regex=False).astype(int)
+
+    filtered_data['integer_column'] = filtered_data[2].astype(str).str.replace('.0', '', regex=False)
+    filtered_data['integer_column'] = pd.to_numeric(filtered_data['integer_column'])
+    filtered_data[2] = filtered_data['integer_column']
+    filtered_data = filtered_data.drop('integer_column', axis=1)
+
+    filtered_data[5] = filtered_data[5].astype(str)
+    filtered_data[5] = filtered_data[5].str.replace("text:'", "", regex=False).str.split(" / ", expand=True)[0]
+
+    filtered_data = filtered_data[[5, 2]]
+
+    if optional_1 or optional_2:
+        optional_data = [optional_1, optional_2]
+        filtered_data.loc[filtered_data.shape[0]] = optional_data
+
+    dir_name = os.path.dirname(file_path)
+    base_name = os.path.basename(file_path).replace('.xls', '')
+    output_file_path = os.path.join(dir_name, f"processed_{base_name}.xlsx")
+    with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
+        filtered_data.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
+    return [output_file_path]
+
+
+def process_foxpost(file_path):
+    df_utanvetek = pd.read_excel(file_path, sheet_name='utánvétek', skiprows=10, header=None)
+    df_utanvetek_filtered = df_utanvetek[[4, 7]]
+
+    raw_data = pd.read_excel(file_path, sheet_name='összesítés', header=None)
+
+    # Find the row containing "ÖSSZESÍTÉS"
+    target_row = -1
+    for i, row in enumerate(raw_data.values):
+        row_as_str = [str(cell) for cell in row]
+        if any("ÖSSZESÍTÉS" in cell for cell in row_as_str):
+            target_row = i
+            break
+
+    if target_row != -1:
+        df_new = pd.read_excel(file_path, sheet_name='összesítés', skiprows=target_row + 1, header=None)
+
+        filtered_rows = df_new[df_new[0].astype(str).str.contains("PARTNER", na=False)]
+        filtered_rows[0] = 1
+        filtered_rows[1] = filtered_rows[1].astype(int)
+        filtered_rows = filtered_rows[[0, 1]]
+        filtered_rows[1] = -abs(filtered_rows[1])
+
+        df_utanvetek_filtered.columns = range(len(df_utanvetek_filtered.columns))
+        df_utanvetek_filtered = pd.concat([df_utanvetek_filtered, filtered_rows], ignore_index=True)
+
+    dir_name = os.path.dirname(file_path)
+    base_name = os.path.basename(file_path).replace('.xlsx', '')
+    output_file_path = os.path.join(dir_name, f"processed_{base_name}.xlsx")
+    with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
+        df_utanvetek_filtered.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
+    return [output_file_path]
+
+
+def extract_trailing_numbers(text):
+    if pd.isna(text):
+        return ""
+    text = str(text)
+    match = re.search(r'(\d+)$', text)
+    if match:
+        return match.group(1)
+    else:
+        return ""
+
+
+def process_xml_file(xml_path):
+    """Sorszám/Hivatkozás frame of the reference XML"""
+    namespaces = {
+        'ss': 'urn:schemas-microsoft-com:office:spreadsheet',
+        'o': 'urn:schemas-microsoft-com:office:office',
+        'x': 'urn:schemas-microsoft-com:office:excel',
+    }
+    tree = ET.parse(xml_path)
+    root = tree.getroot()
+
+    worksheets = root.findall('.//ss:Worksheet', namespaces)
+    if not worksheets:
+        return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []})
+
+    for worksheet in worksheets:
+        table = worksheet.find('.//ss:Table', namespaces)
+        if table is None:
+            continue
+        rows = table.findall('./ss:Row', namespaces)
+        if not rows:
+            continue
+
+        data = []
+        for row in rows:
+            row_data = []
+            cells = row.findall('./ss:Cell', namespaces)
+            for cell in cells:
+                # Handle merged cells
+                index_attr = cell.get('{urn:schemas-microsoft-com:office:spreadsheet}Index')
+                if index_attr:
+                    current_index = len(row_data) + 1
+                    for _ in range(int(index_attr) - current_index):
+                        row_data.append(None)
+                data_element = cell.find('./ss:Data', namespaces)
+                cell_value = data_element.text if data_element is not None else None
+                row_data.append(cell_value)
+            data.append(row_data)
+
+        if len(data) <= 1:
+            continue
+
+        headers = data[0]
+        headers = [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(headers)]
+        df = pd.DataFrame(data[1:], columns=headers)
+
+        if 'Sorszám' in df.columns and 'Hivatkozás' in df.columns:
+            df_filtered = df[['Sorszám', 'Hivatkozás']]
+            df_filtered['Hivatkozás'] = df_filtered['Hivatkozás'].apply(
+                lambda x: extract_trailing_numbers(x) if not pd.isna(x) else ""
+            )
+            df_filtered = df_filtered.dropna()
+            df_filtered = df_filtered[df_filtered['Hivatkozás'] != ""]
+            return df_filtered
+
+    return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []})
+
+
+def _split_at_t(id_string):
+    parts = id_string.split("T")
+    if len(parts) > 1:
+        return parts[1]
+    else:
+        return id_string
+
+
+def _clean_ids(ids, file_type):
+    ids = ids.astype(str)
+    if file_type == "equal":
+        return ids.str.replace('="', '', regex=False).str.replace('"', '', regex=False)
+    if file_type == "pg":
+        return ids.str.replace('pg-', '', regex=False)
+    return ids.apply(_split_at_t)
+
+
+def _output_path(file_path, prefix):
+    output_path = os.path.join(os.path.dirname(file_path), f"{prefix}{os.path.basename(file_path)}")
+    if not output_path.endswith('.xlsx'):
+        output_path = os.path.splitext(output_path)[0] + '.xlsx'
+    return output_path
+
+
+def process_simple_pay(file_path, file_type, df_xml):
+    """ProcessingThread.process_equal_file/process_pg_file/process_t_file (file_type
+    "equal", "pg" or "t"); they differed only in how the IDs are cleaned"""
+    if file_path.endswith('.csv'):
+        df_input = pd.read_csv(file_path, sep=';')
+    else:
+        df_input = pd.read_excel(file_path)
+
+    required_columns = ["Tranzakciós jutalék", "Kereskedői tranzakció ID", "Tranzakció összege"]
+    missing_columns = [col for col in required_columns if col not in df_input.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    df_input["Tranzakciós jutalék"] = df_input["Tranzakciós jutalék"].str.replace(",00", "").astype(int)
+    sum_jutalek = df_input["Tranzakciós jutalék"].sum()
+
+    filtered_df = df_input[["Kereskedői tranzakció ID", "Tranzakció összege"]]
+    filtered_df["Tranzakció összege"] = filtered_df["Tranzakció összege"].str.replace(",00", "").astype(int)
+    filtered_df["Kereskedői tranzakció ID"] = _clean_ids(filtered_df["Kereskedői tranzakció ID"], file_type)
+
+    mapping_dict = dict(zip(df_xml['Hivatkozás'], df_xml['Sorszám']))
+
+    final_df = filtered_df.copy()
+    final_df['Sorszám'] = final_df['Kereskedői tranzakció ID'].map(mapping_dict)
+    final_df['Sorszám'] = final_df['Sorszám'].fillna("1")
+    final_df = final_df[['Sorszám', 'Tranzakció összege']]
+
+    new_row = pd.DataFrame({
+        'Sorszám': ['1'],
+        'Tranzakció összege': [-abs(sum_jutalek)]
+    })
+    final_df = pd.concat([final_df, new_row], ignore_index=True)
+
+    output_path = _output_path(file_path, "processed_")
+    final_df.to_excel(output_path, index=False, header=False)
+
+    filtered_df_extended = df_input[["Kereskedői tranzakció ID", "Tranzakció összege", "Vásárló", "E-mail cím"]]
+    filtered_df_extended["Tranzakció összege"] = (filtered_df_extended["Tranzakció összege"]
+                                                  .str.replace(",00", "").astype(int))
+    filtered_df_extended["Kereskedői tranzakció ID"] = _clean_ids(filtered_df_extended["Kereskedői tranzakció ID"],
+                                                                  file_type)
+    final_df_extended = filtered_df_extended.copy()
+    final_df_extended['Sorszám'] = final_df_extended['Kereskedői tranzakció ID'].map(mapping_dict)
+    final_df_extended['Sorszám'] = final_df_extended['Sorszám'].fillna("1")
+    final_df_extended = final_df_extended[['Sorszám', 'Tranzakció összege', 'Vásárló', 'E-mail cím']]
+    final_df_extended = pd.concat([final_df_extended, new_row], ignore_index=True)
+
+    output_path_extended = _output_path(file_path, "processed_extended_")
+    final_df_extended.to_excel(output_path_extended, index=False, header=False)
+    return [output_path, output_path_extended]
@@ -37,7 +37,7 @@ class MainMenu(QMainWindow):
 
         # Create buttons for each module
         self.buttons = []
-        modules = ["DPD", "Foxpost", "GLS", "MPL", "OTP", "Simple Pay"]
+        modules = ["DPD", "Foxpost", "GLS", "MPL", "OTP", "Simple Pay", "History"]
 
         for module in modules:
             button = QPushButton(module)
@@ -71,7 +71,9 @@ class MainMenu(QMainWindow):
 
             # Initialize the module's window class
             window_class = getattr(module, f"{module_name.replace(' ', '')}Window")
-            window_class(module_window, self)
+            # Keep references so the window and its worker thread are not garbage collected
+            self.module_window = module_window
+            self.module_handler = window_class(module_window, self)
 
             module_window.show()
 
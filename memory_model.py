@@ -0,0 +1,125 @@
+"""Peak memory estimates for scheduler jobs, calibrated from past runs
+
+A job is expected to need its input size times a factor per carrier and file type, plus
+a fixed base. The factors start from conservative defaults (read_excel expands a
+workbook roughly 10-20x) and are replaced by what the workers actually used: every
+finished job reports how far it raised its process' peak RSS, and the factor moves
+towards the observed ratio as an exponential moving average. A worker that already
+processed a big file reuses memory the allocator kept, so it can report far less than
+the job needed; the average therefore rises quickly and falls slowly. Factors are kept
+in the local database so the calibration survives restarts.
+"""
+import os
+import threading
+
+import archives
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_factors (
+    carrier TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    factor REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (carrier, extension)
+) WITHOUT ROWID;
+"""
+
+# Peak bytes per input byte before anything was learned
+DEFAULT_FACTORS = {
+    ".xlsx": 20.0,
+    ".xls": 15.0,
+    ".xml": 10.0,
+    ".csv": 6.0,
+}
+FALLBACK_FACTOR = 20.0
+
+# Interpreter, pandas and openpyxl state every worker holds regardless of the input; the
+# observations measure the rise above it, so it is not part of the factor
+BASE_BYTES = 64 * 1024 * 1024
+
+# Weight of a new observation; early samples count fully until the average settles.
+# Observations below the current factor get the smaller weight (see above).
+SMOOTHING = 0.3
+DECAY = 0.05
+
+# Inputs this small are dominated by the base and tell nothing about the factor
+MIN_SAMPLE_BYTES = 256 * 1024
+
+_factors = None
+_lock = threading.Lock()
+
+
+def _extension(file_path):
+    return os.path.splitext(file_path)[1].lower()
+
+
+def _load():
+    global _factors
+    if _factors is None:
+        connection = database.connect(schema=SCHEMA)
+        try:
+            rows = connection.execute("SELECT carrier, extension, factor, samples FROM memory_factors").fetchall()
+        finally:
+            connection.close()
+        _factors = {(carrier, extension): (factor, samples) for carrier, extension, factor, samples in rows}
+    return _factors
+
+
+def factor(carrier, extension):
+    with _lock:
+        learned = _load().get((carrier, extension))
+    if learned is not None:
+        return learned[0]
+    return DEFAULT_FACTORS.get(extension, FALLBACK_FACTOR)
+
+
+def estimate(carrier, file_path):
+    """Expected peak memory of processing one file, in bytes"""
+    try:
+        size = archives.stat(file_path).st_size
+    except OSError:
+        size = 0
+    return BASE_BYTES + int(size * factor(carrier, _extension(file_path)))
+
+
+def observe(carrier, file_path, used_bytes):
+    """Update the factor of the carrier and file type from one finished job"""
+    try:
+        size = archives.stat(file_path).st_size
+    except OSError:
+        return
+    if used_bytes is None or size < MIN_SAMPLE_BYTES:
+        return
+    extension = _extension(file_path)
+    observed = used_bytes / size
+    with _lock:
+        factors = _load()
+        current, samples = factors.get((carrier, extension), (None, 0))
+        if current is None:
+            updated = observed
+        else:
+            weight = max(SMOOTHING if observed > current else DECAY, 1.0 / (samples + 1))
+            updated = current + weight * (observed - current)
+        factors[(carrier, extension)] = (updated, samples + 1)
+    connection = database.connect(schema=SCHEMA)
+    try:
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO memory_factors (carrier, extension, factor, samples) VALUES (?, ?, ?, ?)",
+                (carrier, extension, updated, samples + 1),
+            )
+    finally:
+        connection.close()
+
+
+def factor_lines():
+    """Learned factors for the log panel and the CLI"""
+    with _lock:
+        items = sorted(_load().items())
+    if not items:
+        return ["Memory factors: defaults (nothing learned yet)"]
+    return ["Memory factors (peak bytes per input byte):"] + [
+        f"  {carrier:<10} {extension:<5} {value:6.1f}x from {samples} jobs"
+        for (carrier, extension), (value, samples) in items
+    ]
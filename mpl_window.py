@@ -1,53 +1,198 @@
-import tkinter as tk
+from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget, QLineEdit, QFrame, \
+    QMessageBox, QHBoxLayout, QCheckBox, QTextEdit
+import settings
+from file_list import FileSelector, PreviewPane
+from worker import BatchThread, confirm_stop
 
 
 class MPLWindow:
     def __init__(self, window, main_window):
         self.window = window
         self.main_window = main_window
+        self.processing_thread = None
 
-        # Configure the window
-        self.window.configure(bg="#f0f0f0")
+        # Set up central widget and layout
+        self.central_widget = QWidget()
+        self.window.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
 
         # Add title
-        self.title_label = tk.Label(
-            window,
-            text="MPL",
-            font=("Arial", 24, "bold"),
-            bg="#f0f0f0"
-        )
-        self.title_label.pack(pady=30)
-
-        # Content placeholder
-        self.content_frame = tk.Frame(window, bg="#f0f0f0")
-        self.content_frame.pack(fill=tk.BOTH, expand=True, padx=50, pady=20)
-
-        self.placeholder = tk.Label(
-            self.content_frame,
-            text="MPL processing functionality will be implemented here",
-            font=("Arial", 14),
-            bg="#f0f0f0"
-        )
-        self.placeholder.pack(pady=100)
+        self.title_label = QLabel("MPL")
+        self.title_label.setStyleSheet("font-size: 24px; font-weight: bold;")
+        self.layout.addWidget(self.title_label)
+
+        # Files label
+        self.files_label = QLabel("Files")
+        self.files_label.setStyleSheet("font-size: 14px;")
+        self.layout.addWidget(self.files_label)
+
+        # File list (files, folders and drag-and-drop) with a preview of the selected file
+        self.files_layout = QHBoxLayout()
+        self.file_selector = FileSelector(self.window, "MPL", ["*.xlsx", "*.csv"])
+        self.files_layout.addWidget(self.file_selector, 1)
+
+        self.preview_pane = PreviewPane("MPL")
+        self.file_selector.current_file_changed.connect(self.preview_pane.show_file)
+        self.files_layout.addWidget(self.preview_pane, 1)
+
+        self.layout.addLayout(self.files_layout)
+
+        # Optional label
+        self.optional_label = QLabel("Optional")
+        self.optional_label.setStyleSheet("font-size: 14px;")
+        self.layout.addWidget(self.optional_label)
+
+        # Frame for optional entry boxes
+        self.optional_frame = QHBoxLayout()
+
+        # First optional entry
+        self.optional_entry1 = QLineEdit()
+        self.optional_entry1.setPlaceholderText("Optional Entry 1")
+        self.optional_frame.addWidget(self.optional_entry1)
+
+        # Negative sign and second optional entry
+        self.optional_entry2_frame = QHBoxLayout()
+        self.negative_label = QLabel("-")
+        self.negative_label.setStyleSheet("font-size: 12px;")
+        self.optional_entry2_frame.addWidget(self.negative_label)
+
+        self.optional_entry2 = QLineEdit()
+        self.optional_entry2.setPlaceholderText("Positive integer only")
+        self.optional_entry2.textChanged.connect(self.validate_positive_integer)
+        self.optional_entry2_frame.addWidget(self.optional_entry2)
+
+        self.optional_frame.addLayout(self.optional_entry2_frame)
+        self.layout.addLayout(self.optional_frame)
+
+        # Record stage timings checkbox
+        self.metrics_checkbox = QCheckBox("Record stage timings")
+        self.metrics_checkbox.setChecked(settings.METRICS_ENABLED)
+        self.layout.addWidget(self.metrics_checkbox)
+
+        # Profile this run checkbox
+        self.profile_checkbox = QCheckBox("Profile this run (saves a .prof and speedscope file next to the outputs)")
+        self.layout.addWidget(self.profile_checkbox)
+
+        # Resume checkbox: off processes every file again even if an earlier run was interrupted
+        self.resume_checkbox = QCheckBox("Skip files an interrupted run already processed")
+        self.resume_checkbox.setChecked(settings.JOURNAL_ENABLED)
+        self.resume_checkbox.setEnabled(settings.JOURNAL_ENABLED)
+        self.layout.addWidget(self.resume_checkbox)
+
+        # Run button
+        self.run_button = QPushButton("Run")
+        self.run_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+        self.run_button.clicked.connect(self.run_function)
+        self.layout.addWidget(self.run_button)
+
+        # Add log display area
+        self.log_label = QLabel("Processing Log:")
+        self.log_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.layout.addWidget(self.log_label)
+
+        self.log_display = QTextEdit()
+        self.log_display.setReadOnly(True)
+        self.log_display.setMinimumHeight(120)
+        self.layout.addWidget(self.log_display)
 
         # Back button
-        self.back_button = tk.Button(
-            window,
-            text="Back to Main Menu",
-            font=("Arial", 12),
-            bg="#4a7abc",
-            fg="white",
-            width=20,
-            height=2,
-            command=self.go_back
-        )
-        self.back_button.pack(pady=30)
-
-        # Handle window close event
-        self.window.protocol("WM_DELETE_WINDOW", self.go_back)
+        self.back_button = QPushButton("Back to Main Menu")
+        self.back_button.setStyleSheet("background-color: #4a7abc; color: white; font-size: 12px; padding: 10px;")
+        self.back_button.clicked.connect(self.go_back)
+        self.layout.addWidget(self.back_button)
+
+        # Connect close event
+        self.window.closeEvent = self.handle_close_event
+
+    def validate_positive_integer(self, text):
+        """Validate that the input is a positive integer or empty"""
+        if text == "":
+            return  # Allow empty field
+
+        try:
+            # Ensure it's a positive integer
+            int_value = int(text)
+            if int_value < 0:
+                # Remove negative sign if user tries to enter one
+                self.optional_entry2.setText(text.replace('-', ''))
+        except ValueError:
+            # If not an integer, remove the last character
+            self.optional_entry2.setText(text[:-1])
+
+    def run_function(self):
+        # Get all files from the list
+        all_files = self.file_selector.files()
+
+        if self.file_selector.is_scanning():
+            QMessageBox.warning(self.window, "Scanning", "Please wait until the folder scan has finished.")
+            return
+
+        if not all_files:
+            QMessageBox.warning(self.window, "No Files", "Please browse and add files to process.")
+            return
+
+        optional_1 = self.optional_entry1.text()
+        optional_2 = self.optional_entry2.text()
+
+        # Convert optional_2 to negative integer if it's not empty
+        if optional_2:
+            try:
+                optional_2 = -int(optional_2)  # Make it negative
+            except ValueError:
+                QMessageBox.critical(self.window, "Invalid Input", "Optional field 2 must be a number.")
+                return
+
+        self.run_button.setEnabled(False)
+        self.run_button.setText("Processing...")
+        self.log_display.clear()
+
+        # Process the files on a background thread so the window stays responsive
+        options = {"optional_1": optional_1, "optional_2": optional_2}
+        self.processing_thread = BatchThread("MPL", all_files, options,
+                                             self.metrics_checkbox.isChecked(),
+                                             self.profile_checkbox.isChecked(),
+                                             self.resume_checkbox.isChecked())
+        self.processing_thread.progress_update.connect(self.update_progress)
+        self.processing_thread.finished.connect(self.processing_finished)
+        self.processing_thread.start()
+
+    def processing_finished(self, processed_files, errors):
+        """Handle the completion of processing"""
+        self.run_button.setEnabled(True)
+        self.run_button.setText("Run")
+
+        # Show appropriate message based on results
+        if errors:
+            error_text = "\n".join(errors)
+            QMessageBox.critical(self.window, "Errors Occurred", f"The following errors occurred:\n{error_text}")
+        elif processed_files:
+            processed_text = "\n".join(processed_files)
+            QMessageBox.information(self.window, "Success",
+                                    f"All files processed successfully!\nFiles saved:\n{processed_text}")
+        else:
+            QMessageBox.warning(self.window, "No Files Processed", "No files were processed.")
+
+    def update_progress(self, message):
+        """Update the user interface with progress messages"""
+        print(message)  # Print to console
+        self.log_display.append(message)  # Also add to log display
+        # Make sure the new text is visible
+        scrollbar = self.log_display.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
 
     def go_back(self):
+        if not confirm_stop(self.window, self.processing_thread):
+            return
         # Show the main window again
-        self.main_window.deiconify()
+        self.main_window.show()
         # Close this window
-        self.window.destroy()
\ No newline at end of file
+        self.window.close()
+
+    def handle_close_event(self, event):
+        if not confirm_stop(self.window, self.processing_thread):
+            event.ignore()
+            return
+        # Show the main window again
+        self.main_window.show()
+        # Accept the event to close the window
+        event.accept()
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""Three-stage read -> transform -> write pipeline for a batch of files
+
+A prefetch thread reads upcoming inputs while the calling thread transforms the current
+one and a write-behind thread saves the previous results. The queues between the stages
+are bounded, so at most depth inputs are waiting on each side and memory stays bounded.
+Batch wall time approaches the slowest stage instead of the sum of the three.
+"""
+import queue
+import threading
+
+_DONE = object()
+
+
+def run_pipeline(items, read, transform, write, depth=2, on_done=None):
+    """Run read(item) -> transform(item, data) -> write(item, data) over items
+
+    Returns a list of (item, result, error) in input order, where result is what write
+    returned and error is the exception raised by any stage for that item. on_done is
+    called with the same triple as soon as an item is finished. With depth <= 0 the
+    stages run one after another in the calling thread.
+    """
+    if depth <= 0:
+        return _run_sequential(items, read, transform, write, on_done)
+
+    read_queue = queue.Queue(maxsize=depth)
+    write_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    results = []
+
+    def reader():
+        for item in items:
+            if stop.is_set():
+                break
+            try:
+                entry = (item, read(item), None)
+            except Exception as e:
+                entry = (item, None, e)
+            read_queue.put(entry)
+        read_queue.put(_DONE)
+
+    def writer():
+        while True:
+            entry = write_queue.get()
+            if entry is _DONE:
+                break
+            item, data, error = entry
+            result = None
+            if error is None:
+                try:
+                    result = write(item, data)
+                except Exception as e:
+                    error = e
+            _finish(results, on_done, item, result, error)
+
+    reader_thread = threading.Thread(target=reader, name="pipeline-read", daemon=True)
+    writer_thread = threading.Thread(target=writer, name="pipeline-write", daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+
+    try:
+        while True:
+            entry = read_queue.get()
+            if entry is _DONE:
+                break
+            item, data, error = entry
+            if error is None:
+                try:
+                    data = transform(item, data)
+                except Exception as e:
+                    data, error = None, e
+            write_queue.put((item, data, error))
+    finally:
+        stop.set()
+        # Unblock the reader if the transform loop was interrupted
+        while reader_thread.is_alive():
+            try:
+                read_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        write_queue.put(_DONE)
+        writer_thread.join()
+
+    return results
+
+
+def _run_sequential(items, read, transform, write, on_done):
+    results = []
+    for item in items:
+        result = None
+        try:
+            result = write(item, transform(item, read(item)))
+            error = None
+        except Exception as e:
+            error = e
+        _finish(results, on_done, item, result, error)
+    return results
+
+
+def _finish(results, on_done, item, result, error):
+    results.append((item, result, error))
+    if on_done is not None:
+        on_done(item, result, error)
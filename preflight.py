@@ -0,0 +1,87 @@
+"""Cheap checks of every selected file before the full parse of a batch
+
+Only workbook metadata (sheet names) and the first rows are read, on a thread pool, so a
+wrong file in a large batch is rejected with a clear reason up front instead of failing
+minutes into the run.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import archives
+import engine
+from boundaries import DEFAULT_SCAN_ROWS, no_data_message, resolve_data_start
+
+
+def sheet_names(file_path):
+    """Sheet names without loading the sheets themselves; None for CSV files"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        return None
+    if extension == ".xls":
+        import xlrd
+        with archives.open_binary(file_path) as f:
+            workbook = xlrd.open_workbook(file_contents=f.read(), on_demand=True)
+        try:
+            return workbook.sheet_names()
+        finally:
+            workbook.release_resources()
+    from openpyxl import load_workbook
+    with archives.open_input(file_path) as source:
+        workbook = load_workbook(source, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _check_sheet(sheet, names, problems):
+    if names is None or sheet is None:
+        return
+    if isinstance(sheet, int):
+        if sheet >= len(names):
+            problems.append(f"Workbook has {len(names)} sheets, expected at least {sheet + 1}")
+    elif sheet not in names:
+        problems.append(f"Missing sheet '{sheet}' (found: {', '.join(names)})")
+
+
+def check_file(spec, file_path):
+    """Return the list of problems that would make this file fail; empty if it looks right"""
+    if not archives.exists(file_path):
+        return ["File not found"]
+    extension = os.path.splitext(file_path)[1].lower()
+    extensions = spec.get("extensions")
+    if extensions and extension not in extensions:
+        return [f"Unexpected file type {extension} (expected {', '.join(extensions)})"]
+
+    problems = []
+    try:
+        names = sheet_names(file_path)
+        _check_sheet(spec.get("sheet", 0), names, problems)
+        if "summary" in spec:
+            _check_sheet(spec["summary"]["sheet"], names, problems)
+        if problems:
+            return problems
+
+        rules = spec.get("boundaries")
+        nrows = rules.get("scan_rows", DEFAULT_SCAN_ROWS) if rules else 0
+        head = engine.read_head(spec, file_path, nrows)
+
+        if spec.get("header"):
+            missing_columns = [col for col in spec.get("required", []) if col not in head.columns]
+            if missing_columns:
+                problems.append(f"Missing required columns: {', '.join(missing_columns)}")
+        elif rules and resolve_data_start(head, rules, spec.get("skip_rows"))[0] is None:
+            # Without a match the read falls back to skip_rows; only a spec without one fails
+            problems.append(no_data_message(rules, nrows))
+    except Exception as e:
+        problems.append(f"Cannot read file: {str(e)}")
+    return problems
+
+
+def run_preflight(spec, files, max_workers=8):
+    """Check all files in parallel and return {file_path: problems} for the rejected ones"""
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        results = list(executor.map(lambda file_path: check_file(spec, file_path), files))
+    return {file_path: problems for file_path, problems in zip(files, results) if problems}
@@ -0,0 +1,54 @@
+"""First rows of an input file, as the processor will see them, for the preview pane
+
+Only the first rows of the sheet (or CSV) the spec reads are parsed; pandas opens xlsx
+files in openpyxl's read-only mode, so even very large exports preview quickly. Previews
+are kept in a small LRU cache keyed by path, size and modification time, so clicking back
+and forth through a file list does not read anything twice.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import archives
+import engine
+from carrier_specs import SPECS
+
+DEFAULT_PREVIEW_ROWS = 30
+CACHE_SIZE = 128
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(carrier, file_path, nrows):
+    stat = archives.stat(file_path)
+    return carrier, os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, nrows
+
+
+def cached_preview(carrier, file_path, nrows=DEFAULT_PREVIEW_ROWS):
+    """The cached preview, or None if the file has to be read"""
+    try:
+        key = _cache_key(carrier, file_path, nrows)
+    except OSError:
+        return None
+    with _lock:
+        frame = _cache.get(key)
+        if frame is not None:
+            _cache.move_to_end(key)
+        return frame
+
+
+def read_preview(carrier, file_path, nrows=DEFAULT_PREVIEW_ROWS):
+    """DataFrame of the first nrows rows of the sheet the carrier's processor reads"""
+    frame = cached_preview(carrier, file_path, nrows)
+    if frame is not None:
+        return frame
+    key = _cache_key(carrier, file_path, nrows)
+    # Raw rows as text: title, header and total rows are shown as they are in the file
+    frame = engine.read_raw(SPECS[carrier], file_path, nrows).fillna("")
+    with _lock:
+        _cache[key] = frame
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return frame
@@ -0,0 +1,386 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import archives
+import engine
+import journal
+import settings
+from carrier_specs import SPECS
+from instrumentation import RunMetrics
+from pipeline import run_pipeline
+from preflight import run_preflight
+from profiling import RunProfiler
+from scheduler import Job, get_scheduler
+
+
+def extract_trailing_numbers(text):
+    """Extract trailing numeric characters from text"""
+    if pd.isna(text):
+        return ""
+
+    text = str(text)
+    match = re.search(r'(\d+)$', text)
+    if match:
+        return match.group(1)
+    else:
+        return ""
+
+
+def process_xml_file(xml_path, progress=print, metrics=None):
+    """Process the Simple Pay XML file and extract reference data"""
+    metrics = metrics or RunMetrics("Simple Pay", enabled=False)
+    try:
+        # Define namespaces
+        namespaces = {
+            'ss': 'urn:schemas-microsoft-com:office:spreadsheet',
+            'o': 'urn:schemas-microsoft-com:office:office',
+            'x': 'urn:schemas-microsoft-com:office:excel',
+        }
+
+        progress("Parsing XML file...")
+        with metrics.span("parse_xml", xml_path) as span:
+            tree = ET.parse(xml_path)
+            root = tree.getroot()
+            span.bytes = engine.file_size(xml_path)
+
+        # Find all Worksheet elements
+        worksheets = root.findall('.//ss:Worksheet', namespaces)
+
+        if not worksheets:
+            progress("Error: No worksheets found in XML")
+            return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []})
+
+        progress(f"Found {len(worksheets)} worksheets in XML")
+
+        # Process each worksheet to find one with the right data
+        for worksheet in worksheets:
+            worksheet_name = worksheet.get('{urn:schemas-microsoft-com:office:spreadsheet}Name', "Unnamed")
+            progress(f"Checking worksheet: {worksheet_name}")
+
+            # Find the Table element within the Worksheet
+            table = worksheet.find('.//ss:Table', namespaces)
+            if table is None:
+                continue
+
+            # Extract rows
+            rows = table.findall('./ss:Row', namespaces)
+            if not rows:
+                continue
+
+            with metrics.span("extract_xml", xml_path) as span:
+                # Process rows to extract data
+                data = []
+                for row in rows:
+                    row_data = []
+                    cells = row.findall('./ss:Cell', namespaces)
+
+                    for cell in cells:
+                        # Handle merged cells
+                        index_attr = cell.get('{urn:schemas-microsoft-com:office:spreadsheet}Index')
+                        if index_attr:
+                            current_index = len(row_data) + 1
+                            for _ in range(int(index_attr) - current_index):
+                                row_data.append(None)
+
+                        # Get cell value
+                        data_element = cell.find('./ss:Data', namespaces)
+                        cell_value = data_element.text if data_element is not None else None
+                        row_data.append(cell_value)
+
+                    data.append(row_data)
+                span.rows = len(data)
+
+            # Check if we have enough data
+            if len(data) <= 1:
+                continue
+
+            # Get headers from the first row
+            headers = data[0]
+            headers = [str(h) if h is not None else f"Column_{i}" for i, h in enumerate(headers)]
+
+            # Create DataFrame
+            df = pd.DataFrame(data[1:], columns=headers)
+
+            # Check if this is the worksheet we want (has required columns)
+            if 'Sorszám' in df.columns and 'Hivatkozás' in df.columns:
+                progress(f"Found required columns in worksheet {worksheet_name}")
+
+                # Extract reference data
+                df_filtered = df[['Sorszám', 'Hivatkozás']]
+
+                # Extract trailing numbers from Hivatkozás
+                df_filtered['Hivatkozás'] = df_filtered['Hivatkozás'].apply(
+                    lambda x: extract_trailing_numbers(x) if not pd.isna(x) else ""
+                )
+
+                # Clean data
+                df_filtered = df_filtered.dropna()
+                df_filtered = df_filtered[df_filtered['Hivatkozás'] != ""]
+
+                return df_filtered
+
+        progress("Could not find a worksheet with the required columns")
+        return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []})
+
+    except Exception as e:
+        progress(f"Error processing XML file: {str(e)}")
+        import traceback
+        progress(traceback.format_exc())
+        return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []})
+
+
+def _parse_reference(xml_path, record_metrics):
+    """Worker process entry point: one parsed reference XML with its messages and spans"""
+    messages = []
+    metrics = RunMetrics("Simple Pay", enabled=record_metrics)
+    frame = process_xml_file(xml_path, messages.append, metrics)
+    return frame, messages, [record.as_dict() for record in metrics.spans]
+
+
+def merge_references(frames):
+    """Merge (xml_path, frame) pairs into one Sorszám/Hivatkozás frame without duplicates
+
+    Returns (frame, conflicts) where conflicts maps every Hivatkozás found with more than
+    one Sorszám to its [(Sorszám, file name)] pairs. As within a single XML, the last
+    occurrence wins, so files given later take precedence.
+    """
+    parts = [frame.assign(Forrás=os.path.basename(xml_path)) for xml_path, frame in frames
+             if frame is not None and not frame.empty]
+    if not parts:
+        return pd.DataFrame({'Sorszám': [], 'Hivatkozás': []}), {}
+    combined = pd.concat(parts, ignore_index=True)
+
+    distinct = combined.drop_duplicates(['Hivatkozás', 'Sorszám'])
+    conflicting = distinct[distinct.groupby('Hivatkozás')['Sorszám'].transform('nunique') > 1]
+    conflicts = {reference: list(zip(group['Sorszám'], group['Forrás']))
+                 for reference, group in conflicting.groupby('Hivatkozás', sort=False)}
+
+    merged = combined.drop_duplicates('Hivatkozás', keep='last')[['Sorszám', 'Hivatkozás']]
+    return merged.reset_index(drop=True), conflicts
+
+
+def reference_paths(options):
+    """Reference XMLs of a Simple Pay run (options["xml_paths"], or the single options["xml_path"])"""
+    return options.get("xml_paths") or [options["xml_path"]]
+
+
+def load_references(xml_paths, progress=print, metrics=None, limit=10):
+    """Parse the reference XMLs (in parallel when there are several) into one merged frame"""
+    metrics = metrics or RunMetrics("Simple Pay", enabled=False)
+    workers = min(len(xml_paths), settings.WORKERS)
+    if workers <= 1:
+        frames = [(xml_path, process_xml_file(xml_path, progress, metrics)) for xml_path in xml_paths]
+    else:
+        progress(f"Parsing {len(xml_paths)} XML files on {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_parse_reference, xml_path, metrics.enabled) for xml_path in xml_paths]
+            frames = []
+            for xml_path, future in zip(xml_paths, futures):
+                frame, messages, spans = future.result()
+                progress(f"{os.path.basename(xml_path)}:")
+                for message in messages:
+                    progress(f"  {message}")
+                metrics.add_span_dicts(spans)
+                frames.append((xml_path, frame))
+
+    with metrics.span("merge_references") as span:
+        merged, conflicts = merge_references(frames)
+        span.rows = len(merged)
+
+    if len(xml_paths) > 1:
+        total = sum(0 if frame is None else len(frame) for _, frame in frames)
+        progress(f"Merged {total} reference rows from {len(xml_paths)} XML files into {len(merged)} references")
+    if conflicts:
+        progress(f"Warning: {len(conflicts)} references have different Sorszám values, the last one is used:")
+        for reference, values in list(conflicts.items())[:limit]:
+            progress(f"  {reference}: " + ", ".join(f"{sorszam} ({file_name})" for sorszam, file_name in values))
+        if len(conflicts) > limit:
+            progress(f"  ... and {len(conflicts) - limit} more")
+    return merged
+
+
+def process_file(carrier, file_path, options, progress=print, metrics=None, reference=None):
+    """Run one input file through the spec of the given carrier"""
+    if carrier not in SPECS:
+        raise ValueError(f"Unknown carrier: {carrier}")
+    return engine.process(SPECS[carrier], file_path, options, progress, metrics, reference)
+
+
+class BatchCancelled(Exception):
+    """Raised for the files of a batch that were not started because the batch was stopped"""
+
+    def __init__(self):
+        super().__init__("Not processed, the batch was stopped")
+
+
+# How long a finished job's last streamed messages may take to reach the log
+MESSAGE_WAIT_SECONDS = 5
+
+
+def _run_on_pool(carrier, files, options, reference, progress, metrics, on_done, should_stop=None, matcher=None):
+    """Run the files on the shared worker pool, largest first; results come back in input order"""
+    scheduler = get_scheduler()
+    jobs = [Job(carrier, file_path, options, reference, metrics.enabled, should_stop, matcher, progress)
+            for file_path in files]
+    progress(f"Scheduling {len(jobs)} files on {scheduler.workers} worker processes, largest first")
+    scheduler.submit(jobs)
+
+    jobs_by_future = {job.future: job for job in jobs}
+    results = {}
+    for future in as_completed(jobs_by_future):
+        job = jobs_by_future[future]
+        result = None
+        try:
+            outcome = future.result()
+            job.messages_done.wait(MESSAGE_WAIT_SECONDS)
+            for message in outcome["messages"]:
+                progress(message)
+            metrics.add_span_dicts(outcome["spans"])
+            result = outcome["output_path"]
+            error = None
+        except CancelledError:
+            error = BatchCancelled()
+        except BrokenProcessPool as e:
+            # The worker died, so its end of the message stream never comes
+            error = e
+        except Exception as e:
+            job.messages_done.wait(MESSAGE_WAIT_SECONDS)
+            error = e
+        results[job.file_path] = (job.file_path, result, error)
+        on_done(job.file_path, result, error)
+
+    for line in scheduler.worker_stats_lines():
+        progress(line)
+    return [results[file_path] for file_path in files]
+
+
+XML_FAILED = "XML processing failed"
+
+
+def run_batch(carrier, files, options=None, progress=print, metrics=None, reference=None, profile=False,
+              should_stop=None, resume=True):
+    """Process every file of a batch and return (processed output paths, error messages)
+
+    Simple Pay runs need options["xml_paths"] (or "xml_path") and options["file_type"]; the
+    XML reference data is loaded here unless it is passed in as reference. Reading,
+    transforming and writing overlap across files (see pipeline.py), so progress may be
+    called from several threads. With profile=True the run is wrapped in cProfile and the
+    profile is saved next to the first input file. Archives (.zip, .gz) among the files are
+    replaced by their members the carrier reads, see archives.py.
+
+    Every finished file is checkpointed in the journal (see journal.py). If the same batch
+    was interrupted before, the files it finished are skipped unless resume is False.
+    should_stop is polled between files; once it returns True no further file is started.
+    """
+    options = options or {}
+    metrics = metrics or RunMetrics(carrier, enabled=False)
+    output_dir = os.path.dirname(archives.container(files[0])) if files else os.getcwd()
+
+    with RunProfiler(output_dir, carrier, enabled=profile) as profiler:
+        if carrier not in SPECS:
+            raise ValueError(f"Unknown carrier: {carrier}")
+        spec = SPECS[carrier]
+        if spec.get("provisional"):
+            progress(f"Warning: the {carrier} layout ({', '.join(map(str, spec['columns']))}) is provisional; "
+                     f"check the outputs against the export")
+
+        # Archives in the selection are processed member by member (see archives.py)
+        patterns = [f"*{extension}" for extension in spec["extensions"]]
+        expanded = []
+        for file_path in files:
+            found = archives.expand([file_path], patterns)
+            if archives.is_archive(file_path):
+                progress(f"Archive {os.path.basename(file_path)}: {len(found)} matching files")
+            expanded += found
+        files = expanded
+        all_files = list(files)
+
+        batch = journal.Batch(carrier, all_files, options) if settings.JOURNAL_ENABLED else None
+        resumed = batch.finished_files() if batch and resume else {}
+        if resumed:
+            progress(f"Resuming an interrupted batch: {len(resumed)} of {len(all_files)} files are already done")
+            for file_path in files:
+                if os.path.abspath(file_path) in resumed:
+                    progress(f"↷ Skipping {os.path.basename(file_path)}: already processed")
+            files = [file_path for file_path in files if os.path.abspath(file_path) not in resumed]
+
+        rejected = {}
+        if settings.PREFLIGHT_ENABLED:
+            with metrics.span("preflight") as span:
+                rejected = run_preflight(spec, files)
+                span.rows = len(files)
+            progress(f"Preflight: {len(files) - len(rejected)} of {len(files)} files look valid")
+            for file_path, problems in rejected.items():
+                progress(f"✗ Rejected {os.path.basename(file_path)}: {'; '.join(problems)}")
+            files = [file_path for file_path in files if file_path not in rejected]
+
+        if batch:
+            for file_path, problems in rejected.items():
+                batch.checkpoint(file_path, error="; ".join(problems))
+
+        if carrier == "Simple Pay" and reference is None:
+            reference = load_references(reference_paths(options), progress, metrics)
+            if reference is None or reference.empty:
+                progress("Error: Failed to process XML file or no valid data found")
+                return [], [XML_FAILED]
+            progress(f"XML processing complete. Found {len(reference)} reference records.")
+        # Build the Hivatkozás -> Sorszám lookup and the near-match index once for the whole batch
+        reference = engine.reference_index(reference)
+        matcher = engine.near_matcher(spec, options, reference)
+
+        def read(file_path):
+            if should_stop is not None and should_stop():
+                raise BatchCancelled()
+            progress(f"Processing file: {os.path.basename(file_path)}")
+            return engine.read_input(spec, file_path, metrics, progress)
+
+        def transform(file_path, source):
+            return engine.transform(spec, source, options, reference, progress, metrics, matcher)
+
+        def write(file_path, outputs):
+            return engine.write_outputs(spec, file_path, outputs, progress, metrics)[0]
+
+        def done(file_path, output_path, error):
+            if isinstance(error, BatchCancelled):
+                # Stays pending in the journal and is picked up when the batch is resumed
+                return
+            if batch:
+                batch.checkpoint(file_path, output_path, error)
+            if error is None:
+                progress(f"✓ Successfully processed: {os.path.basename(file_path)}")
+            else:
+                progress(f"✗ Error processing {os.path.basename(file_path)}: {str(error)}")
+
+        if settings.WORKERS > 1 and len(files) > 1 and not profile:
+            results = _run_on_pool(carrier, files, options, reference, progress, metrics, done, should_stop, matcher)
+        else:
+            # cProfile only sees the calling thread, so profiled runs keep all stages in it
+            depth = 0 if profile else settings.PIPELINE_DEPTH
+            results = run_pipeline(files, read, transform, write, depth=depth, on_done=done)
+
+        processed_files = [resumed[os.path.abspath(file_path)] for file_path in all_files
+                           if os.path.abspath(file_path) in resumed]
+        processed_files += [output_path for _, output_path, error in results if error is None]
+        errors = [f"Error processing {file_path}: {'; '.join(problems)}" for file_path, problems in rejected.items()]
+        errors += [f"Error processing {file_path}: {str(error)}" for file_path, _, error in results
+                   if error is not None and not isinstance(error, BatchCancelled)]
+
+        stopped = sum(isinstance(error, BatchCancelled) for _, _, error in results)
+        if stopped:
+            progress(f"Stopped: {stopped} files were not processed; run the same files again to resume")
+        elif batch:
+            batch.finish()
+
+    for line in metrics.summary_lines():
+        progress(line)
+    for path in metrics.export(output_dir):
+        progress(f"Stage timings saved to: {path}")
+    for path in profiler.paths:
+        progress(f"Profile saved to: {path}")
+
+    return processed_files, errors
@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+
+
+class RunProfiler:
+    """Wrap one processing run in cProfile and save the result next to the outputs
+
+    Writes a .prof file (open with snakeviz, pstats or gprof2dot) and a .speedscope.json
+    file (open at https://www.speedscope.app, the same format py-spy writes with
+    --format speedscope). cProfile only sees the thread that entered the profiler.
+    """
+
+    def __init__(self, output_dir, name, enabled=True):
+        self.output_dir = output_dir
+        self.name = name.lower().replace(" ", "_")
+        self.enabled = enabled
+        self.profile = None
+        self.paths = []
+
+    def __enter__(self):
+        if self.enabled:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile is None:
+            return False
+        self.profile.disable()
+        base_path = os.path.join(self.output_dir, f"profile_{self.name}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+        prof_path = base_path + ".prof"
+        self.profile.dump_stats(prof_path)
+
+        speedscope_path = base_path + ".speedscope.json"
+        with open(speedscope_path, "w", encoding="utf-8") as f:
+            json.dump(to_speedscope(pstats.Stats(self.profile), self.name), f)
+
+        self.paths = [prof_path, speedscope_path]
+        return False
+
+
+def to_speedscope(stats, name, min_fraction=1e-4, max_depth=128):
+    """Convert pstats data into a speedscope "sampled" profile
+
+    cProfile only keeps caller/callee edges, so the call stacks are reconstructed by
+    splitting each function's time over its callers in proportion to the edge times.
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    frames = []
+    frame_index = {}
+
+    def frame_of(func):
+        if func not in frame_index:
+            file_name, line, function_name = func
+            frame_index[func] = len(frames)
+            frames.append({"name": function_name, "file": file_name, "line": line})
+        return frame_index[func]
+
+    roots = [func for func, value in raw.items() if not value[4]]
+    # Drop stacks below a fraction of the run so large call graphs stay small
+    min_seconds = max(sum(raw[root][3] for root in roots) * min_fraction, 1e-6)
+
+    samples = []
+    weights = []
+
+    def visit(func, stack, seconds):
+        _, _, total_time, cumulative_time, _ = raw[func]
+        share = seconds / cumulative_time if cumulative_time else 0.0
+        stack = stack + [frame_of(func)]
+        self_seconds = total_time * share
+        if self_seconds >= min_seconds:
+            samples.append(stack)
+            weights.append(self_seconds)
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_seconds in callees.get(func, []):
+            # Recursive calls are already accounted for in the outer frame
+            if frame_index.get(callee) in stack:
+                continue
+            callee_seconds = edge_seconds * share
+            if callee_seconds >= min_seconds:
+                visit(callee, stack, callee_seconds)
+
+    for root in roots:
+        visit(root, [], raw[root][3])
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "ProcessAutomate",
+    }
@@ -0,0 +1,164 @@
+"""Columnar sidecar cache for parsed spreadsheet inputs
+
+The first time an input is parsed, the kept columns are stored as an Arrow IPC (Feather)
+file keyed by the SHA-256 of the input bytes and the read parameters of the spec. Later
+reads of the same content load the sidecar instead of parsing the workbook again. The
+cache directory is bounded by settings.READ_CACHE_MAX_BYTES; the least recently used
+entries are evicted first. pyarrow is optional: without it the cache is simply off.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import archives
+import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+CACHE_VERSION = 2
+SUFFIX = ".arrow"
+_LABELS_KEY = b"processautomate_labels"
+
+_hash_memo = {}
+_lock = threading.Lock()
+
+
+def is_available():
+    return pa is not None and settings.READ_CACHE_ENABLED
+
+
+def cache_dir():
+    return settings.READ_CACHE_DIR
+
+
+def content_hash(file_path):
+    """SHA-256 of the file (or archive member), remembered per (path, size, mtime) for this process"""
+    stat = archives.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with archives.open_binary(file_path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _lock:
+        _hash_memo[memo_key] = value
+    return value
+
+
+def cache_key(file_path, params, part):
+    """Key of one parsed part ("frame", "summary") of a file under the given read parameters"""
+    params_text = json.dumps(params, sort_keys=True, default=str)
+    params_hash = hashlib.sha256(f"{CACHE_VERSION}:{params_text}:{part}".encode("utf-8")).hexdigest()[:16]
+    return f"{content_hash(file_path)[:32]}_{params_hash}"
+
+
+def _entry_path(key):
+    return os.path.join(cache_dir(), key + SUFFIX)
+
+
+def load(key):
+    """Return the cached frame for key, or None"""
+    path = _entry_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path)
+    except (OSError, pa.ArrowException):
+        return None
+    frame = table.to_pandas()
+    metadata = table.schema.metadata or {}
+    if _LABELS_KEY in metadata:
+        # Arrow only has string column names; restore positional (int) labels
+        frame.columns = json.loads(metadata[_LABELS_KEY])
+    # Mark as recently used for eviction
+    os.utime(path, None)
+    return frame
+
+
+def store(key, frame):
+    """Save frame under key; frames Arrow cannot represent (mixed object columns) are skipped"""
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        return False
+    metadata = dict(table.schema.metadata or {})
+    metadata[_LABELS_KEY] = json.dumps(list(frame.columns), default=str).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(cache_dir(), exist_ok=True)
+    path = _entry_path(key)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    feather.write_feather(table, temp_path)
+    os.replace(temp_path, path)
+    evict(settings.READ_CACHE_MAX_BYTES)
+    return True
+
+
+def entries():
+    """(path, size, last used) of every cache entry, least recently used first"""
+    directory = cache_dir()
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                found.append((entry.path, stat.st_size, stat.st_mtime))
+    found.sort(key=lambda item: item[2])
+    return found
+
+
+def evict(max_bytes):
+    """Delete least recently used entries until the cache fits max_bytes; returns bytes freed"""
+    current = entries()
+    total = sum(size for _, size, _ in current)
+    freed = 0
+    for path, size, _ in current:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        freed += size
+    return freed
+
+
+def clear():
+    """Delete every cache entry and return how many were removed"""
+    removed = 0
+    for path, _, _ in entries():
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def info_lines():
+    """Summary of the cache for the CLI"""
+    current = entries()
+    total = sum(size for _, size, _ in current)
+    lines = [
+        f"Cache directory: {cache_dir()}",
+        f"Enabled: {'yes' if is_available() else 'no (needs pyarrow and PROCESSAUTOMATE_READ_CACHE)'}",
+        f"Entries: {len(current)}",
+        f"Size: {total / (1024 * 1024):.1f} MiB of {settings.READ_CACHE_MAX_BYTES / (1024 * 1024):.0f} MiB",
+    ]
+    if current:
+        lines.append(f"Oldest entry used: {time.strftime('%Y-%m-%d %H:%M', time.localtime(current[0][2]))}")
+        lines.append(f"Newest entry used: {time.strftime('%Y-%m-%d %H:%M', time.localtime(current[-1][2]))}")
+    return lines
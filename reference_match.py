@@ -0,0 +1,119 @@
+"""Second pass for Simple Pay transaction IDs that have no exact reference
+
+IDs that miss the reference index often name a reference all the same: with leading
+zeros, behind a prefix other than "pg-"/"T", or cut short at either end. NearMatcher
+indexes the reference numbers (the digits at the end of Hivatkozás, without leading
+zeros) once:
+
+    by_number   number -> {Sorszám: Hivatkozás}
+    forward     the numbers sorted, for "starts with" ranges by bisection
+    backward    the numbers reversed and sorted, for "ends with" ranges
+
+An ID is resolved from the digits at its end with two bisections and a few dictionary
+lookups, so the cost per ID grows with log(references), not with their number:
+
+    normalized  the same number (leading zeros, another prefix)   confidence 0.95
+    truncated   the ID is the start or the end of a reference      shorter / longer
+    extended    a reference is the start or the end of the ID      shorter / longer
+
+The ID resolves only when its best candidates agree on one Sorszám and their confidence
+reaches the minimum; the others keep the mapping default and are reported.
+"""
+import bisect
+from collections import namedtuple
+
+import pandas as pd
+
+# Fewer digits than this match too many references to mean anything
+MIN_DIGITS = 4
+NORMALIZED_CONFIDENCE = 0.95
+# A "starts with"/"ends with" range wider than this is ambiguous without looking further
+MAX_CANDIDATES = 8
+
+# sorszam is None for IDs that are not resolved; method then says why
+Resolution = namedtuple("Resolution", ["id", "reference", "sorszam", "method", "confidence"])
+
+
+def numbers(values):
+    """The digits at the end of every value without leading zeros ("" if there are none)"""
+    digits = pd.Series(values, dtype=object).astype(str).str.extract(r"(\d+)$", expand=False)
+    return digits.fillna("").str.lstrip("0").tolist()
+
+
+class NearMatcher:
+    """Index over a reference_index() series (Hivatkozás -> Sorszám)"""
+
+    def __init__(self, index):
+        self.by_number = {}
+        for number, reference, sorszam in zip(numbers(index.index), index.index, index.astype(object)):
+            if number:
+                self.by_number.setdefault(number, {})[sorszam] = reference
+        self.forward = sorted(self.by_number)
+        self.backward = sorted(number[::-1] for number in self.by_number)
+
+    @staticmethod
+    def _starting_with(keys, prefix):
+        # ":" sorts right after "9", so the range holds every key that starts with prefix
+        low = bisect.bisect_left(keys, prefix)
+        high = bisect.bisect_left(keys, prefix + ":", low)
+        return keys[low:high] if high - low <= MAX_CANDIDATES else None
+
+    def _candidates(self, number):
+        """[(reference number, confidence, method)], or None when too many references fit"""
+        if number in self.by_number:
+            return [(number, NORMALIZED_CONFIDENCE, "normalized")]
+        starts = self._starting_with(self.forward, number)
+        ends = self._starting_with(self.backward, number[::-1])
+        if starts is None or ends is None:
+            return None
+        candidates = [(found, len(number) / len(found), "truncated") for found in starts]
+        candidates += [(found[::-1], len(number) / len(found), "truncated") for found in ends]
+        for length in range(len(number) - 1, MIN_DIGITS - 1, -1):
+            for part in {number[:length], number[-length:]}:
+                if part in self.by_number:
+                    candidates.append((part, length / len(number), "extended"))
+        return candidates
+
+    def resolve(self, key, number, min_confidence):
+        if len(number) < MIN_DIGITS:
+            return Resolution(key, None, None, "too short", 0.0)
+        candidates = self._candidates(number)
+        if candidates is None:
+            return Resolution(key, None, None, "ambiguous", 0.0)
+        if not candidates:
+            return Resolution(key, None, None, "no candidate", 0.0)
+        confidence = max(candidate[1] for candidate in candidates)
+        best = [candidate for candidate in candidates if candidate[1] == confidence]
+        found = {sorszam: reference for number, _, _ in best for sorszam, reference in self.by_number[number].items()}
+        if len(found) > 1:
+            return Resolution(key, None, None, "ambiguous", confidence)
+        if confidence < min_confidence:
+            return Resolution(key, None, None, "below minimum", confidence)
+        (sorszam, reference), = found.items()
+        return Resolution(key, reference, sorszam, best[0][2], confidence)
+
+    def resolve_all(self, keys, min_confidence):
+        """A Resolution for every key"""
+        return [self.resolve(key, number, min_confidence) for key, number in zip(keys, numbers(keys))]
+
+
+def resolution_lines(file_name, resolutions, default, limit=5):
+    """Messages for the log panel; empty when nothing was left unmatched"""
+    if not resolutions:
+        return []
+    resolved = [resolution for resolution in resolutions if resolution.sorszam is not None]
+    lines = [f"Near match: resolved {len(resolved)} of {len(resolutions)} unmatched transaction IDs in {file_name}"]
+    for resolution in resolved[:limit]:
+        lines.append(f"  {resolution.id} -> {resolution.reference} (Sorszám {resolution.sorszam}, "
+                     f"{resolution.method}, confidence {resolution.confidence:.2f})")
+    if len(resolved) > limit:
+        lines.append(f"  ... and {len(resolved) - limit} more")
+    reasons = {}
+    for resolution in resolutions:
+        if resolution.sorszam is None:
+            reasons[resolution.method] = reasons.get(resolution.method, 0) + 1
+    if reasons:
+        counts = ", ".join(f"{reason}: {count}" for reason, count in reasons.items())
+        lines.append(f"Warning: {sum(reasons.values())} transaction IDs in {file_name} keep Sorszám {default} "
+                     f"({counts})")
+    return lines
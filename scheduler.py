@@ -0,0 +1,287 @@
+"""Shared process pool that runs carrier jobs largest-first
+
+All carrier windows (and the CLI) submit their files to one Scheduler. Pending jobs from
+every carrier sit in one queue ordered by estimated cost, and a worker that becomes idle
+always takes the most expensive job left, whichever carrier it belongs to. That keeps one
+huge file from starting last and dominating the wall time of a mixed month-end run.
+
+Jobs are also admitted against a memory budget (settings.MEMORY_BUDGET_BYTES): a job
+only starts while the estimated peaks of the running jobs plus its own fit, so several
+big workbooks do not expand in memory at the same time. The estimates come from
+memory_model.py and are calibrated with the memory every finished job actually used.
+
+The log messages of a running job are streamed back through a multiprocessing queue
+shared by the workers, so the window shows them while the file is processed, not only
+once it is done. Every job ends its stream with None.
+
+A worker process that dies (a crash in a native reader, the out-of-memory killer) breaks
+the whole ProcessPoolExecutor: its running jobs fail with BrokenProcessPool, the jobs
+still queued are failed with it too, and the next submit starts a fresh pool.
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import archives
+import memory_model
+import settings
+
+# Relative parsing cost per input byte; xls/xlsx are far slower to parse than CSV
+COST_FACTORS = {
+    ".xls": 4.0,
+    ".xlsx": 3.0,
+    ".xml": 2.0,
+    ".csv": 1.0,
+}
+
+
+def estimate_cost(file_path):
+    """Estimated relative cost of processing one file, from its size and type"""
+    try:
+        size = archives.stat(file_path).st_size
+    except OSError:
+        size = 0
+    extension = os.path.splitext(file_path)[1].lower()
+    return size * COST_FACTORS.get(extension, 2.0)
+
+
+_job_ids = itertools.count()
+# Inside a worker process: the queue its jobs stream (job id, message) into
+_messages = None
+
+
+def _init_worker(messages):
+    global _messages
+    _messages = messages
+
+
+class Job:
+    """One input file to be processed by a worker process; progress gets its log messages
+    as they happen (called on the scheduler's forwarding thread)"""
+
+    def __init__(self, carrier, file_path, options=None, reference=None, record_metrics=False, should_stop=None,
+                 matcher=None, progress=None):
+        self.id = next(_job_ids)
+        self.carrier = carrier
+        self.file_path = file_path
+        self.options = options or {}
+        self.reference = reference
+        self.matcher = matcher
+        self.record_metrics = record_metrics
+        self.cost = estimate_cost(file_path)
+        self.memory = memory_model.estimate(carrier, file_path)
+        # Polled before the job is started (stays in this process, never sent to a worker)
+        self.should_stop = should_stop
+        self.progress = progress
+        # Set once the worker's messages for this job have all been forwarded
+        self.messages_done = threading.Event()
+        self.future = Future()
+
+
+def run_job(carrier, file_path, options, reference, record_metrics, matcher=None, job_id=None):
+    """Entry point inside the worker process; returns the result and what happened on the way
+    (messages holds the log lines only when they could not be streamed)"""
+    import engine
+    from carrier_specs import SPECS
+    from instrumentation import PeakMemory, RunMetrics
+
+    messages = []
+
+    def progress(message):
+        if _messages is not None and job_id is not None:
+            _messages.put((job_id, message))
+        else:
+            messages.append(message)
+
+    metrics = RunMetrics(carrier, enabled=record_metrics)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        with PeakMemory() as memory:
+            output_path = engine.process(SPECS[carrier], file_path, options, progress, metrics, reference, matcher)
+    finally:
+        if _messages is not None and job_id is not None:
+            _messages.put((job_id, None))
+    return {
+        "output_path": output_path,
+        "memory_used": memory.used_bytes,
+        "messages": messages,
+        "spans": [record.as_dict() for record in metrics.spans],
+        "pid": os.getpid(),
+        "wall_s": time.perf_counter() - started,
+        "cpu_s": time.process_time() - cpu_started,
+    }
+
+
+class Scheduler:
+    """Largest-first job queue in front of a ProcessPoolExecutor"""
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or settings.WORKERS)
+        self._executor = None
+        self._pending = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._lock = threading.Lock()
+        self._worker_stats = {}
+        self.memory_budget = settings.MEMORY_BUDGET_BYTES
+        self._memory_in_use = 0
+        self._peak_memory_in_use = 0
+        self._memory_waits = 0
+        self._messages = None
+        self._streaming = {}
+
+    def submit(self, jobs):
+        """Queue jobs and return their futures; results are run_job dicts"""
+        with self._lock:
+            for job in jobs:
+                heapq.heappush(self._pending, (-job.cost, next(self._sequence), job))
+            self._dispatch()
+        return [job.future for job in jobs]
+
+    def _dispatch(self):
+        # Called with the lock held
+        if self._messages is None:
+            self._messages = multiprocessing.Queue()
+            threading.Thread(target=self._forward_messages, daemon=True).start()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._messages,))
+        while self._running < self.workers and self._pending:
+            job = self._next_admissible()
+            if job is None:
+                # Nothing fits next to the running jobs; a finishing job dispatches again
+                self._memory_waits += 1
+                break
+            if job.should_stop is not None and job.should_stop():
+                job.future.cancel()
+                # Wakes up as_completed/wait callers, which cancel() alone does not
+                job.future.set_running_or_notify_cancel()
+                continue
+            self._running += 1
+            self._memory_in_use += job.memory
+            self._peak_memory_in_use = max(self._peak_memory_in_use, self._memory_in_use)
+            self._streaming[job.id] = job
+            executor = self._executor
+            try:
+                executor_future = executor.submit(run_job, job.carrier, job.file_path, job.options,
+                                                  job.reference, job.record_metrics, job.matcher, job.id)
+            except BrokenProcessPool as error:
+                self._release(job)
+                self._streaming.pop(job.id, None)
+                job.future.set_exception(error)
+                self._broken(executor, error)
+                return
+            executor_future.add_done_callback(
+                lambda done, job=job, executor=executor: self._finished(job, executor, done))
+
+    def _release(self, job):
+        # Called with the lock held: undo what _dispatch booked for a job that is over
+        self._running -= 1
+        self._memory_in_use -= job.memory
+
+    def _broken(self, executor, error):
+        """Drop a pool whose worker died and fail the jobs still queued; called with the lock held"""
+        if self._executor is not executor:
+            # Already replaced after an earlier job of the same pool failed
+            return
+        self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        pending, self._pending = self._pending, []
+        for _, _, job in pending:
+            job.future.set_exception(BrokenProcessPool(f"Not processed, a worker process died: {error}"))
+
+    def _forward_messages(self):
+        """Hand the messages streamed by the workers to the progress of their jobs"""
+        while True:
+            job_id, message = self._messages.get()
+            with self._lock:
+                job = self._streaming.pop(job_id, None) if message is None else self._streaming.get(job_id)
+            if job is None:
+                continue
+            if message is None:
+                job.messages_done.set()
+            elif job.progress is not None:
+                job.progress(message)
+
+    def _next_admissible(self):
+        """Pop the most expensive pending job whose memory estimate fits the budget"""
+        # Called with the lock held. A job larger than the whole budget still runs, alone.
+        skipped = []
+        chosen = None
+        while self._pending:
+            entry = heapq.heappop(self._pending)
+            job = entry[2]
+            if self._running == 0 or self._memory_in_use + job.memory <= self.memory_budget:
+                chosen = job
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._pending, entry)
+        return chosen
+
+    def _finished(self, job, executor, executor_future):
+        error = executor_future.exception()
+        # Resolved first, so nothing that fails below can leave the batch waiting for it
+        if error is None:
+            job.future.set_result(executor_future.result())
+        else:
+            job.future.set_exception(error)
+        try:
+            if error is None:
+                memory_model.observe(job.carrier, job.file_path, executor_future.result()["memory_used"])
+        finally:
+            with self._lock:
+                self._release(job)
+                if error is None:
+                    self._add_worker_stats(job, executor_future.result())
+                elif isinstance(error, BrokenProcessPool):
+                    # The worker is gone, so the end of its message stream never comes
+                    self._streaming.pop(job.id, None)
+                    self._broken(executor, error)
+                self._dispatch()
+
+    def _add_worker_stats(self, job, result):
+        # Called with the lock held
+        stats = self._worker_stats.setdefault(result["pid"], {"jobs": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                               "bytes": 0, "carriers": set()})
+        stats["jobs"] += 1
+        stats["wall_s"] += result["wall_s"]
+        stats["cpu_s"] += result["cpu_s"]
+        try:
+            stats["bytes"] += archives.stat(job.file_path).st_size
+        except OSError:
+            pass
+        stats["carriers"].add(job.carrier)
+
+    def worker_stats_lines(self):
+        """Per-worker totals since the scheduler started, for the log panel"""
+        with self._lock:
+            items = sorted(self._worker_stats.items())
+        lines = [f"Worker pool ({self.workers} workers, memory budget {self.memory_budget / (1024 * 1024):.0f} MiB, "
+                 f"peak planned {self._peak_memory_in_use / (1024 * 1024):.0f} MiB, "
+                 f"{self._memory_waits} waits for memory):"]
+        for pid, stats in items:
+            lines.append(
+                f"  worker {pid}: {stats['jobs']} jobs, {stats['wall_s']:.2f}s busy, {stats['cpu_s']:.2f}s cpu, "
+                f"{stats['bytes'] / (1024 * 1024):.1f} MiB input ({', '.join(sorted(stats['carriers']))})"
+            )
+        return lines + memory_model.factor_lines()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every carrier window"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
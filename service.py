@@ -0,0 +1,386 @@
+"""Local HTTP processing service: one warm process that several users submit batches to
+
+Run with `python cli.py serve`. Batches are queued and run by processors.run_batch, so
+their files share the process-wide worker pool (scheduler.py) and the read cache, and
+parsed Simple Pay references stay in memory between batches instead of being parsed
+again in every desktop session. Everything is JSON over the standard library's
+http.server:
+
+    GET    /health                     service status
+    GET    /jobs                       every known job, newest first
+    POST   /jobs                       queue a batch (see below); 202 with the job
+    GET    /jobs/<id>                  status, progress messages, outputs and errors
+    GET    /jobs/<id>/outputs/<n>      download output file n of a finished job
+    DELETE /jobs/<id>                  stop the batch; files not started yet are skipped
+
+A batch is {"carrier": "gls", "files": [...], "options": {...}}. files are paths on the
+machine running the service; "uploads": [{"name": ..., "content": <base64>}] sends
+the inputs along instead, they are stored under settings.SERVICE_UPLOAD_DIR and the
+outputs are written next to them. options follow the CLI: optional_1, optional_2
+(entered positive, stored negated), audit, strict_totals, and for Simple Pay file_type,
+near_match plus xml_paths or "xml_uploads" in the same form as uploads.
+"""
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import archives
+import engine
+import processors
+import settings
+from carrier_specs import CARRIERS, SPECS
+from instrumentation import RunMetrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STOPPED = "stopped"
+
+# Finished jobs kept for status requests; older ones are forgotten (their files stay)
+JOB_HISTORY = 500
+
+# Parsed reference sets kept in memory
+REFERENCE_CACHE_SIZE = 8
+
+
+class RequestError(Exception):
+    """Invalid request; reported to the client with the given HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _carrier(name):
+    if name in SPECS:
+        return name
+    if name in CARRIERS:
+        return CARRIERS[name]
+    raise RequestError(f"Unknown carrier: {name}")
+
+
+def _save_uploads(uploads, folder):
+    """Decode [{"name", "content"}] into folder; returns the saved paths"""
+    paths = []
+    for upload in uploads:
+        name = os.path.basename(str(upload.get("name", "")))
+        if not name or name.startswith("."):
+            raise RequestError(f"Invalid upload name: {upload.get('name')!r}")
+        try:
+            content = base64.b64decode(upload.get("content", ""), validate=True)
+        except (binascii.Error, TypeError):
+            raise RequestError(f"Upload {name} is not valid base64")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        paths.append(path)
+    return paths
+
+
+def _existing_files(paths):
+    missing = [path for path in paths if not (os.path.isfile(path) or archives.is_member(path) and archives.exists(path))]
+    if missing:
+        raise RequestError(f"Files not found: {', '.join(missing)}")
+    return [os.path.abspath(path) for path in paths]
+
+
+class ReferenceCache:
+    """Parsed Simple Pay reference indexes, keyed by the XML paths and their state"""
+
+    def __init__(self, size=REFERENCE_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        # Guards _entries and _loading; never held while XMLs are parsed
+        self._lock = threading.Lock()
+        # key -> lock held while that key's XMLs are parsed
+        self._loading = {}
+
+    def _cached(self, key):
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+            return index
+
+    def get(self, xml_paths, progress, metrics):
+        key = tuple((path, stat.st_size, stat.st_mtime_ns) for path, stat in
+                    ((path, os.stat(path)) for path in xml_paths))
+        index = self._cached(key)
+        if index is None:
+            with self._lock:
+                key_lock = self._loading.setdefault(key, threading.Lock())
+            # A batch waiting for the same XMLs reuses the parse; other XMLs load meanwhile
+            with key_lock:
+                index = self._cached(key)
+                if index is None:
+                    try:
+                        reference = processors.load_references(list(xml_paths), progress, metrics)
+                        if reference is None or reference.empty:
+                            return None
+                        index = engine.reference_index(reference)
+                        with self._lock:
+                            self._entries[key] = index
+                            while len(self._entries) > self.size:
+                                self._entries.popitem(last=False)
+                        return index
+                    finally:
+                        with self._lock:
+                            self._loading.pop(key, None)
+        progress(f"Using the cached reference data ({len(index)} references)")
+        return index
+
+
+class ServiceJob:
+    """One queued batch and everything reported about it"""
+
+    def __init__(self, carrier, files, options, upload_dir=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.carrier = carrier
+        self.files = files
+        self.options = options
+        self.upload_dir = upload_dir
+        self.status = QUEUED
+        self.messages = []
+        self.outputs = []
+        self.errors = []
+        self.created_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.started_at = None
+        self.finished_at = None
+        self.stop_requested = threading.Event()
+
+    def as_dict(self, messages=True):
+        job = {
+            "id": self.id,
+            "carrier": self.carrier,
+            "status": self.status,
+            "files": self.files,
+            "outputs": self.outputs,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if messages:
+            job["messages"] = list(self.messages)
+        return job
+
+
+class JobQueue:
+    """Runs submitted batches, settings.SERVICE_BATCHES at a time"""
+
+    def __init__(self, batches=None):
+        self.references = ReferenceCache()
+        self._executor = ThreadPoolExecutor(max_workers=batches or settings.SERVICE_BATCHES,
+                                            thread_name_prefix="service-batch")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, request):
+        """Validate a batch request and queue it; returns the job"""
+        if not isinstance(request, dict):
+            raise RequestError("Expected a JSON object")
+        carrier = _carrier(request.get("carrier", ""))
+        options = self._options(carrier, request.get("options") or {})
+
+        upload_dir = None
+        if request.get("uploads") or request.get("xml_uploads"):
+            upload_dir = os.path.join(settings.SERVICE_UPLOAD_DIR, time.strftime("%Y%m%d"), uuid.uuid4().hex[:12])
+        files = _existing_files(request.get("files") or [])
+        files += _save_uploads(request.get("uploads") or [], upload_dir)
+        if not files:
+            raise RequestError("No input files: give files or uploads")
+        if carrier == "Simple Pay":
+            xml_paths = _existing_files(options.get("xml_paths") or [])
+            xml_paths += _save_uploads(request.get("xml_uploads") or [], os.path.join(upload_dir or "", "xml"))
+            if not xml_paths:
+                raise RequestError("Simple Pay batches need options.xml_paths or xml_uploads")
+            options["xml_paths"] = xml_paths
+
+        job = ServiceJob(carrier, files, options, upload_dir)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        self._executor.submit(self._run, job)
+        return job
+
+    @staticmethod
+    def _options(carrier, options):
+        if not isinstance(options, dict):
+            raise RequestError("options must be an object")
+        result = {"optional_1": str(options.get("optional_1") or ""), "optional_2": ""}
+        if options.get("optional_2"):
+            try:
+                # Same convention as the windows and the CLI: entered positive, stored negated
+                result["optional_2"] = -abs(int(options["optional_2"]))
+            except (TypeError, ValueError):
+                raise RequestError("optional_2 must be a whole number")
+        for flag in ("audit", "strict_totals", "near_match"):
+            if options.get(flag):
+                result[flag] = True
+        if carrier == "Simple Pay":
+            file_types = SPECS["Simple Pay"]["id_cleaners"]
+            if options.get("file_type") not in file_types:
+                raise RequestError(f"Simple Pay batches need file_type, one of {', '.join(file_types)}")
+            result["file_type"] = options["file_type"]
+            result["xml_paths"] = list(options.get("xml_paths") or [])
+        return result
+
+    def _forget_old_jobs(self):
+        # Called with the lock held
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (DONE, FAILED, STOPPED)]
+        for job_id in finished[:max(0, len(self._jobs) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        if job.stop_requested.is_set():
+            job.status = STOPPED
+            job.finished_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            return
+        job.status = RUNNING
+        job.started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        metrics = RunMetrics(job.carrier, enabled=False)
+        try:
+            reference = None
+            if job.carrier == "Simple Pay":
+                reference = self.references.get(job.options["xml_paths"], job.messages.append, metrics)
+                if reference is None:
+                    raise ValueError("XML processing failed")
+            job.outputs, job.errors = processors.run_batch(job.carrier, job.files, job.options,
+                                                           progress=job.messages.append, metrics=metrics,
+                                                           reference=reference,
+                                                           should_stop=job.stop_requested.is_set)
+            if job.stop_requested.is_set():
+                job.status = STOPPED
+            else:
+                job.status = FAILED if job.errors else DONE
+        except Exception as e:
+            job.errors.append(str(e))
+            job.status = FAILED
+        job.finished_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise RequestError(f"No such job: {job_id}", 404)
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def stop(self, job_id):
+        job = self.get(job_id)
+        job.stop_requested.set()
+        return job
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.stop_requested.set()
+        self._executor.shutdown(wait=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints of the service; the queue is on the server"""
+
+    server_version = "ProcessAutomate"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path):
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > settings.SERVICE_MAX_UPLOAD_BYTES:
+            raise RequestError("Request too large", 413)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise RequestError("Request body is not valid JSON")
+
+    def _parts(self):
+        return [part for part in self.path.split("?", 1)[0].split("/") if part]
+
+    def _handle(self, method):
+        queue = self.server.queue
+        try:
+            parts = self._parts()
+            if method == "GET" and parts == ["health"]:
+                jobs = queue.jobs()
+                self._send_json(200, {
+                    "status": "ok",
+                    "carriers": sorted(CARRIERS),
+                    "workers": settings.WORKERS,
+                    "queued": sum(job.status == QUEUED for job in jobs),
+                    "running": sum(job.status == RUNNING for job in jobs),
+                })
+            elif method == "GET" and parts == ["jobs"]:
+                self._send_json(200, [job.as_dict(messages=False) for job in queue.jobs()])
+            elif method == "POST" and parts == ["jobs"]:
+                self._send_json(202, queue.submit(self._read_json()).as_dict())
+            elif method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+                self._send_json(200, queue.get(parts[1]).as_dict())
+            elif method == "DELETE" and len(parts) == 2 and parts[0] == "jobs":
+                self._send_json(200, queue.stop(parts[1]).as_dict(messages=False))
+            elif method == "GET" and len(parts) == 4 and parts[0] == "jobs" and parts[2] == "outputs":
+                job = queue.get(parts[1])
+                try:
+                    path = job.outputs[int(parts[3])]
+                except (ValueError, IndexError):
+                    raise RequestError(f"No output {parts[3]} for job {job.id}", 404)
+                self._send_file(path)
+            else:
+                raise RequestError(f"Not found: {method} {self.path}", 404)
+        except RequestError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def serve(host=None, port=None):
+    """Run the service until interrupted"""
+    host = host or settings.SERVICE_HOST
+    port = port or settings.SERVICE_PORT
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.queue = JobQueue()
+    print(f"ProcessAutomate service on http://{host}:{port} ({settings.WORKERS} workers, "
+          f"{settings.SERVICE_BATCHES} batches at a time); Ctrl+C stops it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.queue.shutdown()
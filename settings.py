@@ -0,0 +1,84 @@
+import os
+
+from instrumentation import total_memory_bytes
+
+
+def env_flag(name, default=False):
+    """Read a boolean switch from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+# Folder for caches and local databases
+DATA_DIR = os.environ.get("PROCESSAUTOMATE_DATA_DIR", os.path.join(os.path.expanduser("~"), ".processautomate"))
+
+# Local database for the transaction history (duplicate index, transaction store)
+DATABASE_PATH = os.environ.get("PROCESSAUTOMATE_DATABASE", os.path.join(DATA_DIR, "processautomate.db"))
+
+# Record per-stage timings for every run (can also be switched on in the windows)
+METRICS_ENABLED = env_flag("PROCESSAUTOMATE_METRICS")
+
+# Inputs read ahead and outputs waiting to be written per batch (0 runs the stages in sequence)
+PIPELINE_DEPTH = env_int("PROCESSAUTOMATE_PIPELINE_DEPTH", 2)
+
+# Worker processes shared by all carriers for multi-file batches (1 keeps batches in this process)
+WORKERS = max(1, env_int("PROCESSAUTOMATE_WORKERS", (os.cpu_count() or 2) - 1))
+
+# Parsed inputs are cached as Arrow files keyed by content (needs pyarrow)
+READ_CACHE_ENABLED = env_flag("PROCESSAUTOMATE_READ_CACHE", True)
+READ_CACHE_DIR = os.environ.get("PROCESSAUTOMATE_READ_CACHE_DIR", os.path.join(DATA_DIR, "read_cache"))
+READ_CACHE_MAX_BYTES = env_int("PROCESSAUTOMATE_READ_CACHE_MAX_MB", 512) * 1024 * 1024
+
+# Check sheet names and header rows of every file before a batch is parsed
+PREFLIGHT_ENABLED = env_flag("PROCESSAUTOMATE_PREFLIGHT", True)
+
+# Control totals are reported per file; in strict mode a file whose totals do not
+# reconcile with its source is stopped instead of written
+CONTROL_TOTALS_STRICT = env_flag("PROCESSAUTOMATE_STRICT_TOTALS")
+
+# Check every transaction key against the keys of earlier runs and warn about duplicates
+DEDUP_ENABLED = env_flag("PROCESSAUTOMATE_DEDUP", True)
+
+# Store every written output row in the local database for the history search
+HISTORY_ENABLED = env_flag("PROCESSAUTOMATE_HISTORY", True)
+
+# Resolve Simple Pay IDs without an exact reference by near match (leading zeros, other
+# prefixes, truncation; see reference_match.py) when the confidence reaches this percentage.
+# Off by default: it changes the Sorszám values booked, so it is switched on per run
+NEAR_MATCH_ENABLED = env_flag("PROCESSAUTOMATE_NEAR_MATCH")
+NEAR_MATCH_MIN_CONFIDENCE = env_int("PROCESSAUTOMATE_NEAR_MATCH_MIN_CONFIDENCE", 75)
+
+# Also write audit_<name>.xlsx with the source file, sheet and row of every output row
+AUDIT_ENABLED = env_flag("PROCESSAUTOMATE_AUDIT")
+
+# Keep the totals per carrier by processing day and month up to date after every written file (see aggregates.py)
+TOTALS_ENABLED = env_flag("PROCESSAUTOMATE_TOTALS", True)
+
+# Checkpoint every file of a batch so an interrupted batch resumes where it stopped
+JOURNAL_ENABLED = env_flag("PROCESSAUTOMATE_JOURNAL", True)
+
+# Work out the encoding and delimiter of CSV inputs before parsing them (see csv_format.py)
+CSV_SNIFF_ENABLED = env_flag("PROCESSAUTOMATE_CSV_SNIFF", True)
+
+# Memory the worker pool may plan to use at once; jobs wait while their estimated peaks do
+# not fit (default: half of the physical memory, 4 GiB if unknown)
+MEMORY_BUDGET_BYTES = env_int("PROCESSAUTOMATE_MEMORY_BUDGET_MB", 0) * 1024 * 1024 or \
+    (total_memory_bytes() or 8 * 1024 ** 3) // 2
+
+# HTTP processing service (python cli.py serve); localhost only unless the host is changed
+SERVICE_HOST = os.environ.get("PROCESSAUTOMATE_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = env_int("PROCESSAUTOMATE_SERVICE_PORT", 8765)
+SERVICE_UPLOAD_DIR = os.environ.get("PROCESSAUTOMATE_SERVICE_UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+SERVICE_MAX_UPLOAD_BYTES = env_int("PROCESSAUTOMATE_SERVICE_MAX_UPLOAD_MB", 200) * 1024 * 1024
+# Batches run at the same time; their files share the one worker pool
+SERVICE_BATCHES = max(1, env_int("PROCESSAUTOMATE_SERVICE_BATCHES", 2))
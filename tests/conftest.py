@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The modules sit at the repository root and read their settings when first imported, so
+# the settings are reset to their defaults, with the data directory (database, caches) in a
+# throwaway folder, before that
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in [name for name in os.environ if name.startswith("PROCESSAUTOMATE_")]:
+    del os.environ[name]
+os.environ["PROCESSAUTOMATE_DATA_DIR"] = tempfile.mkdtemp(prefix="processautomate_tests_")
@@ -0,0 +1,72 @@
+import gzip
+import zipfile
+
+import pytest
+
+import archives
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    path = tmp_path / "march.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("gls/gls_march.xlsx", b"workbook")
+        zf.writestr("gls/notes.txt", b"notes")
+        zf.writestr("__MACOSX/gls/._gls_march.xlsx", b"metadata")
+        zf.writestr("~$gls_march.xlsx", b"lock")
+        zf.writestr("processed_gls_march.xlsx", b"output")
+        zf.writestr("sp.csv", b"ID;Amount\n1;100\n")
+    return str(path)
+
+
+def test_member_paths(bundle):
+    member = archives.member_path(bundle, "sp.csv")
+    assert archives.is_member(member)
+    assert not archives.is_archive(member)
+    assert archives.is_archive(bundle)
+    assert archives.split(member) == (bundle, "sp.csv")
+    assert archives.container(member) == bundle
+    assert archives.container("plain.xlsx") == "plain.xlsx"
+
+
+def test_expand_keeps_the_members_a_carrier_reads(bundle, tmp_path):
+    plain = str(tmp_path / "plain.xlsx")
+    expanded = archives.expand([plain, bundle], ["*.xlsx"])
+    assert expanded == [plain, archives.member_path(bundle, "gls/gls_march.xlsx")]
+
+
+def test_expand_keeps_archives_that_cannot_be_opened(tmp_path):
+    broken = tmp_path / "broken.zip"
+    broken.write_bytes(b"not a zip")
+    assert archives.expand([str(broken)], ["*.csv"]) == [str(broken)]
+
+
+def test_zip_members_are_read_without_extracting(bundle):
+    member = archives.member_path(bundle, "sp.csv")
+    with archives.open_binary(member) as f:
+        assert f.read() == b"ID;Amount\n1;100\n"
+    with archives.open_input(archives.member_path(bundle, "gls/gls_march.xlsx")) as f:
+        assert f.read() == b"workbook"
+    assert archives.stat(member).st_size == 16
+    assert archives.exists(member)
+    assert not archives.exists(archives.member_path(bundle, "missing.csv"))
+
+
+def test_gz_holds_one_member(tmp_path):
+    path = tmp_path / "otp_march.csv.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(b"ID;Amount\n" * 100)
+    assert archives.expand([str(path)], ["*.csv"]) == [archives.member_path(str(path), "otp_march.csv")]
+    member = archives.member_path(str(path), "otp_march.csv")
+    assert archives.stat(member).st_size == 1000
+    with archives.open_binary(member) as f:
+        assert f.read(10) == b"ID;Amount\n"
+
+
+def test_output_stems_of_same_named_members_differ(tmp_path):
+    march, april = str(tmp_path / "march.zip"), str(tmp_path / "april.zip")
+    stems = {archives.output_stem(archives.member_path(archive, member))
+             for archive in (march, april) for member in ("x/report.xlsx", "y/report.xlsx")}
+    assert stems == {"march_x_report", "march_y_report", "april_x_report", "april_y_report"}
+    assert archives.output_stem(str(tmp_path / "report.xlsx")) == "report"
+    assert archives.output_stem(archives.member_path(str(tmp_path / "sp.csv.gz"), "sp.csv")) == "sp"
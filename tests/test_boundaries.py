@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from boundaries import count_footer_rows, find_data_start, resolve_data_start
+
+RULES = {"header_labels": ["Hivatkozás"], "key_column": 1, "amount_column": 2}
+
+
+def _sheet():
+    return pd.DataFrame([
+        ["Elszámolás 2025-03", np.nan, np.nan],
+        [np.nan, np.nan, np.nan],
+        ["Dátum", "Hivatkozás", "Összeg"],
+        ["2025-03-01", "SA25/1", 1200],
+        ["2025-03-02", "SA25/2", "3400"],
+        ["2025-03-03", "SA25/3", 560],
+        ["Összesen", np.nan, 5160],
+        [np.nan, np.nan, np.nan],
+    ])
+
+
+def test_data_starts_below_the_header_row():
+    assert find_data_start(_sheet(), RULES) == 3
+
+
+def test_data_start_without_header_labels_is_the_first_data_row():
+    assert find_data_start(_sheet(), {"key_column": 1, "amount_column": 2}) == 3
+
+
+def test_data_start_is_none_without_data_rows():
+    assert find_data_start(_sheet().iloc[:3], {"key_column": 1, "amount_column": 2}) is None
+
+
+def test_footer_rows_are_counted_after_the_last_data_row():
+    assert count_footer_rows(_sheet(), RULES) == 2
+
+
+def test_footer_rows_without_a_footer():
+    assert count_footer_rows(_sheet().iloc[:6], RULES) == 0
+
+
+def test_blank_keys_are_not_data_rows():
+    sheet = _sheet()
+    sheet.iloc[5, 1] = "  "
+    assert count_footer_rows(sheet, RULES) == 3
+
+
+def test_resolved_data_start_prefers_the_rules():
+    assert resolve_data_start(_sheet(), RULES, skip_rows=8) == (3, True)
+
+
+def test_resolved_data_start_falls_back_to_skip_rows():
+    rules = {"key_column": 1, "amount_column": 2}
+    assert resolve_data_start(_sheet().iloc[:3], rules, skip_rows=8) == (8, False)
+    assert resolve_data_start(_sheet().iloc[:3], rules) == (None, False)
+
+
+def test_preflight_accepts_what_the_read_falls_back_on(tmp_path):
+    import preflight
+    path = tmp_path / "gls.xlsx"
+    _sheet().iloc[:3].to_excel(path, header=False, index=False)
+    spec = {"extensions": [".xlsx"], "boundaries": {"key_column": 1, "amount_column": 2}}
+    assert preflight.check_file({**spec, "skip_rows": 8}, str(path)) == []
+    assert preflight.check_file(spec, str(path))[0].startswith("No data rows found")
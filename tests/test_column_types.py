@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+import column_types
+
+
+def _index():
+    return column_types.reference_series(["500", "501", "502", "501"], ["1000", "1001", "1002", "1009"])
+
+
+def test_later_references_win_for_repeated_keys():
+    index = _index()
+    assert list(index.index) == ["500", "502", "501"]
+    assert index["501"] == "1009"
+
+
+def test_lookup_maps_known_keys_and_defaults_the_rest():
+    keys = pd.Series(["502", "999", "500", np.nan, "501"], index=[10, 11, 12, 13, 14])
+    result = column_types.lookup(keys, _index(), "1")
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert list(result.index) == [10, 11, 12, 13, 14]
+    assert result.astype(object).tolist() == ["1002", "1", "1000", "1", "1009"]
+
+
+def test_lookup_with_the_default_among_the_values():
+    index = column_types.reference_series(["500", "501"], ["1", "1001"])
+    result = column_types.lookup(pd.Series(["501", "x", "500"]), index, "1")
+    assert result.astype(object).tolist() == ["1001", "1", "1"]
+
+
+def test_lookup_without_references_gives_the_default():
+    keys = pd.Series(["500", "501"])
+    assert column_types.lookup(keys, None, "1").astype(object).tolist() == ["1", "1"]
+    empty = column_types.reference_series([], [])
+    assert column_types.lookup(keys, empty, "1").astype(object).tolist() == ["1", "1"]
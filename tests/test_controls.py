@@ -0,0 +1,52 @@
+import pandas as pd
+
+import controls
+
+SPEC = {"controls": {"amount_column": "Összeg", "fee_column": "Jutalék"}}
+
+
+def _frame(amounts, fees=None):
+    fees = fees if fees is not None else [10] * len(amounts)
+    return pd.DataFrame({"Összeg": amounts, "Jutalék": fees})
+
+
+def test_totals_reconcile_with_the_total_row():
+    footer = pd.DataFrame({"Összeg": ["Összesen", 600.0]})
+    totals = controls.compute(SPEC, _frame([100, 200, 300]), footer, [pd.DataFrame({"Összeg": [-30]})])
+    assert totals["rows"] == 3
+    assert totals["amount"] == 600
+    assert totals["fees"] == 30
+    assert totals["deductions"] == -30
+    assert totals["source_totals"] == [600]
+    assert controls.check(totals) == []
+    assert controls.summary_line(totals, []).startswith("✓ Control totals: 3 rows, amount 600")
+
+
+def test_total_row_mismatch_is_a_problem():
+    totals = controls.compute(SPEC, _frame([100, 200]), pd.DataFrame({"Összeg": [1300]}))
+    problems = controls.check(totals)
+    assert problems == ["amount total 300 does not match the total row (1 300)"]
+    assert controls.summary_line(totals, problems).startswith("✗")
+
+
+def test_non_numeric_amounts_are_counted():
+    totals = controls.compute(SPEC, _frame([100, "n/a", None]))
+    assert totals["amount"] == 100
+    assert totals["non_numeric"] == 2
+    assert controls.check(totals) == ["2 data rows have no numeric amount"]
+
+
+def test_positive_deductions_are_a_problem():
+    totals = controls.compute(SPEC, _frame([100]), extra_rows=[pd.DataFrame({"Összeg": [5]})])
+    assert controls.check(totals) == ["deductions are positive (5)"]
+
+
+def test_deductions_larger_than_the_amount_are_a_problem():
+    totals = controls.compute(SPEC, _frame([100]), extra_rows=[None, pd.DataFrame({"Összeg": [-150]})])
+    assert controls.check(totals) == ["deductions 150 exceed the amount total 100"]
+
+
+def test_fees_are_none_without_a_fee_column():
+    totals = controls.compute({"controls": {"amount_column": "Összeg"}}, _frame([1, 2]))
+    assert totals["fees"] is None
+    assert "fees" not in controls.summary_line(totals, [])
@@ -0,0 +1,49 @@
+import codecs
+
+import csv_format
+
+
+def _write(folder, name, data):
+    path = folder / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_source_pattern_masks_digits():
+    assert csv_format.source_pattern("C:/exports/SimplePay_2025_03.CSV") == "simplepay_####_##.csv"
+
+
+def test_utf8_with_semicolons(tmp_path):
+    path = _write(tmp_path, "a.csv", "ID;Összeg\n1;100\n2;200\n".encode("utf-8"))
+    assert csv_format.sniff(path, carrier="test utf8") == {"encoding": "utf-8", "sep": ";"}
+
+
+def test_byte_order_mark_decides_the_encoding(tmp_path):
+    path = _write(tmp_path, "bom.csv", codecs.BOM_UTF8 + b"ID;Amount\n1;100\n")
+    assert csv_format.sniff(path, carrier="test bom")["encoding"] == "utf-8-sig"
+
+
+def test_invalid_utf8_is_read_as_cp1250(tmp_path):
+    path = _write(tmp_path, "win.csv", "ID;Vásárló\n1;Kovács Ödön\n".encode("cp1250"))
+    assert csv_format.sniff(path, carrier="test cp1250") == {"encoding": "cp1250", "sep": ";"}
+
+
+def test_other_delimiters_are_found(tmp_path):
+    comma = _write(tmp_path, "comma.csv", b"ID,Amount,Fee\n1,100,2\n2,200,4\n")
+    tab = _write(tmp_path, "tab.csv", b"ID\tAmount\n1\t100\n")
+    assert csv_format.sniff(comma, carrier="test delimiters")["sep"] == ","
+    assert csv_format.sniff(tab, carrier="test delimiters")["sep"] == "\t"
+
+
+def test_the_default_delimiter_wins_when_it_fits(tmp_path):
+    path = _write(tmp_path, "both.csv", b"ID;Amount,Fee\n1;100,2\n")
+    assert csv_format.sniff(path, carrier="test default")["sep"] == ";"
+
+
+def test_ascii_sample_uses_the_format_of_earlier_exports_of_the_source(tmp_path):
+    first = _write(tmp_path, "export_2025_01.csv", "ID;Vevő\n1;Kő\n".encode("cp1250"))
+    second = _write(tmp_path, "export_2025_02.csv", b"ID;Customer\n1;Kovacs\n")
+    other = _write(tmp_path, "other_2025_02.csv", b"ID;Customer\n1;Kovacs\n")
+    assert csv_format.sniff(first, carrier="test cache")["encoding"] == "cp1250"
+    assert csv_format.sniff(second, carrier="test cache")["encoding"] == "cp1250"
+    assert csv_format.sniff(other, carrier="test cache")["encoding"] == "utf-8"
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import run_pipeline
+
+
+def _stages(log):
+    def read(item):
+        log.append(("read", item, threading.current_thread().name))
+        if item == "bad read":
+            raise ValueError("unreadable")
+        # Later items are read faster, so finishing in order is not a given
+        time.sleep(0.01 * (5 - len(log) % 5))
+        return item.upper()
+
+    def transform(item, data):
+        log.append(("transform", item, threading.current_thread().name))
+        if item == "bad transform":
+            raise ValueError("untransformable")
+        return data + "!"
+
+    def write(item, data):
+        log.append(("write", item, threading.current_thread().name))
+        if item == "bad write":
+            raise ValueError("unwritable")
+        return f"out/{data}"
+
+    return read, transform, write
+
+
+@pytest.mark.parametrize("depth", [0, 1, 2])
+def test_results_in_input_order_with_errors_per_item(depth):
+    items = ["a", "bad read", "b", "bad transform", "c", "bad write", "d"]
+    done = []
+    results = run_pipeline(items, *_stages([]), depth=depth, on_done=lambda *entry: done.append(entry))
+    assert [item for item, _, _ in results] == items
+    assert [result for _, result, error in results if error is None] == ["out/A!", "out/B!", "out/C!", "out/D!"]
+    assert {item: str(error) for item, _, error in results if error is not None} == {
+        "bad read": "unreadable", "bad transform": "untransformable", "bad write": "unwritable"}
+    assert done == results
+
+
+def test_stages_run_on_their_own_threads():
+    log = []
+    run_pipeline(["a", "b", "c"], *_stages(log), depth=2)
+    threads = {stage: {name for logged, _, name in log if logged == stage} for stage in ("read", "transform", "write")}
+    assert threads == {"read": {"pipeline-read"}, "transform": {threading.current_thread().name},
+                       "write": {"pipeline-write"}}
+
+
+def test_depth_zero_stays_on_the_calling_thread():
+    log = []
+    run_pipeline(["a", "b"], *_stages(log), depth=0)
+    assert {name for _, _, name in log} == {threading.current_thread().name}
+
+
+def test_empty_batch():
+    assert run_pipeline([], *_stages([]), depth=2) == []
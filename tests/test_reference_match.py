@@ -0,0 +1,53 @@
+import column_types
+from reference_match import NearMatcher, numbers, resolution_lines
+
+
+def _matcher(references):
+    keys, values = zip(*references.items())
+    return NearMatcher(column_types.reference_series(list(keys), list(values)))
+
+
+MATCHER = _matcher({"REF-500012337": "1001", "REF-500012437": "1002", "REF-731": "1003"})
+
+
+def _resolve(key, min_confidence=0.75):
+    resolution, = MATCHER.resolve_all([key], min_confidence)
+    return resolution
+
+
+def test_numbers_are_the_trailing_digits_without_leading_zeros():
+    assert numbers(["pg-00123", "T45", "abc", None]) == ["123", "45", "", ""]
+
+
+def test_leading_zeros_and_other_prefixes_are_normalized():
+    for key in ["00500012337", "X9-500012337"]:
+        resolution = _resolve(key)
+        assert (resolution.sorszam, resolution.method, resolution.confidence) == ("1001", "normalized", 0.95)
+        assert resolution.reference == "REF-500012337"
+
+
+def test_truncated_ids_resolve_with_their_share_of_the_digits():
+    resolution = _resolve("50001233")
+    assert (resolution.sorszam, resolution.method) == ("1001", "truncated")
+    assert resolution.confidence == 8 / 9
+
+
+def test_ids_that_extend_a_reference():
+    resolution = _resolve("5000124370", min_confidence=0.5)
+    assert (resolution.sorszam, resolution.method) == ("1002", "extended")
+
+
+def test_unresolved_ids_say_why():
+    assert _resolve("73").method == "too short"
+    assert _resolve("500012").method == "ambiguous"
+    assert _resolve("9999999").method == "no candidate"
+    assert _resolve("0012337").method == "below minimum"
+
+
+def test_resolution_lines():
+    resolutions = MATCHER.resolve_all(["00500012337", "73"], 0.75)
+    lines = resolution_lines("sp.csv", resolutions, "1")
+    assert lines[0] == "Near match: resolved 1 of 2 unmatched transaction IDs in sp.csv"
+    assert lines[1].startswith("  00500012337 -> REF-500012337 (Sorszám 1001, normalized")
+    assert lines[-1] == "Warning: 1 transaction IDs in sp.csv keep Sorszám 1 (too short: 1)"
+    assert resolution_lines("sp.csv", [], "1") == []
@@ -0,0 +1,108 @@
+import os
+import time
+from concurrent.futures import Future, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import scheduler as scheduler_module
+from scheduler import Job, Scheduler
+
+MIB = 1024 * 1024
+
+
+class FakeExecutor:
+    """Records the submitted jobs instead of starting worker processes"""
+
+    def __init__(self):
+        self.running = {}
+
+    def submit(self, run, carrier, file_path, *args):
+        future = Future()
+        self.running[file_path] = future
+        return future
+
+    def finish(self, file_path):
+        self.running.pop(file_path).set_result({"memory_used": None, "pid": 1, "wall_s": 0.0, "cpu_s": 0.0})
+
+
+def _scheduler(workers, budget):
+    scheduler = Scheduler(workers)
+    scheduler.memory_budget = budget
+    scheduler._executor = FakeExecutor()
+    return scheduler
+
+
+def _job(name, cost, memory):
+    job = Job("GLS", name, {})
+    job.cost = cost
+    job.memory = memory
+    return job
+
+
+def test_jobs_start_largest_first_while_they_fit_the_budget():
+    scheduler = _scheduler(workers=3, budget=100 * MIB)
+    scheduler.submit([_job("small", 1, 30 * MIB), _job("big", 3, 60 * MIB), _job("medium", 2, 60 * MIB)])
+    # medium does not fit next to big; small does and jumps the queue
+    assert set(scheduler._executor.running) == {"big", "small"}
+    assert scheduler._memory_in_use == 90 * MIB
+
+    scheduler._executor.finish("big")
+    assert set(scheduler._executor.running) == {"small", "medium"}
+    assert scheduler._peak_memory_in_use == 90 * MIB
+    assert scheduler._memory_waits == 1
+
+
+def test_a_job_larger_than_the_budget_runs_alone():
+    scheduler = _scheduler(workers=2, budget=100 * MIB)
+    huge, other = _job("huge", 2, 500 * MIB), _job("other", 1, 10 * MIB)
+    scheduler.submit([huge, other])
+    assert set(scheduler._executor.running) == {"huge"}
+
+    scheduler._executor.finish("huge")
+    assert set(scheduler._executor.running) == {"other"}
+    assert huge.future.done() and not other.future.done()
+
+
+def test_worker_count_limits_the_running_jobs():
+    scheduler = _scheduler(workers=1, budget=100 * MIB)
+    scheduler.submit([_job("a", 2, MIB), _job("b", 1, MIB)])
+    assert set(scheduler._executor.running) == {"a"}
+    assert scheduler._memory_waits == 0
+
+
+def test_jobs_are_not_started_once_the_batch_is_stopped():
+    scheduler = _scheduler(workers=1, budget=100 * MIB)
+    stopped = []
+    first, second = _job("a", 2, MIB), _job("b", 1, MIB)
+    second.should_stop = lambda: bool(stopped)
+    scheduler.submit([first, second])
+    stopped.append(True)
+    scheduler._executor.finish("a")
+    assert second.future.cancelled()
+    assert scheduler._executor.running == {}
+
+
+def _run_or_die(carrier, file_path, *args):
+    """Stands in for run_job in the worker processes; "crash" kills its worker"""
+    if file_path == "crash":
+        os._exit(1)
+    time.sleep(0.2)
+    return {"output_path": file_path, "memory_used": None, "messages": [], "spans": [], "pid": os.getpid(),
+            "wall_s": 0.2, "cpu_s": 0.0}
+
+
+def test_a_dead_worker_fails_the_batch_instead_of_hanging(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "run_job", _run_or_die)
+    scheduler = Scheduler(2)
+    scheduler.memory_budget = 100 * MIB
+    jobs = [_job("crash", 10, MIB)] + [_job(f"file {i}", 5 - i, MIB) for i in range(5)]
+    done, not_done = wait(scheduler.submit(jobs), timeout=30)
+    assert not not_done
+    assert isinstance(jobs[0].future.exception(), BrokenProcessPool)
+    assert scheduler._running == 0 and scheduler._memory_in_use == 0 and scheduler._pending == []
+    assert scheduler._streaming == {}
+
+    # The next batch gets a fresh pool
+    later = [_job("later 1", 2, MIB), _job("later 2", 1, MIB)]
+    done, not_done = wait(scheduler.submit(later), timeout=30)
+    assert not not_done
+    assert [job.future.result()["output_path"] for job in later] == ["later 1", "later 2"]
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+import engine
+import equivalence
+import processors
+import settings
+import transaction_index
+from carrier_specs import SPECS
+
+
+@pytest.fixture
+def overlapping_files(tmp_path):
+    """Two GLS exports with the same references and different amounts"""
+    transaction_index.clear("GLS")
+    paths = [str(tmp_path / f"gls_{seed}.xlsx") for seed in (1, 2)]
+    for seed, path in zip((1, 2), paths):
+        equivalence._gls(path, 40, random.Random(seed))
+    return paths
+
+
+def _already_processed(messages):
+    return [message for message in messages if "were already processed" in message]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_files_of_one_batch_are_checked_against_each_other(overlapping_files, monkeypatch, workers):
+    monkeypatch.setattr(settings, "WORKERS", workers)
+    messages = []
+    processed, errors = processors.run_batch("GLS", overlapping_files, progress=messages.append)
+    assert len(processed) == 2 and errors == []
+    warnings = _already_processed(messages)
+    assert len(warnings) == 1
+    assert warnings[0].startswith("Warning: 40 transactions in gls_")
+
+
+def test_keys_of_a_file_whose_outputs_fail_are_forgotten(overlapping_files, monkeypatch):
+    first, second = overlapping_files
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(engine, "write_xlsx", fail)
+    with pytest.raises(OSError):
+        engine.process(SPECS["GLS"], first, progress=lambda message: None)
+    monkeypatch.undo()
+
+    messages = []
+    engine.process(SPECS["GLS"], second, progress=messages.append)
+    assert _already_processed(messages) == []
@@ -0,0 +1,144 @@
+"""Persistent index of every processed transaction key, to catch double bookings
+
+Keys (the spec's "dedup_key" column after cleaning) are stored per carrier in a SQLite
+table whose primary key is (carrier, key), kept WITHOUT ROWID so the table is its own
+covering index. A file's keys are checked and recorded in one IMMEDIATE transaction:
+they are loaded into a temporary table with executemany and joined against the index, so
+the cost grows with the file, not with the history. Files processed at the same time (on
+the worker pool or in the pipeline) are therefore checked against each other too: the
+second one to get here sees the first one's keys.
+
+check_and_record() also returns the keys the file added, as a RecordedKeys that travels
+in the main output's attrs to write_outputs; if the outputs cannot be written, forget()
+removes those keys again. Rows recorded from the same input content (by SHA-256) are not
+reported again, so re-running a file does not flag its own transactions.
+"""
+import time
+
+import database
+import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_keys (
+    carrier TEXT NOT NULL,
+    key TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    processed_at TEXT NOT NULL,
+    PRIMARY KEY (carrier, key)
+) WITHOUT ROWID;
+"""
+
+
+def connect(path=None):
+    return database.connect(path, SCHEMA)
+
+
+def transaction_keys(frame, column):
+    """Non-empty keys of the column as text"""
+    keys = frame[column].dropna().astype(str).str.strip()
+    return keys[keys != ""]
+
+
+class RecordedKeys:
+    """The keys one file added to the index, for forget()"""
+
+    def __init__(self, carrier, keys, source_hash):
+        self.carrier = carrier
+        self.keys = keys
+        self.source_hash = source_hash
+
+    def __deepcopy__(self, memo):
+        # pandas deep-copies attrs on every operation on the frame that carries them
+        return self
+
+
+def check_and_record(carrier, keys, source_hash, file_name, path=None):
+    """Record the keys; returns ({key: (file name, processed at)} for those seen before,
+    RecordedKeys of the keys that were new)"""
+    unique_keys = keys.drop_duplicates().tolist()
+    if not unique_keys:
+        return {}, RecordedKeys(carrier, [], source_hash)
+    connection = connect(path)
+    try:
+        with connection:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (key TEXT PRIMARY KEY) WITHOUT ROWID")
+            connection.execute("DELETE FROM incoming")
+            connection.executemany("INSERT INTO incoming (key) VALUES (?)", ((key,) for key in unique_keys))
+            seen = connection.execute(
+                "SELECT s.key, s.file_name, s.processed_at FROM incoming i "
+                "JOIN seen_keys s ON s.carrier = ? AND s.key = i.key WHERE s.source_hash != ?",
+                (carrier, source_hash),
+            ).fetchall()
+            added = [key for key, in connection.execute(
+                "SELECT key FROM incoming WHERE key NOT IN (SELECT key FROM seen_keys WHERE carrier = ?)", (carrier,))]
+            connection.execute(
+                "INSERT OR IGNORE INTO seen_keys (carrier, key, source_hash, file_name, processed_at) "
+                "SELECT ?, key, ?, ?, ? FROM incoming",
+                (carrier, source_hash, file_name, time.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+    finally:
+        connection.close()
+    seen_before = {key: (seen_file, processed_at) for key, seen_file, processed_at in seen}
+    return seen_before, RecordedKeys(carrier, added, source_hash)
+
+
+def forget(recorded, path=None):
+    """Remove the keys a file added, after its outputs could not be written"""
+    if not recorded.keys:
+        return
+    connection = connect(path)
+    try:
+        with connection:
+            connection.executemany(
+                "DELETE FROM seen_keys WHERE carrier = ? AND key = ? AND source_hash = ?",
+                ((recorded.carrier, key, recorded.source_hash) for key in recorded.keys),
+            )
+    finally:
+        connection.close()
+
+
+def duplicate_lines(file_name, repeated, seen_before, limit=5):
+    """Warnings for the log panel; empty when the file has no duplicates"""
+    lines = []
+    if len(repeated):
+        sample = ", ".join(repeated.unique()[:limit].tolist())
+        lines.append(f"Warning: {len(repeated)} transactions appear more than once in {file_name} ({sample})")
+    if seen_before:
+        lines.append(f"Warning: {len(seen_before)} transactions in {file_name} were already processed:")
+        for key, (seen_file, processed_at) in list(seen_before.items())[:limit]:
+            lines.append(f"  {key} (in {seen_file}, {processed_at})")
+        if len(seen_before) > limit:
+            lines.append(f"  ... and {len(seen_before) - limit} more")
+    return lines
+
+
+def info_lines(path=None):
+    """Key counts per carrier for the CLI"""
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT carrier, COUNT(*), COUNT(DISTINCT source_hash), MAX(processed_at) FROM seen_keys GROUP BY carrier"
+        ).fetchall()
+    finally:
+        connection.close()
+    lines = [f"Database: {path or settings.DATABASE_PATH}"]
+    if not rows:
+        lines.append("No transactions recorded yet")
+    for carrier, count, files, last in rows:
+        lines.append(f"  {carrier:<12} {count:>10} keys from {files} files, last {last}")
+    return lines
+
+
+def clear(carrier=None, path=None):
+    """Forget the recorded keys (of one carrier or all) and return how many were removed"""
+    connection = connect(path)
+    try:
+        with connection:
+            if carrier:
+                cursor = connection.execute("DELETE FROM seen_keys WHERE carrier = ?", (carrier,))
+            else:
+                cursor = connection.execute("DELETE FROM seen_keys")
+        return cursor.rowcount
+    finally:
+        connection.close()
@@ -0,0 +1,110 @@
+"""History of every written output row, searchable by reference and date
+
+write_outputs() hands the main output frame of each file to record(): its rows (reference
+or Sorszám, amount) are bulk-inserted with executemany into the transactions table of the
+local database, replacing the rows of an earlier run that wrote the same output file.
+Indexes on reference and on processing time keep search() fast on large histories.
+"""
+import os
+import time
+
+import pandas as pd
+
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    carrier TEXT NOT NULL,
+    reference TEXT,
+    amount INTEGER,
+    source_file TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    processed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_reference ON transactions (reference, carrier);
+CREATE INDEX IF NOT EXISTS idx_transactions_processed_at ON transactions (processed_at, carrier);
+CREATE INDEX IF NOT EXISTS idx_transactions_output_file ON transactions (output_file);
+"""
+
+COLUMNS = ["carrier", "reference", "amount", "source_file", "output_file", "processed_at"]
+
+# Upper bound used to turn a prefix into an index range
+_PREFIX_END = "\U0010ffff"
+
+
+def connect(path=None):
+    return database.connect(path, SCHEMA)
+
+
+def _rows(carrier, frame, source_file, output_file, processed_at):
+    references = frame.iloc[:, 0]
+    references = references.astype(object).where(references.notna(), None)
+    amounts = pd.to_numeric(frame.iloc[:, 1], errors="coerce")
+    amounts = amounts.astype(object).where(amounts.notna(), None)
+    for reference, amount in zip(references, amounts):
+        yield (carrier, None if reference is None else str(reference),
+               None if amount is None else int(amount), source_file, output_file, processed_at)
+
+
+def record(carrier, source_file, output_file, frame, path=None):
+    """Store the (reference, amount) rows of one written output; returns the row count"""
+    processed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    source_file = os.path.abspath(source_file)
+    output_file = os.path.abspath(output_file)
+    connection = connect(path)
+    try:
+        with connection:
+            connection.execute("DELETE FROM transactions WHERE output_file = ?", (output_file,))
+            connection.executemany(
+                "INSERT INTO transactions (carrier, reference, amount, source_file, output_file, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                _rows(carrier, frame, source_file, output_file, processed_at),
+            )
+    finally:
+        connection.close()
+    return len(frame)
+
+
+def search(reference=None, date_from=None, date_to=None, carrier=None, limit=500, path=None):
+    """Rows whose reference starts with reference, processed between the dates (YYYY-MM-DD)
+
+    Returns a list of dicts with the COLUMNS keys, newest first.
+    """
+    conditions = []
+    params = []
+    if reference:
+        # A range instead of LIKE so the reference index is used
+        conditions.append("reference >= ? AND reference < ?")
+        params += [reference, reference + _PREFIX_END]
+    if date_from:
+        conditions.append("processed_at >= ?")
+        params.append(date_from)
+    if date_to:
+        # Dates are inclusive: everything before the next day
+        conditions.append("processed_at < ?")
+        params.append(date_to + _PREFIX_END)
+    if carrier:
+        conditions.append("carrier = ?")
+        params.append(carrier)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM transactions {where} ORDER BY processed_at DESC, id LIMIT ?",
+            params + [limit],
+        ).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def format_rows(rows):
+    """Search results as aligned text lines for the CLI"""
+    lines = []
+    for row in rows:
+        amount = "" if row["amount"] is None else f"{row['amount']:,}".replace(",", " ")
+        lines.append(f"{row['processed_at']}  {row['carrier']:<10} {str(row['reference']):<24} {amount:>12}  "
+                     f"{os.path.basename(row['source_file'])}")
+    return lines
@@ -0,0 +1,52 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import QMessageBox
+
+import processors
+from instrumentation import RunMetrics
+
+
+class BatchThread(QThread):
+    """Thread running one carrier batch through processors.run_batch"""
+    progress_update = pyqtSignal(str)
+    finished = pyqtSignal(list, list)
+
+    def __init__(self, carrier, files, options=None, record_metrics=False, profile=False, resume=True):
+        super().__init__()
+        self.carrier = carrier
+        self.files = files
+        self.options = options or {}
+        self.metrics = RunMetrics(carrier, enabled=record_metrics)
+        self.profile = profile
+        self.resume = resume
+
+    def run(self):
+        try:
+            processed_files, errors = processors.run_batch(self.carrier, self.files, self.options,
+                                                           progress=self.progress_update.emit,
+                                                           metrics=self.metrics, profile=self.profile,
+                                                           should_stop=self.isInterruptionRequested,
+                                                           resume=self.resume)
+        except Exception as e:
+            import traceback
+            self.progress_update.emit(traceback.format_exc())
+            processed_files, errors = [], [f"Error during {self.carrier} processing: {str(e)}"]
+        self.finished.emit(processed_files, errors)
+
+
+def confirm_stop(window, thread):
+    """Ask before leaving a window whose batch is still running; True if it may close
+
+    Finished files are checkpointed in the journal, so the batch is stopped after the
+    files in progress and resumes when the same files are run again.
+    """
+    if thread is None or not thread.isRunning() or thread.isInterruptionRequested():
+        return True
+    answer = QMessageBox.question(
+        window, "Processing Running",
+        "Processing is still running.\n\nFinished files are saved. If you stop now, the remaining files "
+        "are processed when you run the same files again.\n\nStop after the current files and close?",
+        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+    if answer != QMessageBox.Yes:
+        return False
+    thread.requestInterruption()
+    return True